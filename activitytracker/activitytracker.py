@@ -11,6 +11,7 @@ from redbot.core.utils.chat_formatting import humanize_list
 from redbot.core.utils.views import ConfirmView
 
 import logging
+import time
 
 log = logging.getLogger("red.activitytracker")
 
@@ -20,6 +21,9 @@ class ActivityTracker(commands.Cog):
     and exposes an API for a Django website to query member initial role assignment and military rank definitions.
     """
 
+    ROLE_CHECK_INTERVAL = 900  # Seconds between role reconciliation passes
+    ROLE_FULL_CHECK_INTERVAL = 7 * 86400  # Seconds between full passes over every member
+
     def __init__(self, bot):
         self.bot = bot
         self.config = Config.get_conf(self, identifier=1234567890, force_registration=True)
@@ -37,6 +41,21 @@ class ActivityTracker(commands.Cog):
         }
         self.config.register_guild(**default_guild)
         self.voice_tracking = {}  # guild_id: {user_id: join_time (datetime.utcnow())}
+        # Role reconciliation state: only members marked dirty are rechecked between full passes
+        self.role_check_dirty = {}  # guild_id: {user_id}
+        self.role_check_last_full = {}  # guild_id: unix time of last full pass
+        self.role_check_fingerprints = {}  # guild_id: promotion settings at last full pass
+        self.role_check_metrics = {
+            "passes": 0,
+            "full_passes": 0,
+            "total_changes": 0,
+            "last_mode": None,
+            "last_checked": 0,
+            "last_changes": 0,
+            "last_duration": 0.0,
+            "last_finished": None,
+            "progress": None,
+        }
         self.session = aiohttp.ClientSession()
 
         # Web API for incoming requests to the bot (from Django)
@@ -273,15 +292,20 @@ class ActivityTracker(commands.Cog):
     async def _get_user_voice_minutes(self, guild, user_id):
         user_activity = await self.config.guild(guild).user_activity()
         total_minutes = user_activity.get(str(user_id), 0)
-        guild_id = guild.id
-        if guild_id in self.voice_tracking and user_id in self.voice_tracking[guild_id]:
-            join_time = self.voice_tracking[guild_id][user_id]
-            current_session_minutes = int((datetime.utcnow() - join_time).total_seconds() / 60)
-            if current_session_minutes >= 1:
-                total_minutes += current_session_minutes
-                log.debug(f"Added {current_session_minutes} minutes from current session for user {user_id}")
+        current_session_minutes = self._current_session_minutes(guild.id, user_id)
+        if current_session_minutes:
+            total_minutes += current_session_minutes
+            log.debug(f"Added {current_session_minutes} minutes from current session for user {user_id}")
         return total_minutes
 
+    def _current_session_minutes(self, guild_id, user_id):
+        """Whole minutes of the member's ongoing voice session that haven't been saved yet."""
+        join_time = self.voice_tracking.get(guild_id, {}).get(user_id)
+        if join_time is None:
+            return 0
+        current_session_minutes = int((datetime.utcnow() - join_time).total_seconds() / 60)
+        return current_session_minutes if current_session_minutes >= 1 else 0
+
     # --- DJANGO SYNC (API Calls OUT to Django) ---
 
     async def _update_website_activity(self, guild, member, total_minutes_to_send): # Renamed arg for clarity
@@ -428,7 +452,7 @@ class ActivityTracker(commands.Cog):
         self.bot.loop.create_task(self._schedule_periodic_activity_updates(guild_id))
 
     async def _schedule_periodic_role_check(self, guild_id: int):
-        """Schedules the periodic role check to run every 24 hours."""
+        """Schedules the periodic role check. Most runs only look at members marked dirty."""
         while self == self.bot.get_cog("ActivityTracker"):  # Run while cog is loaded
             try:
                 log.info(f"Running scheduled role check for guild ID: {guild_id}")
@@ -436,7 +460,7 @@ class ActivityTracker(commands.Cog):
                 log.info(f"Completed scheduled role check for guild ID: {guild_id}")
             except Exception as e:
                 log.exception(f"An error occurred during the scheduled role check: {e}")
-            await asyncio.sleep(86400)  # Sleep for 24 hours
+            await asyncio.sleep(self.ROLE_CHECK_INTERVAL)
 
     async def _schedule_periodic_activity_updates(self, guild_id: int):
         """Schedules periodic updates of activity for users currently in voice channels."""
@@ -486,26 +510,56 @@ class ActivityTracker(commands.Cog):
 
     async def _periodic_role_check(self, guild_id: int):
         """
-        Performs a periodic check of all guild members' roles based on their total voice activity.
-        This function is intended to be called by the Redbot scheduler.
+        Reconciles members' roles with their total voice activity.
+        Delta passes only check members marked dirty or currently in voice, read from the
+        gateway member cache.
+        A full pass runs first, then weekly or when promotion settings change; it only
+        pages members over REST if the guild is not chunked.
         """
-        log.info(f"Starting periodic role check for guild ID: {guild_id}")
         guild = self.bot.get_guild(guild_id)
         if not guild:
             log.error(f"Guild with ID {guild_id} not found for periodic role check.")
             return
 
-        members_checked = 0
-        promotions_made = 0
+        settings = await self.config.guild(guild).all()
+        fingerprint = (
+            settings["recruit_role_id"],
+            settings["member_role_id"],
+            settings["promotion_threshold_hours"],
+            settings["military_ranks"],
+        )
+        full = (
+            guild_id not in self.role_check_last_full
+            or time.time() - self.role_check_last_full[guild_id] >= self.ROLE_FULL_CHECK_INTERVAL
+            or self.role_check_fingerprints.get(guild_id) != fingerprint
+        )
+        dirty = self.role_check_dirty.pop(guild_id, set())
+        # Members in voice keep accruing minutes, so they're rechecked every pass
+        dirty.update(self.voice_tracking.get(guild_id, {}))
+        mode = "full" if full else "delta"
+        started = time.monotonic()
 
-        # Fetch all members to check. Using fetch_members() for full list, but be mindful of large guilds.
         try:
-            async for member in guild.fetch_members(limit=None): # Fetch all members
-                if member.bot:
-                    continue # Skip bots
-                
-                members_checked += 1
-                total_minutes = await self._get_user_voice_minutes(guild, member.id)
+            if full:
+                if guild.chunked:
+                    members = [m for m in guild.members if not m.bot]
+                else:
+                    mode = "rest"
+                    members = [m async for m in guild.fetch_members(limit=None) if not m.bot]
+            else:
+                members = [m for m in map(guild.get_member, dirty) if m is not None and not m.bot]
+        except discord.Forbidden:
+            log.error(f"Bot lacks permissions to fetch members in guild {guild.id} for periodic check. Ensure 'Server Members Intent' is enabled in bot settings.")
+            return
+
+        log.info(f"Starting {mode} role check for guild ID: {guild_id} ({len(members)} members)")
+        user_activity = settings["user_activity"]
+        progress = self.role_check_metrics["progress"] = {"mode": mode, "checked": 0, "total": len(members)}
+        promotions_made = 0
+
+        for i, member in enumerate(members, 1):
+            try:
+                total_minutes = user_activity.get(str(member.id), 0) + self._current_session_minutes(guild_id, member.id)
 
                 # _check_for_promotion handles both Recruit->Member and Military Ranks
                 initial_roles = {r.id for r in member.roles}
@@ -515,15 +569,37 @@ class ActivityTracker(commands.Cog):
                 if initial_roles != final_roles:
                     promotions_made += 1
                     log.info(f"Role change detected for {member.name} ({member.id}) during periodic check.")
-                
-                await asyncio.sleep(0.1) # Small delay to avoid hitting Discord/API rate limits too hard
-
-        except discord.Forbidden:
-            log.error(f"Bot lacks permissions to fetch members in guild {guild.id} for periodic check. Ensure 'Server Members Intent' is enabled in bot settings.")
-        except Exception as e:
-            log.exception(f"An unexpected error occurred during periodic role check for guild {guild.id}: {e}")
+            except Exception as e:
+                log.exception(f"An unexpected error occurred checking {member.name} during periodic role check: {e}")
+                self.role_check_dirty.setdefault(guild_id, set()).add(member.id)
+
+            progress["checked"] = i
+            if i % 50 == 0:
+                await asyncio.sleep(0)  # Let other tasks run during large passes
+
+        duration = time.monotonic() - started
+        metrics = self.role_check_metrics
+        if full:
+            self.role_check_last_full[guild_id] = time.time()
+            self.role_check_fingerprints[guild_id] = fingerprint
+            metrics["full_passes"] += 1
+        metrics.update(
+            passes=metrics["passes"] + 1,
+            total_changes=metrics["total_changes"] + promotions_made,
+            last_mode=mode,
+            last_checked=len(members),
+            last_changes=promotions_made,
+            last_duration=duration,
+            last_finished=time.time(),
+            progress=None,
+        )
+        log.info(f"Periodic {mode} role check complete for guild {guild.id}. Checked {len(members)} members, made {promotions_made} role changes in {duration:.1f}s.")
 
-        log.info(f"Periodic role check complete for guild {guild.id}. Checked {members_checked} members, made {promotions_made} role changes.")
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        """Queue members whose roles changed for the next role check."""
+        if not after.bot and before.roles != after.roles:
+            self.role_check_dirty.setdefault(after.guild.id, set()).add(after.id)
 
     # --- PROMOTION LOGIC ---
 
@@ -1088,6 +1164,19 @@ class ActivityTracker(commands.Cog):
             value=f"Currently tracking: {total_tracked} users",
             inline=False
         )
+        rc = self.role_check_metrics
+        if rc["progress"]:
+            rc_status = f"Running {rc['progress']['mode']} pass: {rc['progress']['checked']}/{rc['progress']['total']}"
+        elif rc["last_finished"]:
+            rc_status = f"Last {rc['last_mode']} pass: {rc['last_checked']} checked, {rc['last_changes']} changed in {rc['last_duration']:.1f}s"
+        else:
+            rc_status = "No pass yet"
+        dirty_total = sum(len(members) for members in self.role_check_dirty.values())
+        embed.add_field(
+            name="Role Check",
+            value=f"{rc_status}\nDirty members: {dirty_total}\nPasses: {rc['passes']} ({rc['full_passes']} full), changes: {rc['total_changes']}",
+            inline=False
+        )
         guild_id_env = os.environ.get("DISCORD_GUILD_ID", "Not set")
         embed.add_field(
             name="Environment Variables",
@@ -0,0 +1,124 @@
+"""
+Benchmark and cross-check ShiftScanner against the multi-pass matching it replaced.
+
+Not loaded by the cog. Run from the repository root, in the bot's environment:
+
+    python -m bl4shift.bench_scanner [--iterations N] [--keyword K ...] [FILE ...]
+
+Each FILE is read as one item's text; without files a few representative posts
+are used. Exits non-zero if the two implementations disagree on any input, or if
+ShiftScanner is slower than the matching it replaced.
+"""
+
+import argparse
+import re
+import sys
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+from .bl4shift import BL4_KEYWORDS, shift_scanner
+
+DEFAULT_KEYWORDS = ["shift", "code", "borderlands 4", "bl4", "golden key"]  # The cog's defaults
+
+SAMPLE_TEXTS = [
+    "Borderlands 4 SHIFT code: ABCDE-12345-FGHIJ-67890-KLMNO for 3 Golden Keys",
+    "New BL4 shift code ABCDE12345FGHIJ67890KLMNO expires Sunday",
+    "Patch notes for Borderlands 4: weapon balance and co-op fixes " * 20,
+    "Unrelated gaming news with no codes in it at all " * 20,
+    "BL4 shift code news " * 200,  # Keyword-heavy, no codes
+]
+
+
+# The multi-pass matching ShiftScanner replaced, kept as the baseline
+LEGACY_SHIFT_PATTERNS = [
+    r'[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}',  # Standard format
+    r'(?:SHIFT|CODE)[\s:]*([A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5})',
+    r'(?:SHIFT|CODE)[\s:]*([A-Z0-9]{25})',  # No dashes
+    r'\b[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}\b'  # Word boundary
+]
+
+
+def _legacy_scan(text: str, keywords: List[str]) -> Tuple[Set[str], bool]:
+    codes = set()
+    text_upper = text.upper()
+    for pattern in LEGACY_SHIFT_PATTERNS:
+        for match in re.findall(pattern, text_upper, re.IGNORECASE):
+            clean_code = re.sub(r'[^A-Z0-9]', '', match)
+            if len(clean_code) == 25:
+                codes.add(f"{clean_code[:5]}-{clean_code[5:10]}-{clean_code[10:15]}-{clean_code[15:20]}-{clean_code[20:25]}")
+    combined_text = text.lower()
+    related = any(k in combined_text for k in BL4_KEYWORDS) and any(k in combined_text for k in keywords)
+    return codes, related
+
+
+# Inputs where an anchor-based scanner is easy to get wrong; always checked for mismatches
+SCANNER_EDGE_CASES = [
+    "Borderlands 4 ABCDE-CODE1-FGHIJ-67890-KLMNO",  # Keyword inside a code
+    "BL4 SHIFT CODE: ABCDE12345FGHIJ67890KLMNO",  # Keyword where a code starts
+    "Borderlands 4 golden key AAAAA-BBBBB-CCCCC-DDDDD-EEEEE-FFFFF-GGGGG-HHHHH-IIIII-JJJJJ",  # Adjacent codes
+    "borderlands4 code abcde12345fghij67890klmnopqrst",  # Lowercase, longer than 25
+    "SHIFTAB-CDEFG-HIJKL-MNOPQ-RSTUV",  # Code starting inside a prefix
+    "CODE AAAAA-BBBBB-CCCCC-DDDDD-EEEE\u212a-FFFFF-GGGGG-HHHHH-IIIII-JJJJJ",  # Kelvin sign still blocks an overlap
+    "SH\u0130FT: ABCDE12345FGHIJ67890KLMNO",  # Dotted I matched the old IGNORECASE prefix
+]
+
+
+def benchmark_shift_scanner(texts: List[str], keywords: List[str], iterations: int = 200) -> Dict[str, Any]:
+    """
+    Time the legacy multi-pass matching against ShiftScanner over the same texts.
+    Also counts texts (plus SCANNER_EDGE_CASES) where the two disagree, so a speedup
+    can't hide a behaviour change.
+    """
+    keywords = [keyword.lower() for keyword in keywords if keyword]
+    scanner = shift_scanner(keywords)
+    
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            _legacy_scan(text, keywords)
+    legacy_ms = (time.perf_counter() - started) * 1000
+    
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            scanner.scan(text)
+    scanner_ms = (time.perf_counter() - started) * 1000
+    
+    return {
+        "texts": len(texts),
+        "chars": sum(len(text) for text in texts),
+        "iterations": iterations,
+        "legacy_ms": legacy_ms,
+        "scanner_ms": scanner_ms,
+        "speedup": legacy_ms / scanner_ms if scanner_ms else float("inf"),
+        "mismatches": sum(
+            1 for text in texts + SCANNER_EDGE_CASES if _legacy_scan(text, keywords) != scanner.scan(text)
+        ),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="*", help="files to scan, one item per file")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--keyword", action="append", dest="keywords",
+                        help="guild keyword (repeatable, default: the cog's defaults)")
+    args = parser.parse_args(argv)
+    
+    texts = []
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            texts.append(f.read())
+    result = benchmark_shift_scanner(texts or SAMPLE_TEXTS, args.keywords or DEFAULT_KEYWORDS, max(1, args.iterations))
+    
+    print(f"{result['texts']} items ({result['chars']} chars) x {result['iterations']} iterations")
+    print(f"Multi-pass: {result['legacy_ms']:.1f} ms")
+    print(f"Scanner:    {result['scanner_ms']:.1f} ms ({result['speedup']:.1f}x)")
+    print(f"Mismatches: {result['mismatches']}")
+    if result["speedup"] < 1:
+        print("FAIL: ShiftScanner is slower than the multi-pass matching")
+    return 1 if result["mismatches"] or result["speedup"] < 1 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
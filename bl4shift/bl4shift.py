@@ -1,19 +1,214 @@
 import asyncio
+import functools
+import os
 import re
 import logging
+import sqlite3
+import threading
+import time
 import xml.etree.ElementTree as ET
 from datetime import datetime, timezone
-from typing import Optional, Set, Dict, Any, List
+from typing import Optional, Set, Dict, Any, List, Tuple
 import hashlib
 
 import aiohttp
 import discord
 from redbot.core import commands, Config, checks
 from redbot.core.bot import Red
+from redbot.core.data_manager import cog_data_path
 from redbot.core.utils.chat_formatting import box, pagify
 
+from .feed_fetcher import ConditionalFeedFetcher
+
 log = logging.getLogger("red.bl4shift")
 
+class SeenItemStore:
+    """
+    Per-guild record of feed items already posted, kept in SQLite.
+    
+    Membership checks only look up the items being asked about, and recording a post
+    is a single-row insert instead of rewriting the guild's whole history in Config.
+    Rows older than `ttl` are pruned; feeds only carry recent items, so an expired ID
+    doesn't come back.
+    """
+    
+    def __init__(self, path: str, ttl: int = 180 * 86400):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen_items ("
+            "guild_id INTEGER NOT NULL, item_id TEXT NOT NULL, codes TEXT, source TEXT, posted_at REAL NOT NULL, "
+            "PRIMARY KEY (guild_id, item_id)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_items_posted_at ON seen_items (posted_at)")
+        self._db.commit()
+        self.last_prune = 0.0  # The monitor loop prunes on its first cycle
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+    
+    def seen(self, guild_id: int, item_ids: List[str]) -> Set[str]:
+        """The subset of item_ids already posted in the guild."""
+        item_ids = list(dict.fromkeys(item_ids))
+        found = set()
+        with self._lock:
+            for i in range(0, len(item_ids), 500):  # Stay under SQLite's bound-parameter limit
+                chunk = item_ids[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT item_id FROM seen_items WHERE guild_id = ? AND item_id IN ({','.join('?' * len(chunk))})",
+                    (guild_id, *chunk)
+                )
+                found.update(row[0] for row in rows)
+        return found
+    
+    def add(self, guild_id: int, item_id: str, codes: List[str], source: str, posted_at: Optional[float] = None):
+        self.add_many(guild_id, [(item_id, codes, source, posted_at)])
+    
+    def add_many(self, guild_id: int, items: List[tuple]):
+        """Record (item_id, codes, source, posted_at) tuples; posted_at None means now."""
+        now = time.time()
+        rows = [(guild_id, item_id, ",".join(codes), source, posted_at or now) for item_id, codes, source, posted_at in items]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO seen_items VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+    
+    def count(self, guild_id: int) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM seen_items WHERE guild_id = ?", (guild_id,)).fetchone()[0]
+    
+    def clear(self, guild_id: int) -> int:
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM seen_items WHERE guild_id = ?", (guild_id,)).rowcount
+            self._db.commit()
+        return deleted
+    
+    def prune(self) -> int:
+        """Drop rows older than the TTL. Returns how many were removed."""
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM seen_items WHERE posted_at < ?", (time.time() - self.ttl,)).rowcount
+            self._db.commit()
+        self.last_prune = time.time()
+        return deleted
+    
+    # Async wrappers: queries, commits and pruning run in the default executor, off the event loop
+    
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+    
+    async def aseen(self, guild_id: int, item_ids: List[str]) -> Set[str]:
+        return await self._run(self.seen, guild_id, item_ids)
+    
+    async def aadd(self, guild_id: int, item_id: str, codes: List[str], source: str, posted_at: Optional[float] = None):
+        await self._run(self.add, guild_id, item_id, codes, source, posted_at)
+    
+    async def aadd_many(self, guild_id: int, items: List[tuple]):
+        await self._run(self.add_many, guild_id, items)
+    
+    async def acount(self, guild_id: int) -> int:
+        return await self._run(self.count, guild_id)
+    
+    async def aclear(self, guild_id: int) -> int:
+        return await self._run(self.clear, guild_id)
+    
+    async def aprune(self) -> int:
+        return await self._run(self.prune)
+
+
+BL4_KEYWORDS = ("borderlands 4", "bl4", "borderlands4")
+
+
+class ShiftScanner:
+    """
+    Finds SHIFT codes and keyword hits in an item's text.
+    
+    Keywords are plain substring checks on the lowercased text. Codes are found from
+    anchors instead of trying every pattern at every position: each dash is checked
+    as the first dash of a dashed code, and one pass over the SHIFT/CODE prefixes
+    checks what follows them. The old per-pattern findall passes are then reproduced
+    from those anchors, each with its own end cursor so overlapping matches are
+    skipped exactly as before. Get scanners from `shift_scanner()`, which keeps one
+    per keyword set.
+    """
+    
+    # İ and the Kelvin sign survive upper() but matched [A-Z] under the old
+    # re.IGNORECASE; they still take part in matching, and codes containing them
+    # are dropped afterwards, as the old cleanup did.
+    CODE_CHAR = "[A-Z0-9\u0130\u212a]"
+    DASHED = re.compile(f"{CODE_CHAR}{{5}}(?:-{CODE_CHAR}{{5}}){{4}}")
+    DASHED_LENGTH = 29
+    RAW = re.compile(f"{CODE_CHAR}{{25}}")
+    PREFIX = re.compile(r"(?:SHIFT|CODE)[\s:]*")
+    
+    def __init__(self, keywords: Tuple[str, ...]):
+        self.keywords = keywords
+    
+    def scan(self, text: str) -> Tuple[Set[str], bool]:
+        """(SHIFT codes in standard dashed form, whether the text mentions BL4 and a keyword)."""
+        lowered = text.lower()
+        related = any(k in lowered for k in BL4_KEYWORDS) and any(k in lowered for k in self.keywords)
+        return self._codes(text.upper()), related
+    
+    def _codes(self, upper: str) -> Set[str]:
+        length = self.DASHED_LENGTH
+        starts = []
+        dash = upper.find("-")
+        while dash >= 0:
+            if dash >= 5 and self.DASHED.match(upper, dash - 5):
+                starts.append(dash - 5)
+            dash = upper.find("-", dash + 1)
+        
+        found = []
+        end = bounded_end = 0
+        for start in starts:
+            if start >= end:
+                found.append(upper[start:start + length])
+                end = start + length
+            if (start >= bounded_end and (start == 0 or not _is_word(upper[start - 1]))
+                    and (start + length >= len(upper) or not _is_word(upper[start + length]))):
+                found.append(upper[start:start + length])
+                bounded_end = start + length
+        
+        folded = upper.replace("\u0130", "I") if "\u0130" in upper else upper  # Same length, so positions line up
+        if "SHIFT" in folded or "CODE" in folded:
+            start_set = set(starts)
+            dashed_end = raw_end = 0
+            for match in self.PREFIX.finditer(folded):
+                code_start = match.end()
+                if match.start() >= dashed_end and code_start in start_set:
+                    found.append(upper[code_start:code_start + length])
+                    dashed_end = code_start + length
+                if match.start() >= raw_end:
+                    raw = self.RAW.match(upper, code_start)
+                    if raw:
+                        found.append(raw.group())
+                        raw_end = raw.end()
+        
+        codes = set()
+        for code in found:
+            clean_code = code.replace("-", "")
+            if clean_code.isascii():
+                codes.add(f"{clean_code[:5]}-{clean_code[5:10]}-{clean_code[10:15]}-{clean_code[15:20]}-{clean_code[20:25]}")
+        return codes
+
+
+def _is_word(char: str) -> bool:
+    """Whether regex \\b treats the character as part of a word."""
+    return char.isalnum() or char == "_"
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_scanner(keywords: Tuple[str, ...]) -> ShiftScanner:
+    return ShiftScanner(keywords)
+
+
+def shift_scanner(keywords) -> ShiftScanner:
+    """The scanner for a keyword list; guilds with the same keywords share one."""
+    return _cached_scanner(tuple(sorted({keyword.lower() for keyword in keywords if keyword})))
+
+
 class BL4ShiftCodes(commands.Cog):
     """Monitor multiple sources for Borderlands 4 SHIFT codes and post to Discord."""
     
@@ -26,7 +221,7 @@ class BL4ShiftCodes(commands.Cog):
             "channel_id": None,
             "check_interval": 300,  # 5 minutes
             "keywords": ["shift", "code", "borderlands 4", "bl4", "golden key"],
-            "posted_codes": {},  # Track posted codes to avoid duplicates
+            "posted_codes": {},  # Legacy posted-item history; moved into the SeenItemStore on load
             "use_forum": False,  # Whether to use forum channels
             "thread_name_template": "SHIFT Codes - {date}",  # Template for thread names
             "create_new_thread_daily": False,  # Create new thread each day
@@ -43,14 +238,6 @@ class BL4ShiftCodes(commands.Cog):
         
         self.config.register_guild(**default_guild)
         
-        # SHIFT code patterns (improved)
-        self.shift_patterns = [
-            r'[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}',  # Standard format
-            r'(?:SHIFT|CODE)[\s:]*([A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5})',
-            r'(?:SHIFT|CODE)[\s:]*([A-Z0-9]{25})',  # No dashes
-            r'\b[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}\b'  # Word boundary
-        ]
-        
         # Sources to monitor
         self.sources = {
             "gearbox_rss": {
@@ -81,11 +268,16 @@ class BL4ShiftCodes(commands.Cog):
         }
         
         self.session: Optional[aiohttp.ClientSession] = None
+        # Conditional requests and adaptive per-source polling, shared by every guild
+        self.fetcher = ConditionalFeedFetcher(min_interval=120, initial_interval=300, max_interval=3600)
         self.monitor_task: Optional[asyncio.Task] = None
+        # Items already posted per guild, with TTL pruning
+        self.seen_items = SeenItemStore(str(cog_data_path(self) / "seen_items.sqlite3"))
         
     async def cog_load(self):
         """Initialize the cog."""
         self.session = aiohttp.ClientSession()
+        await self._migrate_posted_codes()
         await self._start_monitoring_tasks()
         
     async def cog_unload(self):
@@ -94,6 +286,24 @@ class BL4ShiftCodes(commands.Cog):
             self.monitor_task.cancel()
         if self.session and not self.session.closed:
             await self.session.close()
+        self.seen_items.close()
+    
+    async def _migrate_posted_codes(self):
+        """Move any posted_codes history left in Config into the seen-item store."""
+        for guild_id, settings in (await self.config.all_guilds()).items():
+            posted_codes = settings.get("posted_codes") or {}
+            if not posted_codes:
+                continue
+            items = []
+            for item_id, info in posted_codes.items():
+                try:
+                    posted_at = datetime.fromisoformat(info.get("timestamp")).timestamp()
+                except (TypeError, ValueError):
+                    posted_at = None
+                items.append((item_id, info.get("codes", []), info.get("source", ""), posted_at))
+            await self.seen_items.aadd_many(guild_id, items)
+            await self.config.guild_from_id(guild_id).posted_codes.clear()
+            log.info(f"Moved {len(items)} posted items for guild {guild_id} into the seen-item store")
             
     async def _start_monitoring_tasks(self):
         """Start monitoring tasks for configured guilds."""
@@ -102,30 +312,29 @@ class BL4ShiftCodes(commands.Cog):
         
         self.monitor_task = asyncio.create_task(self._monitor_sources())
         
-    async def _fetch_rss_feed(self, url: str, source_name: str) -> List[Dict[str, Any]]:
-        """Fetch and parse RSS feed."""
+    async def _fetch_rss_feed(self, url: str, source_name: str, force: bool = False) -> List[Dict[str, Any]]:
+        """
+        Fetch and parse RSS feed.
+        
+        Goes through the conditional fetcher: an unchanged feed, or one that isn't due for a poll
+        yet (unless forced), returns the items from its last parse.
+        """
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Accept": "application/rss+xml, application/xml, text/xml, text/plain, */*"
         }
         
         try:
-            async with self.session.get(url, headers=headers, timeout=30) as response:
-                if response.status == 200:
-                    content = await response.text()
-                    return self._parse_rss(content, source_name)
-                else:
-                    log.warning(f"RSS fetch failed for {source_name}: HTTP {response.status}")
-                    return []
-        except asyncio.TimeoutError:
-            log.warning(f"RSS fetch timeout for {source_name}")
-            return []
+            items, _ = await self.fetcher.fetch(
+                self.session, url, lambda body: self._parse_rss(body, source_name), headers=headers, force=force
+            )
+            return items or []
         except Exception as e:
             log.error(f"RSS fetch error for {source_name}: {e}")
             return []
     
-    def _parse_rss(self, content: str, source_name: str) -> List[Dict[str, Any]]:
-        """Parse RSS XML content."""
+    def _parse_rss(self, content, source_name: str) -> List[Dict[str, Any]]:
+        """Parse RSS XML content (str, or bytes so the XML declaration decides the encoding)."""
         try:
             root = ET.fromstring(content)
             items = []
@@ -165,35 +374,12 @@ class BL4ShiftCodes(commands.Cog):
             return []
     
     def _extract_shift_codes(self, text: str) -> Set[str]:
-        """Extract SHIFT codes from text using regex patterns."""
-        codes = set()
-        text_upper = text.upper()
-        
-        for pattern in self.shift_patterns:
-            matches = re.findall(pattern, text_upper, re.IGNORECASE)
-            for match in matches:
-                # Handle tuple results from capture groups
-                if isinstance(match, tuple):
-                    match = match[0] if match else ""
-                
-                # Remove existing dashes and add them back in standard format
-                clean_code = re.sub(r'[^A-Z0-9]', '', match)
-                if len(clean_code) == 25:
-                    formatted_code = f"{clean_code[:5]}-{clean_code[5:10]}-{clean_code[10:15]}-{clean_code[15:20]}-{clean_code[20:25]}"
-                    codes.add(formatted_code)
-                    
-        return codes
+        """Extract SHIFT codes from text."""
+        return shift_scanner(()).scan(text)[0]
     
     def _is_bl4_related(self, title: str, text: str, keywords: list) -> bool:
-        """Check if content is related to Borderlands 4."""
-        combined_text = f"{title} {text}".lower()
-        bl4_keywords = ["borderlands 4", "bl4", "borderlands4"]
-        
-        # Must contain BL4 reference AND shift/code keywords
-        has_bl4 = any(keyword in combined_text for keyword in bl4_keywords)
-        has_shift = any(keyword in combined_text for keyword in keywords)
-        
-        return has_bl4 and has_shift
+        """Check if content is related to Borderlands 4 (a BL4 reference AND a shift/code keyword)."""
+        return shift_scanner(keywords).scan(f"{title} {text}")[1]
     
     async def _get_or_create_thread(self, guild, channel, guild_config) -> Optional[discord.Thread]:
         """Get existing thread or create new one for posting codes."""
@@ -316,79 +502,78 @@ class BL4ShiftCodes(commands.Cog):
         
         while not self.bot.is_closed():
             try:
+                all_guilds = await self.config.all_guilds()
+                targets = []
                 for guild in self.bot.guilds:
-                    guild_config = self.config.guild(guild)
-                    
-                    channel_id = await guild_config.channel_id()
-                    if not channel_id:
+                    settings = all_guilds.get(guild.id)
+                    if not settings or not settings.get("channel_id"):
                         continue
-                        
-                    channel = guild.get_channel(channel_id)
-                    if not channel:
+                    channel = guild.get_channel(settings["channel_id"])
+                    if channel:
+                        targets.append((guild, channel, settings))
+                
+                # Each item is scanned once per keyword set per cycle, however many guilds share it
+                scans = {}
+                for source_id, source_info in self.sources.items():
+                    subscribers = [t for t in targets if t[2].get("enabled_sources", {}).get(source_id, True)]
+                    if not subscribers:
                         continue
                     
-                    keywords = await guild_config.keywords()
-                    posted_codes = await guild_config.posted_codes()
-                    enabled_sources = await guild_config.enabled_sources()
-                    last_check_times = await guild_config.last_check_times()
+                    try:
+                        log.info(f"Checking {source_info['name']} for {len(subscribers)} guild(s)")
+                        items = await self._fetch_rss_feed(source_info['url'], source_info['name'])
+                    except Exception as e:
+                        log.error(f"Error checking {source_info['name']}: {e}")
+                        items = []
                     
-                    # Check each enabled source
-                    for source_id, source_info in self.sources.items():
-                        if not enabled_sources.get(source_id, True):
-                            continue
+                    for guild, channel, settings in subscribers if items else []:
+                        scanner = shift_scanner(settings.get("keywords", []))
+                        seen = await self.seen_items.aseen(guild.id, [item.get("id", "") for item in items])
                         
-                        try:
-                            log.info(f"Checking {source_info['name']} for guild {guild.name}")
-                            items = await self._fetch_rss_feed(source_info['url'], source_info['name'])
+                        for item in items:
+                            item_id = item.get("id", "")
                             
-                            for item in items:
-                                item_id = item.get("id", "")
-                                title = item.get("title", "")
-                                description = item.get("description", "")
-                                
-                                # Skip if already processed
-                                if item_id in posted_codes:
-                                    continue
-                                
-                                # Check if BL4 related
-                                if not self._is_bl4_related(title, description, keywords):
-                                    continue
-                                
-                                # Extract SHIFT codes
-                                codes = self._extract_shift_codes(f"{title} {description}")
+                            # Skip if already processed
+                            if item_id in seen:
+                                continue
+                            
+                            key = (scanner, item_id)
+                            if key not in scans:
+                                scans[key] = scanner.scan(f"{item.get('title', '')} {item.get('description', '')}")
+                            codes, is_related = scans[key]
+                            
+                            # Must be BL4 related and contain SHIFT codes
+                            if not is_related or not codes:
+                                continue
+                            
+                            try:
+                                embed = await self._create_embed(item, codes, source_info['name'])
+                                result = await self._post_to_channel_or_thread(guild, channel, embed, self.config.guild(guild))
                                 
-                                if codes:
-                                    try:
-                                        embed = await self._create_embed(item, codes, source_info['name'])
-                                        result = await self._post_to_channel_or_thread(guild, channel, embed, guild_config)
-                                        
-                                        if result:
-                                            # Mark as posted
-                                            posted_codes[item_id] = {
-                                                "codes": list(codes),
-                                                "timestamp": datetime.now(timezone.utc).isoformat(),
-                                                "source": source_info['name']
-                                            }
-                                            await guild_config.posted_codes.set(posted_codes)
-                                            
-                                            log.info(f"Posted SHIFT codes from {source_info['name']} to {guild.name}: {codes}")
-                                            
-                                    except Exception as e:
-                                        log.error(f"Error posting codes from {source_info['name']}: {e}")
-                        
-                        except Exception as e:
-                            log.error(f"Error checking {source_info['name']}: {e}")
-                        
-                        # Small delay between sources
-                        await asyncio.sleep(2)
+                                if result:
+                                    # Mark as posted
+                                    await self.seen_items.aadd(guild.id, item_id, sorted(codes), source_info['name'])
+                                    seen.add(item_id)
+                                    
+                                    log.info(f"Posted SHIFT codes from {source_info['name']} to {guild.name}: {codes}")
+                                    
+                            except Exception as e:
+                                log.error(f"Error posting codes from {source_info['name']}: {e}")
+                    
+                    # Small delay between sources
+                    await asyncio.sleep(2)
                 
                 # Wait before next check cycle
                 interval = 300  # Default 5 minutes
-                if self.bot.guilds:
-                    for guild in self.bot.guilds:
-                        interval = await self.config.guild(guild).check_interval()
-                        if interval:
-                            break
+                for guild in self.bot.guilds:
+                    interval = all_guilds.get(guild.id, {}).get("check_interval", 300)
+                    if interval:
+                        break
+                
+                if time.time() - self.seen_items.last_prune > 86400:
+                    pruned = await self.seen_items.aprune()
+                    if pruned:
+                        log.info(f"Pruned {pruned} expired posted items")
                 
                 log.info(f"Completed check cycle, waiting {interval} seconds")
                 await asyncio.sleep(interval)
@@ -574,9 +759,32 @@ class BL4ShiftCodes(commands.Cog):
         total_count = len(self.sources)
         embed.add_field(name="Active Sources", value=f"{enabled_count}/{total_count}", inline=True)
         embed.add_field(name="Status", value="✅ Active" if channel else "❌ Inactive", inline=True)
+        embed.add_field(name="Posted Items", value=str(await self.seen_items.acount(ctx.guild.id)), inline=True)
         
         await ctx.send(embed=embed)
     
+    @bl4shift.command(name="feedstats")
+    @checks.is_owner()
+    async def feed_stats(self, ctx):
+        """Show per-source fetch stats: bytes, 304 hit rate, parse time and polling interval."""
+        if not self.fetcher.sources:
+            await ctx.send("No sources have been fetched yet.")
+            return
+        
+        names = {info["url"]: info["name"] for info in self.sources.values()}
+        lines = []
+        for url, state in self.fetcher.sources.items():
+            hit_rate = state["not_modified"] / state["requests"] * 100 if state["requests"] else 0
+            avg_parse = state["parse_ms"] / state["parses"] if state["parses"] else 0
+            lines.append(
+                f"{names.get(url, url)}\n"
+                f"  {state['requests']} polls, {hit_rate:.0f}% 304, {state['bytes'] / 1024:.0f} KiB, "
+                f"{state['parses']} parses (avg {avg_parse:.1f} ms), {state['failures']} failures, "
+                f"every {state['interval'] / 60:.0f} min"
+            )
+        for page in pagify("\n".join(lines)):
+            await ctx.send(box(page))
+    
     @bl4shift.command(name="check")
     async def manual_check(self, ctx):
         """Manually trigger a check for new SHIFT codes from all sources."""
@@ -593,8 +801,7 @@ class BL4ShiftCodes(commands.Cog):
         await ctx.send("🔍 Checking all sources for new SHIFT codes...")
         
         guild_config = self.config.guild(ctx.guild)
-        keywords = await guild_config.keywords()
-        posted_codes = await guild_config.posted_codes()
+        scanner = shift_scanner(await guild_config.keywords())
         enabled_sources = await guild_config.enabled_sources()
         
         found_new = False
@@ -608,32 +815,26 @@ class BL4ShiftCodes(commands.Cog):
             sources_checked += 1
             
             try:
-                items = await self._fetch_rss_feed(source_info['url'], source_info['name'])
+                items = await self._fetch_rss_feed(source_info['url'], source_info['name'], force=True)
+                seen = await self.seen_items.aseen(ctx.guild.id, [item.get("id", "") for item in items[:5]])
                 
                 for item in items[:5]:  # Check recent 5 items per source
                     item_id = item.get("id", "")
-                    title = item.get("title", "")
-                    description = item.get("description", "")
                     
-                    if item_id in posted_codes:
+                    if item_id in seen:
                         continue
                     
-                    if not self._is_bl4_related(title, description, keywords):
+                    codes, is_related = scanner.scan(f"{item.get('title', '')} {item.get('description', '')}")
+                    if not is_related:
                         continue
                     
-                    codes = self._extract_shift_codes(f"{title} {description}")
-                    
                     if codes:
                         embed = await self._create_embed(item, codes, source_info['name'])
                         result = await self._post_to_channel_or_thread(ctx.guild, channel, embed, guild_config)
                         
                         if result:
-                            posted_codes[item_id] = {
-                                "codes": list(codes),
-                                "timestamp": datetime.now(timezone.utc).isoformat(),
-                                "source": source_info['name']
-                            }
-                            await guild_config.posted_codes.set(posted_codes)
+                            await self.seen_items.aadd(ctx.guild.id, item_id, sorted(codes), source_info['name'])
+                            seen.add(item_id)
                             
                             found_new = True
                             total_codes.update(codes)
@@ -661,8 +862,8 @@ class BL4ShiftCodes(commands.Cog):
     @bl4shift.command(name="clearcache")
     async def clear_cache(self, ctx):
         """Clear the cache of posted codes."""
-        await self.config.guild(ctx.guild).posted_codes.set({})
-        await ctx.send("✅ Posted codes cache cleared.")
+        cleared = await self.seen_items.aclear(ctx.guild.id)
+        await ctx.send(f"✅ Posted codes cache cleared ({cleared} item(s)).")
     
     @bl4shift.command(name="debug")
     async def debug_sources(self, ctx, source_name: str = None):
@@ -686,7 +887,7 @@ class BL4ShiftCodes(commands.Cog):
             await ctx.send(f"\n**🔍 Checking {source_info['name']}**")
             
             try:
-                items = await self._fetch_rss_feed(source_info['url'], source_info['name'])
+                items = await self._fetch_rss_feed(source_info['url'], source_info['name'], force=True)
                 
                 if not items:
                     await ctx.send(f"❌ No items retrieved from {source_info['name']}")
@@ -699,11 +900,8 @@ class BL4ShiftCodes(commands.Cog):
                     title = item.get("title", "No title")
                     description = item.get("description", "No description")
                     
-                    # Check BL4 relevance
-                    is_bl4 = self._is_bl4_related(title, description, keywords)
-                    
-                    # Extract codes
-                    codes = self._extract_shift_codes(f"{title} {description}")
+                    # Check BL4 relevance and extract codes
+                    codes, is_bl4 = shift_scanner(keywords).scan(f"{title} {description}")
                     
                     status_parts = []
                     if is_bl4:
@@ -745,7 +943,7 @@ class BL4ShiftCodes(commands.Cog):
         await ctx.send(f"🧪 Testing RSS feed: {url}")
         
         try:
-            items = await self._fetch_rss_feed(url, "Manual Test")
+            items = await self._fetch_rss_feed(url, "Manual Test", force=True)
             
             if not items:
                 await ctx.send("❌ No items retrieved or RSS parsing failed")
@@ -790,7 +988,7 @@ class BL4ShiftCodes(commands.Cog):
         await ctx.send(f"🧪 Testing RSS feed: {url}")
         
         try:
-            items = await self._fetch_rss_feed(url, f"Test - {source_id}")
+            items = await self._fetch_rss_feed(url, f"Test - {source_id}", force=True)
             
             if not items:
                 await ctx.send("❌ Could not retrieve items from this RSS feed")
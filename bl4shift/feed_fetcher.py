@@ -0,0 +1,123 @@
+"""
+Conditional, adaptively polled feed fetching, shared by GameUpdates and BL4Shift.
+
+Each cog is installed on its own, so this module is kept byte-identical in
+gameupdates/ and bl4shift/. gameupdates/feed_fetcher.py is the canonical
+copy: change it there, then copy it across.
+"""
+
+import asyncio
+import hashlib
+import logging
+import random
+import time
+
+import aiohttp
+
+log = logging.getLogger(f"red.{__name__}")
+
+
+class ConditionalFeedFetcher:
+    """
+    Fetches feeds with conditional requests and per-feed adaptive polling.
+    
+    Each feed's ETag and Last-Modified are sent back on the next request, so an unchanged
+    feed costs a 304 and no parsing; the previous parse is returned instead. Feeds that
+    change often are polled down to min_interval, quiet ones back off towards max_interval,
+    and failures back off exponentially with jitter. Per-feed stats are kept in `sources`.
+    """
+
+    def __init__(self, min_interval=300, initial_interval=600, max_interval=3600):
+        self.min_interval = min_interval
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.sources = {}  # {url: state and stats}
+
+    def _state(self, url):
+        return self.sources.setdefault(url, {
+            "etag": None, "last_modified": None, "digest": None, "result": None,
+            "interval": self.initial_interval, "next_poll": 0.0, "errors": 0,
+            "requests": 0, "not_modified": 0, "changed": 0, "failures": 0,
+            "bytes": 0, "parses": 0, "parse_ms": 0.0, "last_parse_ms": 0.0, "last_status": None,
+        })
+
+    def _reschedule(self, state, changed):
+        """Halve the interval when the feed changed, stretch it when it didn't."""
+        state["errors"] = 0
+        if changed:
+            state["interval"] = max(self.min_interval, state["interval"] / 2)
+        else:
+            state["interval"] = min(self.max_interval, state["interval"] * 1.25)
+        state["next_poll"] = time.time() + state["interval"] * random.uniform(0.9, 1.1)
+
+    def _backoff(self, state):
+        state["errors"] += 1
+        state["failures"] += 1
+        delay = min(self.min_interval * 2 ** (state["errors"] - 1), self.max_interval)
+        state["next_poll"] = time.time() + random.uniform(delay / 2, delay)
+
+    def is_due(self, url):
+        return time.time() >= self._state(url)["next_poll"]
+
+    async def fetch(self, session, url, parse, headers=None, force=False):
+        """
+        Returns (result, changed). `result` is parse(body), run in an executor, or the previous
+        result if the feed is unchanged, not due for a poll yet (unless `force`), or failed.
+        It is None until the feed has been fetched once.
+        """
+        state = self._state(url)
+        if not force and time.time() < state["next_poll"]:
+            return state["result"], False
+        
+        request_headers = dict(headers or {})
+        if state["etag"]:
+            request_headers["If-None-Match"] = state["etag"]
+        if state["last_modified"]:
+            request_headers["If-Modified-Since"] = state["last_modified"]
+        
+        state["requests"] += 1
+        try:
+            async with session.get(url, headers=request_headers) as resp:
+                state["last_status"] = resp.status
+                if resp.status == 304:
+                    state["not_modified"] += 1
+                    self._reschedule(state, changed=False)
+                    return state["result"], False
+                if resp.status != 200:
+                    log.warning(f"Feed fetch failed for {url}: HTTP {resp.status}")
+                    self._backoff(state)
+                    return state["result"], False
+                body = await resp.read()
+                etag = resp.headers.get("ETag")
+                last_modified = resp.headers.get("Last-Modified")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.warning(f"Feed fetch error for {url}: {e!r}")
+            self._backoff(state)
+            return state["result"], False
+        
+        state["bytes"] += len(body)
+        digest = hashlib.sha1(body).hexdigest()
+        if digest == state["digest"]:
+            # The server ignored the conditional headers but sent the same feed
+            state["etag"], state["last_modified"] = etag, last_modified
+            self._reschedule(state, changed=False)
+            return state["result"], False
+        
+        started = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, parse, body)
+        except Exception as e:
+            log.error(f"Feed parse error for {url}: {e}")
+            self._backoff(state)
+            return state["result"], False
+        parse_ms = (time.perf_counter() - started) * 1000
+        state["parses"] += 1
+        state["parse_ms"] += parse_ms
+        state["last_parse_ms"] = parse_ms
+        
+        # Validators are only kept once the body behind them has been parsed
+        state["etag"], state["last_modified"] = etag, last_modified
+        state["digest"], state["result"] = digest, result
+        state["changed"] += 1
+        self._reschedule(state, changed=True)
+        return result, True
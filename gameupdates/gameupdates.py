@@ -1,11 +1,18 @@
 import discord
 from redbot.core import commands, Config
+from redbot.core.utils.chat_formatting import box, pagify
+import aiohttp
 import feedparser
 import asyncio
+import hashlib
 import re
 import html
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 
+from .feed_fetcher import ConditionalFeedFetcher
+
 # Initial game feeds dictionary
 GAME_FEEDS = {
     "squad": "https://store.steampowered.com/feeds/news/app/393380/",
@@ -46,6 +53,11 @@ class GameConverter(commands.Converter):
 class GameUpdates(commands.Cog):
     """Fetch and post patch notes for many games to channels, threads, or forums."""
 
+    FEED_CONCURRENCY = 5  # Feeds downloaded at once per check
+    CLEAN_CACHE_SIZE = 1024  # Cleaned HTML fragments kept in memory
+    LOOP_INTERVAL = 120  # Seconds between checks; each feed is only polled when its own interval is up
+    GUILD_CONCURRENCY = 10  # Guilds posting updates at once per check
+
     def __init__(self, bot):
         self.bot = bot
         self.config = Config.get_conf(self, identifier=1234567894)
@@ -61,9 +73,24 @@ class GameUpdates(commands.Cog):
         # Task management
         self.bg_task = None
         self.is_running = True
+        
+        # One HTTP session shared by every feed fetch
+        self.session = None
+        # Conditional requests and per-feed polling intervals; the loop ticks every LOOP_INTERVAL seconds
+        self.fetcher = ConditionalFeedFetcher(min_interval=300, initial_interval=600, max_interval=3600)
+        self._feed_updates = {}  # {feed_url: updates from the last parse}
+        
+        # HTML cleaning runs off the event loop; results are memoized by content hash
+        self.clean_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="gameupdates-clean")
+        self._cleaned = OrderedDict()  # {sha1 of HTML: cleaned text}, least recently used first
+        self._cleaning = {}  # {sha1 of HTML: (pool job, index in its batch)} for jobs in flight
 
     async def cog_load(self):
         """Called when the cog is loaded."""
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=30),
+            headers={"User-Agent": feedparser.USER_AGENT}
+        )
         await self._load_permanent_games()
         self.bg_task = asyncio.create_task(self._update_loop())
         
@@ -72,6 +99,9 @@ class GameUpdates(commands.Cog):
         self.is_running = False
         if self.bg_task:
             self.bg_task.cancel()
+        if self.session:
+            await self.session.close()
+        self.clean_pool.shutdown(wait=False)
 
     async def _load_permanent_games(self):
         """Load permanent games from config and add them to GAME_FEEDS."""
@@ -94,8 +124,8 @@ class GameUpdates(commands.Cog):
                 # Log the error but don't crash the loop
                 print(f"Error in update loop: {e}")
             
-            # Wait 10 minutes before checking again
-            await asyncio.sleep(600)
+            # Feeds that aren't due yet are skipped by the fetcher
+            await asyncio.sleep(self.LOOP_INTERVAL)
     
     def clean_html(self, html_content):
         """Clean HTML content to make it readable in Discord."""
@@ -131,11 +161,20 @@ class GameUpdates(commands.Cog):
             text = re.sub(r'<[^>]+>', '', html_content)
             return html.unescape(text).strip()
 
-    async def fetch_patch_notes(self, url, game):
-        """Fetch and parse patch notes from an RSS feed."""
-        loop = asyncio.get_event_loop()
+    async def fetch_patch_notes(self, url, game, force=False):
+        """
+        Fetch and parse patch notes from an RSS feed.
+        
+        Unchanged feeds (304 or identical body) and feeds not yet due for a poll
+        return the updates from the last parse. Entries keep their raw HTML in
+        raw_title/raw_content; only the ones that get posted are cleaned (see _clean_updates).
+        """
         try:
-            feed = await loop.run_in_executor(None, feedparser.parse, url)
+            feed, changed = await self.fetcher.fetch(self.session, url, feedparser.parse, force=force)
+            if feed is None:
+                return []
+            if not changed and url in self._feed_updates:
+                return self._feed_updates[url]
             updates = []
             for entry in feed.entries:
                 # Try to filter for patch/update notes
@@ -145,24 +184,85 @@ class GameUpdates(commands.Cog):
                     if not content:
                         content = getattr(entry, 'summary', '')
                     
-                    # Clean the HTML content
-                    cleaned_content = self.clean_html(content)
-                    
-                    # Clean the title
-                    clean_title = self.clean_html(entry.title)
-                    
                     updates.append({
                         "id": getattr(entry, "id", getattr(entry, "link", None)),
-                        "title": clean_title,
-                        "content": cleaned_content,
+                        "raw_title": entry.title,
+                        "raw_content": content or "",
                         "date": getattr(entry, "published", getattr(entry, "updated", None)),
                         "url": getattr(entry, "link", None)
                     })
+            self._feed_updates[url] = updates
             return updates
         except Exception as e:
             print(f"Error fetching updates for {game}: {e}")
             return []
 
+    def _clean_batch(self, fragments):
+        """Clean several HTML fragments in one cleaning-pool job."""
+        return [self.clean_html(fragment) for fragment in fragments]
+
+    async def _clean_updates(self, updates):
+        """
+        Return copies of updates with cleaned "title" and "content".
+        
+        Cleaned text is memoized by a hash of its HTML, so an entry posted to many guilds
+        (or seen again after a restart of its feed) is parsed once. Guilds asking for the
+        same fragment at the same time share one job. Parsing runs in the cleaning pool,
+        so large patch notes don't stall the event loop.
+        """
+        fragments = {}
+        for update in updates:
+            for raw in (update["raw_title"], update["raw_content"]):
+                fragments.setdefault(hashlib.sha1(raw.encode("utf-8")).hexdigest(), raw)
+        
+        cleaned = {}
+        pending = {}
+        to_clean = {}
+        for digest, raw in fragments.items():
+            if digest in self._cleaned:
+                self._cleaned.move_to_end(digest)
+                cleaned[digest] = self._cleaned[digest]
+            elif digest in self._cleaning:
+                pending[digest] = self._cleaning[digest]
+            else:
+                to_clean[digest] = raw
+        
+        if to_clean:
+            loop = asyncio.get_running_loop()
+            batch = loop.run_in_executor(self.clean_pool, self._clean_batch, list(to_clean.values()))
+            for index, digest in enumerate(to_clean):
+                self._cleaning[digest] = (batch, index)
+            try:
+                results = await batch
+            finally:
+                for digest in to_clean:
+                    self._cleaning.pop(digest, None)
+            for digest, text in zip(to_clean, results):
+                cleaned[digest] = self._cleaned[digest] = text
+            while len(self._cleaned) > self.CLEAN_CACHE_SIZE:
+                self._cleaned.popitem(last=False)
+        for digest, (batch, index) in pending.items():
+            cleaned[digest] = (await batch)[index]
+        
+        def text(raw):
+            return cleaned[hashlib.sha1(raw.encode("utf-8")).hexdigest()]
+        
+        return [{**update, "title": text(update["raw_title"]), "content": text(update["raw_content"])} for update in updates]
+
+    async def _fetch_feeds(self, feed_games, force=False):
+        """
+        Fetch every feed once, at most FEED_CONCURRENCY at a time.
+        feed_games maps feed URL -> a game name using it (for log messages). Returns {feed_url: updates}.
+        With force, feeds are polled even if their interval isn't up (still conditionally).
+        """
+        semaphore = asyncio.Semaphore(self.FEED_CONCURRENCY)
+
+        async def fetch(url, game):
+            async with semaphore:
+                return url, await self.fetch_patch_notes(url, game, force=force)
+
+        return dict(await asyncio.gather(*(fetch(url, game) for url, game in feed_games.items())))
+
     def _extract_version_from_title(self, title):
         """Extract version number from update title."""
         # Try to find version patterns like v1.2.3, 1.2.3, or "version 1.2"
@@ -196,21 +296,46 @@ class GameUpdates(commands.Cog):
             
         return False
 
+    def _resolve_targets(self, guild, data):
+        """Where a game's updates go in a guild: (target, forum, forum_thread), all None if nowhere."""
+        target = None
+        forum = None
+        forum_thread = None
+        
+        if data.get("forum"):
+            forum = guild.get_channel(data["forum"])
+        elif data.get("forum_thread"):
+            # Get the thread in a forum channel
+            forum_thread = guild.get_thread(data["forum_thread"])
+        elif data.get("thread"):
+            target = guild.get_thread(data["thread"])
+        elif data.get("channel"):
+            target = guild.get_channel(data["channel"])
+        return target, forum, forum_thread
+
     async def _check_for_updates(self, specific_game=None, specific_guild=None, force_post=False):
         """
         Check for updates for games in guilds.
         
+        Every feed followed by any guild is fetched once per check, then the parsed
+        updates are handed to each subscribing guild.
+        
         Parameters:
         - specific_game: If provided, only check this game
         - specific_guild: If provided, only check in this guild
         - force_post: If True, post the latest update regardless of last_update
         """
         guilds = [specific_guild] if specific_guild else self.bot.guilds
+        all_settings = await self.config.all_guilds()
         
+        # Collect subscriptions: guild -> [(game, data, feed_url, targets)], and the unique feeds behind them
+        subscriptions = {}
+        feed_games = {}
         for guild in guilds:
             try:
-                games = await self.config.guild(guild).games()
-                custom_feeds = await self.config.guild(guild).custom_feeds()
+                settings = all_settings.get(guild.id, {})
+                games = settings.get("games", {})
+                custom_feeds = settings.get("custom_feeds", {})
                 
                 # Filter games if specific_game is provided
                 game_items = [(g, d) for g, d in games.items() 
@@ -221,120 +346,128 @@ class GameUpdates(commands.Cog):
                     feed_url = custom_feeds.get(game) or GAME_FEEDS.get(game)
                     if not feed_url:
                         continue
-                        
-                    target = None
-                    forum = None
-                    forum_thread = None
-                    
-                    if data.get("forum"):
-                        forum = guild.get_channel(data["forum"])
-                    elif data.get("forum_thread"):
-                        # Get the thread in a forum channel
-                        forum_thread = guild.get_thread(data["forum_thread"])
-                    elif data.get("thread"):
-                        target = guild.get_thread(data["thread"])
-                    elif data.get("channel"):
-                        target = guild.get_channel(data["channel"])
                     
-                    if not target and not forum and not forum_thread:
-                        continue
-                        
-                    updates = await self.fetch_patch_notes(feed_url, game)
-                    if not updates:
+                    targets = self._resolve_targets(guild, data)
+                    if not any(targets):
                         continue
                     
-                    if force_post:
-                        # When forcing, just post the latest update
-                        update = updates[0]
-                        embed = discord.Embed(
-                            title=update["title"][:256],  # Discord embed title limit
-                            description=update["content"][:4000] if len(update["content"]) <= 4000 else update["content"][:3997] + "...",
-                            url=update["url"],
-                            color=discord.Color.blue()
-                        )
-                        # Try to parse date, fallback if not possible
-                        try:
-                            embed.timestamp = discord.utils.parse_time(update["date"])
-                        except Exception:
-                            pass
-                        try:
-                            if forum:
-                                # For forums, create a new thread with the game name + patch version
-                                version_str = self._extract_version_from_title(update["title"])
-                                thread_name = f"[{game.upper()}] {version_str}"
-                                
-                                # Check for duplicate threads before creating a new one
-                                if await self._is_duplicate_thread(forum, thread_name):
-                                    print(f"Duplicate thread found: {thread_name}. Skipping creation.")
-                                    continue  # Skip to the next update
-                                
-                                await forum.create_thread(
-                                    name=thread_name[:100],  # Discord has a 100 character limit for thread names
-                                    content=update["content"][:2000] if len(update["content"]) <= 2000 else update["content"][:1997] + "...",
-                                    embed=embed
-                                )
-                            elif forum_thread or target:
-                                # For existing threads or channels, just send the message without changing the name
-                                target_to_send = forum_thread if forum_thread else target
-                                await target_to_send.send(embed=embed)
-                            
-                            # Update the last_update field
-                            data["last_update"] = update["id"]
-                            games[game] = data
-                            await self.config.guild(guild).games.set(games)
-                        except Exception as e:
-                            print(f"Error sending update for {game} in {guild.name}: {e}")
-                    else:
-                        # Normal update checking
-                        last_update = data.get("last_update")
-                        new_updates = []
-                        for update in updates:
-                            if update["id"] == last_update:
-                                break
-                            new_updates.append(update)
-                            
-                        if new_updates:
-                            for update in reversed(new_updates):
-                                embed = discord.Embed(
-                                    title=update["title"][:256],  # Discord embed title limit
-                                    description=update["content"][:4000] if len(update["content"]) <= 4000 else update["content"][:3997] + "...",
-                                    url=update["url"],
-                                    color=discord.Color.blue()
-                                )
-                                # Try to parse date, fallback if not possible
-                                try:
-                                    embed.timestamp = discord.utils.parse_time(update["date"])
-                                except Exception:
-                                    pass
-                                try:
-                                    if forum:
-                                        # For forums, create a new thread with the game name + patch version
-                                        version_str = self._extract_version_from_title(update["title"])
-                                        thread_name = f"[{game.upper()}] {version_str}"
-                                        
-                                        # Check for duplicate threads before creating a new one
-                                        if await self._is_duplicate_thread(forum, thread_name):
-                                            print(f"Duplicate thread found: {thread_name}. Skipping creation.")
-                                            continue  # Skip to the next update
-                                        
-                                        await forum.create_thread(
-                                            name=thread_name[:100],  # Discord has a 100 character limit for thread names
-                                            content=update["content"][:2000] if len(update["content"]) <= 2000 else update["content"][:1997] + "...",
-                                            embed=embed
-                                        )
-                                    elif forum_thread or target:
-                                        # For existing threads or channels, just send the message without changing the name
-                                        target_to_send = forum_thread if forum_thread else target
-                                        await target_to_send.send(embed=embed)
-                                except Exception as e:
-                                    print(f"Error sending update for {game} in {guild.name}: {e}")
-                                    continue
-                            # Save the latest update id
-                            data["last_update"] = updates[0]["id"]
-                            games[game] = data
-                            await self.config.guild(guild).games.set(games)
+                    subscriptions.setdefault(guild, []).append((game, data, feed_url, targets))
+                    feed_games.setdefault(feed_url, game)
             except Exception as e:
                 print(f"Error processing guild {guild.name}: {e}")
+        
+        if not feed_games:
+            return
+        # Commands run for one guild want an answer now, not when the feed is next due
+        feed_updates = await self._fetch_feeds(feed_games, force=specific_guild is not None)
+        
+        # Fan the parsed updates out to each guild; a guild's games are posted in order
+        semaphore = asyncio.Semaphore(self.GUILD_CONCURRENCY)
+        
+        async def deliver(guild, guild_subscriptions):
+            async with semaphore:
+                for game, data, feed_url, targets in guild_subscriptions:
+                    try:
+                        await self._post_game_updates(guild, game, data, feed_updates.get(feed_url), targets, force_post)
+                    except Exception as e:
+                        print(f"Error processing {game} in guild {guild.name}: {e}")
+        
+        await asyncio.gather(*(deliver(guild, subs) for guild, subs in subscriptions.items()))
+
+    async def _post_game_updates(self, guild, game, data, updates, targets, force_post=False):
+        """Post a game's new updates (or just the latest, if forced) to its target in one guild."""
+        target, forum, forum_thread = targets
+        if not updates:
+            return
+        
+        if force_post:
+            # When forcing, just post the latest update
+            update = (await self._clean_updates(updates[:1]))[0]
+            embed = discord.Embed(
+                title=update["title"][:256],  # Discord embed title limit
+                description=update["content"][:4000] if len(update["content"]) <= 4000 else update["content"][:3997] + "...",
+                url=update["url"],
+                color=discord.Color.blue()
+            )
+            # Try to parse date, fallback if not possible
+            try:
+                embed.timestamp = discord.utils.parse_time(update["date"])
+            except Exception:
+                pass
+            try:
+                if forum:
+                    # For forums, create a new thread with the game name + patch version
+                    version_str = self._extract_version_from_title(update["title"])
+                    thread_name = f"[{game.upper()}] {version_str}"
+                    
+                    # Check for duplicate threads before creating a new one
+                    if await self._is_duplicate_thread(forum, thread_name):
+                        print(f"Duplicate thread found: {thread_name}. Skipping creation.")
+                        return
+                    
+                    await forum.create_thread(
+                        name=thread_name[:100],  # Discord has a 100 character limit for thread names
+                        content=update["content"][:2000] if len(update["content"]) <= 2000 else update["content"][:1997] + "...",
+                        embed=embed
+                    )
+                elif forum_thread or target:
+                    # For existing threads or channels, just send the message without changing the name
+                    target_to_send = forum_thread if forum_thread else target
+                    await target_to_send.send(embed=embed)
+                
+                # Update the last_update field
+                await self.config.guild(guild).games.set_raw(game, "last_update", value=update["id"])
+            except Exception as e:
+                print(f"Error sending update for {game} in {guild.name}: {e}")
+        else:
+            # Normal update checking
+            last_update = data.get("last_update")
+            new_updates = []
+            for update in updates:
+                if update["id"] == last_update:
+                    break
+                new_updates.append(update)
+                
+            if new_updates:
+                # Only entries this guild hasn't seen get their HTML cleaned
+                new_updates = await self._clean_updates(new_updates)
+                for update in reversed(new_updates):
+                    embed = discord.Embed(
+                        title=update["title"][:256],  # Discord embed title limit
+                        description=update["content"][:4000] if len(update["content"]) <= 4000 else update["content"][:3997] + "...",
+                        url=update["url"],
+                        color=discord.Color.blue()
+                    )
+                    # Try to parse date, fallback if not possible
+                    try:
+                        embed.timestamp = discord.utils.parse_time(update["date"])
+                    except Exception:
+                        pass
+                    try:
+                        if forum:
+                            # For forums, create a new thread with the game name + patch version
+                            version_str = self._extract_version_from_title(update["title"])
+                            thread_name = f"[{game.upper()}] {version_str}"
+                            
+                            # Check for duplicate threads before creating a new one
+                            if await self._is_duplicate_thread(forum, thread_name):
+                                print(f"Duplicate thread found: {thread_name}. Skipping creation.")
+                                continue  # Skip to the next update
+                            
+                            await forum.create_thread(
+                                name=thread_name[:100],  # Discord has a 100 character limit for thread names
+                                content=update["content"][:2000] if len(update["content"]) <= 2000 else update["content"][:1997] + "...",
+                                embed=embed
+                            )
+                        elif forum_thread or target:
+                            # For existing threads or channels, just send the message without changing the name
+                            target_to_send = forum_thread if forum_thread else target
+                            await target_to_send.send(embed=embed)
+                    except Exception as e:
+                        print(f"Error sending update for {game} in {guild.name}: {e}")
+                        continue
+                # Save the latest update id
+                await self.config.guild(guild).games.set_raw(game, "last_update", value=updates[0]["id"])
 
     @commands.group(name="gameupdates", aliases=["gu"])
     @commands.guild_only()
@@ -472,6 +605,32 @@ class GameUpdates(commands.Cog):
             except Exception as e:
                 await ctx.send(f"Error during update check: {str(e)}")
 
+    @gameupdates.command()
+    @commands.is_owner()
+    async def feedstats(self, ctx):
+        """
+        Show per-feed fetch stats (bot owner only).
+        
+        Lists bytes downloaded, how many polls were answered with 304 Not Modified,
+        average parse time and the feed's current polling interval.
+        """
+        if not self.fetcher.sources:
+            await ctx.send("No feeds have been fetched yet.")
+            return
+        
+        lines = []
+        for url, state in sorted(self.fetcher.sources.items(), key=lambda item: -item[1]["bytes"]):
+            hit_rate = state["not_modified"] / state["requests"] * 100 if state["requests"] else 0
+            avg_parse = state["parse_ms"] / state["parses"] if state["parses"] else 0
+            lines.append(
+                f"{url}\n"
+                f"  {state['requests']} polls, {hit_rate:.0f}% 304, {state['bytes'] / 1024:.0f} KiB, "
+                f"{state['parses']} parses (avg {avg_parse:.0f} ms), {state['failures']} failures, "
+                f"every {state['interval'] / 60:.0f} min"
+            )
+        for page in pagify("\n".join(lines)):
+            await ctx.send(box(page))
+
     @gameupdates.command()
     @commands.is_owner()
     async def addgame(self, ctx, game_name: GameConverter, feed_url: str):
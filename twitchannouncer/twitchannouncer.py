@@ -8,6 +8,8 @@ from typing import Optional
 class TwitchAnnouncer(commands.Cog):
     """Announce when specific users go live on Twitch."""
 
+    STREAMS_BATCH_SIZE = 100  # Helix takes up to 100 user_login params per streams request
+
     def __init__(self, bot):
         self.bot = bot
         self.config = Config.get_conf(self, identifier=1234567890)
@@ -23,13 +25,33 @@ class TwitchAnnouncer(commands.Cog):
             "check_frequency": 300  # Default 5 minutes
         }
         self.config.register_guild(**default_guild)
+        # Reused keep-alive session for when the shared Helix client isn't available
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
         self.check_streams_task = self.bot.loop.create_task(self.check_streams_loop())
+        self.user_ids = {}  # lowercase login -> Twitch user id, for EventSub subscriptions
+        self._announce_lock = asyncio.Lock()
         self.headers = None
         # Removed the rate_limiter that was causing issues
 
     def cog_unload(self):
         if self.check_streams_task:
             self.check_streams_task.cancel()
+        asyncio.create_task(self.session.close())
+
+    def helix(self):
+        """Shared Helix client (pooled connection, one app token) from the Zerolivesleft cog, if it is loaded."""
+        cog = self.bot.get_cog("Zerolivesleft")
+        return getattr(cog, "helix", None)
+
+    def eventsub(self):
+        """EventSub receiver from the Zerolivesleft cog, if it is loaded."""
+        cog = self.bot.get_cog("Zerolivesleft")
+        return getattr(cog, "eventsub_logic", None)
+
+    def live_status(self):
+        """Shared live-status registry from the Zerolivesleft cog, if it is loaded."""
+        cog = self.bot.get_cog("Zerolivesleft")
+        return getattr(cog, "live_status", None)
 
     async def get_twitch_headers(self, guild):
         """Get valid Twitch API headers."""
@@ -47,41 +69,65 @@ class TwitchAnnouncer(commands.Cog):
             # Always get a new token if we don't have one or if it's expired
             if not token_expires or not access_token or now >= token_expires:
                 print(f"[DEBUG] Getting new token for guild {guild.id}")
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        "https://id.twitch.tv/oauth2/token",
-                        params={
-                            "client_id": client_id,
-                            "client_secret": client_secret,
-                            "grant_type": "client_credentials"
-                        }
-                    ) as resp:
-                        if resp.status != 200:
-                            error_text = await resp.text()
-                            print(f"[DEBUG] Token request failed: Status {resp.status}, Response: {error_text}")
-                            return None
-                        
-                        data = await resp.json()
-                        access_token = data["access_token"]
-                        expires_in = data["expires_in"]
-                        
-                        # Store the new token
-                        await self.config.guild(guild).access_token.set(access_token)
-                        await self.config.guild(guild).token_expires.set(now + expires_in)
-                        print(f"[DEBUG] New token obtained for guild {guild.id}")
+                async with self.session.post(
+                    "https://id.twitch.tv/oauth2/token",
+                    params={
+                        "client_id": client_id,
+                        "client_secret": client_secret,
+                        "grant_type": "client_credentials"
+                    }
+                ) as resp:
+                    if resp.status != 200:
+                        error_text = await resp.text()
+                        print(f"[DEBUG] Token request failed: Status {resp.status}, Response: {error_text}")
+                        return None
+                    
+                    data = await resp.json()
+                    access_token = data["access_token"]
+                    expires_in = data["expires_in"]
+                    
+                    # Store the new token
+                    await self.config.guild(guild).access_token.set(access_token)
+                    await self.config.guild(guild).token_expires.set(now + expires_in)
+                    print(f"[DEBUG] New token obtained for guild {guild.id}")
 
             headers = {
                 "Client-ID": client_id,
                 "Authorization": f"Bearer {access_token}"
             }
             
-            print(f"[DEBUG] Returning headers for guild {guild.id}: {headers}")
             return headers
 
         except Exception as e:
             print(f"[DEBUG] Error in get_twitch_headers: {str(e)}")
             return None
 
+    async def get_streams(self, guild, params, headers=None):
+        """
+        GET helix/streams, returning (status, json).
+
+        Goes through the shared Helix client when it has credentials; otherwise
+        uses this guild's own client ID/secret (``headers``) on the cog session.
+        """
+        helix = self.helix()
+        if helix and await helix.headers():
+            return await helix.get("streams", params)
+
+        if headers is None:
+            headers = await self.get_twitch_headers(guild)
+            if not headers:
+                return None, None
+        async with self.session.get("https://api.twitch.tv/helix/streams", params=params, headers=headers) as resp:
+            if resp.status == 401:
+                print("[DEBUG] Got 401 - Clearing token so it is refreshed next time")
+                await self.config.guild(guild).access_token.set(None)
+                await self.config.guild(guild).token_expires.set(None)
+            try:
+                data = await resp.json()
+            except (aiohttp.ContentTypeError, ValueError):
+                data = None
+            return resp.status, data
+
     async def check_streams_loop(self):
         """Loop to check if streamers are live."""
         await self.bot.wait_until_ready()
@@ -90,23 +136,18 @@ class TwitchAnnouncer(commands.Cog):
                 # Default check frequency in case there are no guilds
                 default_check_frequency = 300  # 5 minutes
                 
-                # Track if we have any guilds
-                has_guilds = False
-                
-                for guild in self.bot.guilds:
-                    has_guilds = True
-                    await self.check_guild_streams(guild)
-                
-                # Get check frequency from the config, or use default
-                if has_guilds:
-                    # Use the first guild's setting or a default
-                    first_guild = next(iter(self.bot.guilds), None)
-                    if first_guild:
-                        check_frequency = await self.config.guild(first_guild).check_frequency()
-                    else:
-                        check_frequency = default_check_frequency
+                # Use the first guild's setting or a default
+                first_guild = next(iter(self.bot.guilds), None)
+                if first_guild:
+                    await self.check_all_streams()
+                    check_frequency = await self.config.guild(first_guild).check_frequency()
                 else:
                     check_frequency = default_check_frequency
+
+                # With EventSub pushing go-lives, polling only reconciles missed events
+                eventsub = self.eventsub()
+                if eventsub and eventsub.active:
+                    check_frequency = max(check_frequency, eventsub.FALLBACK_POLL_INTERVAL)
                     
                 await asyncio.sleep(check_frequency)
             except (aiohttp.ClientError, asyncio.TimeoutError) as e:
@@ -116,66 +157,157 @@ class TwitchAnnouncer(commands.Cog):
                 print(f"Unexpected error in stream check loop: {e}")
                 await asyncio.sleep(60)
 
+    async def check_all_streams(self):
+        """
+        One polling pass over every guild.
+
+        Logins are deduplicated across guilds and polled in batches of up to 100,
+        so a pass costs a couple of requests however many guilds track them.
+        """
+        all_guilds = await self.config.all_guilds()
+        guild_streamers = {}
+        for guild in self.bot.guilds:
+            streamers = all_guilds.get(guild.id, {}).get("streamers")
+            if streamers:
+                guild_streamers[guild] = streamers
+        if not guild_streamers:
+            return
+
+        max_age = min(all_guilds[guild.id].get("check_frequency", 300) for guild in guild_streamers) / 2
+        await self._check_streams(guild_streamers, max_age)
+
     async def check_guild_streams(self, guild):
         """Check streams for a specific guild."""
-        try:
-            print(f"[DEBUG] Checking streams for guild: {guild.name} (ID: {guild.id})")
-            streamers = await self.config.guild(guild).streamers()
-            if not streamers:
-                return
+        streamers = await self.config.guild(guild).streamers()
+        if not streamers:
+            return
+        max_age = await self.config.guild(guild).check_frequency() / 2
+        await self._check_streams({guild: streamers}, max_age)
 
-            headers = await self.get_twitch_headers(guild)
-            if not headers:
-                print(f"[DEBUG] No valid headers for guild {guild.id}")
-                return
+    async def _check_streams(self, guild_streamers, max_age):
+        try:
+            discord_ids = {}
+            for streamers in guild_streamers.values():
+                for twitch_name, info in streamers.items():
+                    discord_ids.setdefault(twitch_name.lower(), info.get("discord_id"))
 
-            # Simple rate limiting - sleep for 1 second between requests
-            # This replaces the problematic rate_limiter that was causing the error
+            await self.watch_eventsub(discord_ids)
+            results = await self.fetch_streams(list(guild_streamers), discord_ids, max_age)
+            print(f"[DEBUG] Polled {len(discord_ids)} logins for {len(guild_streamers)} guilds, {sum(1 for s in results.values() if s)} live")
 
-            async with aiohttp.ClientSession() as session:
-                for twitch_name in streamers:
-                    try:
-                        # Add a small delay between requests to avoid rate limits
-                        await asyncio.sleep(1)
-                        
-                        url = f"https://api.twitch.tv/helix/streams?user_login={twitch_name}"
-                        print(f"[DEBUG] Requesting: {url}")
-                        print(f"[DEBUG] Headers: {headers}")
-                        
-                        async with session.get(url, headers=headers) as resp:
-                            text = await resp.text()
-                            print(f"[DEBUG] Response status: {resp.status}")
-                            print(f"[DEBUG] Response text: {text}")
-                            
-                            if resp.status == 401:
-                                print("[DEBUG] Got 401 - Clearing token and retrying")
-                                # Clear the token so it will be refreshed next time
-                                await self.config.guild(guild).access_token.set(None)
-                                await self.config.guild(guild).token_expires.set(None)
-                                return
-                                
-                            if resp.status != 200:
-                                print(f"[DEBUG] Twitch API error for {twitch_name}: {resp.status}")
-                                continue
-                                
-                            data = await resp.json()
-                            
-                            is_live = bool(data["data"])
-                            last_announced = streamers[twitch_name].get("last_announced", 0)
-                            
-                            if is_live and data["data"][0]["started_at"] != last_announced:
-                                await self.announce_stream(guild, twitch_name, data["data"][0])
-                                streamers[twitch_name]["last_announced"] = data["data"][0]["started_at"]
-                                await self.config.guild(guild).streamers.set(streamers)
-                                
-                    except Exception as e:
-                        print(f"[DEBUG] Error checking stream {twitch_name}: {str(e)}")
-                        continue
+            for guild, streamers in guild_streamers.items():
+                await self._announce_from_results(guild, streamers, results)
         except Exception as e:
-            print(f"[DEBUG] Error in check_guild_streams: {str(e)}")
+            print(f"[DEBUG] Error in _check_streams: {str(e)}")
             import traceback
             traceback.print_exc()  # This will print the full stack trace
 
+    async def fetch_streams(self, guilds, discord_ids, max_age):
+        """
+        Live status for each login in ``discord_ids`` (lowercase login -> discord id).
+
+        Returns {login: stream or None}. Logins whose batch failed are left out.
+        Results polled recently (by another guild or cog) are reused from the shared registry.
+        """
+        registry = self.live_status()
+        results = {}
+        to_poll = []
+        for login in discord_ids:
+            cached = registry.for_login(login, max_age=max_age) if registry else None
+            if cached is not None:
+                results[login] = cached.stream
+            else:
+                to_poll.append(login)
+        if not to_poll:
+            return results
+
+        # Without the shared client, any guild's own credentials will do for public stream data
+        helix = self.helix()
+        cred_guild, headers = None, None
+        if not (helix and await helix.headers()):
+            for guild in guilds:
+                headers = await self.get_twitch_headers(guild)
+                if headers:
+                    cred_guild = guild
+                    break
+            else:
+                print("[DEBUG] No valid Twitch credentials for any guild")
+                return results
+
+        for i in range(0, len(to_poll), self.STREAMS_BATCH_SIZE):
+            batch = to_poll[i:i + self.STREAMS_BATCH_SIZE]
+            params = [("user_login", login) for login in batch] + [("first", self.STREAMS_BATCH_SIZE)]
+            status, data = await self.get_streams(cred_guild, params, headers)
+            if status != 200 or data is None:
+                print(f"[DEBUG] Twitch API error for a batch of {len(batch)} logins: {status}")
+                continue
+
+            live = {stream["user_login"].lower(): stream for stream in data.get("data", [])}
+            for login in batch:
+                stream = live.get(login)
+                results[login] = stream
+                if registry:
+                    registry.update_from_twitch(login, stream, discord_id=discord_ids.get(login))
+        return results
+
+    async def watch_eventsub(self, logins):
+        """Hand the tracked logins' user IDs to the EventSub receiver so it subscribes to them."""
+        eventsub, helix = self.eventsub(), self.helix()
+        if not eventsub or not helix:
+            return
+        unknown = [login for login in logins if login not in self.user_ids]
+        for i in range(0, len(unknown), self.STREAMS_BATCH_SIZE):
+            batch = unknown[i:i + self.STREAMS_BATCH_SIZE]
+            status, data = await helix.get("users", [("login", login) for login in batch])
+            if status != 200 or data is None:
+                print(f"[DEBUG] Could not resolve user IDs for EventSub: {status}")
+                continue
+            for user in data.get("data", []):
+                self.user_ids[user["login"].lower()] = user["id"]
+        eventsub.watch("TwitchAnnouncer", [self.user_ids[login] for login in logins if login in self.user_ids])
+
+    @commands.Cog.listener()
+    async def on_twitch_stream_online(self, event, stream):
+        """EventSub push from the Zerolivesleft cog: announce without waiting for the next poll."""
+        if stream is None:
+            # Helix hasn't caught up yet; the reconciliation poll will announce it
+            return
+        login = event.get("broadcaster_user_login", "").lower()
+        all_guilds = await self.config.all_guilds()
+        for guild in self.bot.guilds:
+            streamers = all_guilds.get(guild.id, {}).get("streamers") or {}
+            matching = {name: info for name, info in streamers.items() if name.lower() == login}
+            if matching:
+                await self._announce_from_results(guild, matching, {login: stream})
+
+    async def _announce_from_results(self, guild, streamers, results):
+        """Announce every streamer of this guild who went live since their last announcement."""
+        for twitch_name, info in streamers.items():
+            try:
+                stream = results.get(twitch_name.lower())
+                if not stream or stream["started_at"] == info.get("last_announced", 0):
+                    continue
+
+                # EventSub pushes and the reconciliation poll can race; only one announces
+                async with self._announce_lock:
+                    async with self.config.guild(guild).streamers() as current:
+                        if twitch_name not in current or current[twitch_name].get("last_announced") == stream["started_at"]:
+                            continue
+                        previous = current[twitch_name].get("last_announced", 0)
+                        current[twitch_name]["last_announced"] = stream["started_at"]
+                try:
+                    await self.announce_stream(guild, twitch_name, stream)
+                except Exception:
+                    # Un-stamp the go-live so the next poll retries the announcement
+                    async with self._announce_lock:
+                        async with self.config.guild(guild).streamers() as current:
+                            if current.get(twitch_name, {}).get("last_announced") == stream["started_at"]:
+                                current[twitch_name]["last_announced"] = previous
+                    raise
+            except Exception as e:
+                print(f"[DEBUG] Error checking stream {twitch_name}: {str(e)}")
+                continue
+
     async def send_dm_notifications(self, guild, twitch_name, stream_data):
         """Send DM notifications to users with DM roles."""
         dm_roles = await self.config.guild(guild).dm_roles()
@@ -352,12 +484,11 @@ class TwitchAnnouncer(commands.Cog):
                         current_thumbnail = thumbnail.replace("{width}", width).replace("{height}", height)
                         current_thumbnail = f"{current_thumbnail}?t={timestamp}"
                         
-                        async with aiohttp.ClientSession() as session:
-                            async with session.head(current_thumbnail) as resp:
-                                if resp.status == 200:
-                                    embed.set_image(url=current_thumbnail)
-                                    thumbnail_set = True
-                                    break
+                        async with self.session.head(current_thumbnail) as resp:
+                            if resp.status == 200:
+                                embed.set_image(url=current_thumbnail)
+                                thumbnail_set = True
+                                break
                     except:
                         continue
                 
@@ -409,6 +540,9 @@ class TwitchAnnouncer(commands.Cog):
                 "discord_id": discord_member.id if discord_member else None,
                 "last_announced": None
             }
+        registry = self.live_status()
+        if registry and discord_member:
+            registry.link(discord_member.id, twitch_name)
         await ctx.send(f"Added {twitch_name} to announcement list.")
 
     @twitchannouncer.command(name="removestreamer")
@@ -840,34 +974,29 @@ class TwitchAnnouncer(commands.Cog):
     @twitchannouncer.command(name="test")
     async def test_announcement(self, ctx, twitch_name: str):
         """Test stream announcement for a specific streamer."""
-        headers = await self.get_twitch_headers(ctx.guild)
-        if not headers:
+        status, data = await self.get_streams(ctx.guild, {"user_login": twitch_name})
+        if status is None:
             await ctx.send("Twitch API authentication not set up!")
             return
 
-        async with aiohttp.ClientSession() as session:
-            url = f"https://api.twitch.tv/helix/streams?user_login={twitch_name}"
-            async with session.get(url, headers=headers) as resp:
-                text = await resp.text()
-                print(f"[DEBUG] Twitch API status: {resp.status}")
-                print(f"[DEBUG] Twitch API response: {text}")
-                if resp.status != 200:
-                    await ctx.send(f"Failed to fetch stream data. Twitch API returned {resp.status}: {text}")
-                    return
-                    
-                data = await resp.json()
-                if not data["data"]:
-                    await ctx.send(f"{twitch_name} is not live. Creating test announcement anyway...")
-                    test_data = {
-                        "title": "Test Stream",
-                        "game_name": "Just Chatting",
-                        "viewer_count": 0,
-                        "started_at": datetime.utcnow().isoformat(),
-                        "thumbnail_url": None
-                    }
-                    await self.announce_stream(ctx.guild, twitch_name, test_data)
-                else:
-                    await self.announce_stream(ctx.guild, twitch_name, data["data"][0])
+        print(f"[DEBUG] Twitch API status: {status}")
+        print(f"[DEBUG] Twitch API response: {data}")
+        if status != 200 or data is None:
+            await ctx.send(f"Failed to fetch stream data. Twitch API returned {status}: {data}")
+            return
+            
+        if not data["data"]:
+            await ctx.send(f"{twitch_name} is not live. Creating test announcement anyway...")
+            test_data = {
+                "title": "Test Stream",
+                "game_name": "Just Chatting",
+                "viewer_count": 0,
+                "started_at": datetime.utcnow().isoformat(),
+                "thumbnail_url": None
+            }
+            await self.announce_stream(ctx.guild, twitch_name, test_data)
+        else:
+            await self.announce_stream(ctx.guild, twitch_name, data["data"][0])
 
 class StreamView(discord.ui.View):
     def __init__(self, twitch_name):
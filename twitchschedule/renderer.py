@@ -0,0 +1,168 @@
+import asyncio
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Layout of the schedule template
+ROW_HEIGHT = 150
+HEADER_HEIGHT = 350
+MIN_HEIGHT = 400
+RIGHT_MARGIN = 100
+DAY_X = 125
+GAME_X = 125
+DAY_OFFSET = -45
+GAME_OFFSET = 15
+FONT_SIZES = {"title": 90, "date": 40, "schedule": 42}
+
+
+def _file_key(path: str) -> Optional[Tuple[str, float, int]]:
+    """Identify a file version by path, mtime and size."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (path, stat.st_mtime, stat.st_size)
+
+
+class ScheduleRenderer:
+    """
+    Renders schedule images in a worker thread so the event loop keeps
+    serving the gateway while Pillow draws and encodes.
+
+    Decoded templates and loaded fonts are kept between renders, keyed by
+    file path, mtime and size, so a re-downloaded template or font is
+    picked up on the next render without reloading them every time.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="twitchschedule-render")
+        self._lock = threading.Lock()
+        self._templates: Dict[str, Tuple[tuple, Image.Image]] = {}
+        self._fonts: Dict[str, Tuple[tuple, Dict[str, ImageFont.ImageFont]]] = {}
+        self.metrics = {
+            "renders": 0,
+            "failures": 0,
+            "in_flight": 0,
+            "last_render_ms": 0.0,
+            "last_wait_ms": 0.0,
+            "max_render_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "template_loads": 0,
+            "font_loads": 0,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    # --- ASSET CACHE (worker thread) ---
+
+    def _template(self, path: str) -> Image.Image:
+        key = _file_key(path)
+        with self._lock:
+            cached = self._templates.get(path)
+            if cached and cached[0] == key:
+                return cached[1]
+        with Image.open(path) as template_img:
+            img = template_img.copy()
+        img.load()
+        with self._lock:
+            self._templates[path] = (key, img)
+            self.metrics["template_loads"] += 1
+        return img
+
+    def _font_set(self, path: str) -> Dict[str, ImageFont.ImageFont]:
+        key = _file_key(path)
+        with self._lock:
+            cached = self._fonts.get(path)
+            if cached and cached[0] == key:
+                return cached[1]
+        try:
+            fonts = {name: ImageFont.truetype(path, size) for name, size in FONT_SIZES.items()}
+        except Exception:
+            fonts = {name: ImageFont.load_default() for name in FONT_SIZES}
+        with self._lock:
+            self._fonts[path] = (key, fonts)
+            self.metrics["font_loads"] += 1
+        return fonts
+
+    # --- RENDERING ---
+
+    async def render(self, template_path: str, font_path: str, rows: List[Tuple[str, str]],
+                     event_count: int, week_of_text: str, date_text: str) -> bytes:
+        """Render in the worker pool and return PNG bytes."""
+        submitted = time.perf_counter()
+        self.metrics["in_flight"] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, self._render_sync, submitted,
+                template_path, font_path, rows, event_count, week_of_text, date_text
+            )
+        except Exception:
+            self.metrics["failures"] += 1
+            raise
+        finally:
+            self.metrics["in_flight"] -= 1
+
+    def _render_sync(self, submitted: float, template_path: str, font_path: str, rows: List[Tuple[str, str]],
+                     event_count: int, week_of_text: str, date_text: str) -> bytes:
+        started = time.perf_counter()
+        wait_ms = (started - submitted) * 1000
+
+        img = self._template(template_path).copy()
+        fonts = self._font_set(font_path)
+        actual_events = min(len(rows), event_count)
+
+        # Adjust image height if fewer events
+        if actual_events < event_count:
+            width, height = img.size
+            height_to_remove = (event_count - actual_events) * ROW_HEIGHT
+            new_height = max(height - height_to_remove, MIN_HEIGHT)
+            new_img = Image.new(img.mode, (width, new_height), color=(0, 0, 0))
+
+            header_height = min(HEADER_HEIGHT, height)
+            new_img.paste(img.crop((0, 0, width, header_height)), (0, 0))
+
+            if actual_events > 0:
+                event_section_end = min(header_height + actual_events * ROW_HEIGHT, height)
+                if event_section_end > header_height:
+                    new_img.paste(img.crop((0, header_height, width, event_section_end)), (0, header_height))
+
+            img = new_img
+
+        draw = ImageDraw.Draw(img)
+        width, _ = img.size
+
+        # Draw header text
+        try:
+            week_of_bbox = fonts["title"].getbbox(week_of_text)
+            date_bbox = fonts["date"].getbbox(date_text)
+            week_of_x = max(0, width - RIGHT_MARGIN - (week_of_bbox[2] - week_of_bbox[0]))
+            date_x = max(0, width - RIGHT_MARGIN - (date_bbox[2] - date_bbox[0]))
+            draw.text((week_of_x, 100), week_of_text, font=fonts["title"], fill=(255, 255, 255))
+            draw.text((date_x, 180), date_text, font=fonts["date"], fill=(255, 255, 255))
+        except Exception:
+            pass
+
+        # Draw schedule items
+        for i, (day_time, title) in enumerate(rows[:actual_events]):
+            bar_y = HEADER_HEIGHT + (i * ROW_HEIGHT)
+            draw.text((DAY_X, bar_y + DAY_OFFSET), day_time, font=fonts["schedule"], fill=(255, 255, 255))
+            draw.text((GAME_X, bar_y + GAME_OFFSET), title, font=fonts["schedule"], fill=(255, 255, 255))
+
+        # optimize=True re-runs zlib several times for a few percent; a single pass is enough here
+        buf = io.BytesIO()
+        img.save(buf, format="PNG", compress_level=6)
+
+        render_ms = (time.perf_counter() - started) * 1000
+        self.metrics["renders"] += 1
+        self.metrics["last_render_ms"] = render_ms
+        self.metrics["last_wait_ms"] = wait_ms
+        self.metrics["max_render_ms"] = max(self.metrics["max_render_ms"], render_ms)
+        self.metrics["max_wait_ms"] = max(self.metrics["max_wait_ms"], wait_ms)
+        return buf.getvalue()
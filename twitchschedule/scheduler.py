@@ -0,0 +1,164 @@
+"""
+Weekly run times, bounded fan-out and the due-time scheduler, shared by
+TwitchSchedule and TwitchUtility.
+
+Each cog is installed on its own, so this module is kept byte-identical in
+twitchschedule/ and twitchutility/. twitchschedule/scheduler.py is the
+canonical copy: change it there, then copy it across.
+"""
+
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+log = logging.getLogger(f"red.{__name__}")
+
+
+def _weekly_candidates(days: Iterable[int], hhmm: str, tz, around: datetime.datetime, offsets) -> List[datetime.datetime]:
+    hour, minute = (int(part) for part in hhmm.split(":"))
+    local = around.astimezone(tz)
+    days = set(days)
+    candidates = []
+    for offset in offsets:
+        day = (local + datetime.timedelta(days=offset)).date()
+        if day.weekday() in days:
+            naive = datetime.datetime.combine(day, datetime.time(hour, minute))
+            # pytz zones need localize(); zoneinfo/datetime.timezone take tzinfo directly
+            localized = tz.localize(naive) if hasattr(tz, "localize") else naive.replace(tzinfo=tz)
+            candidates.append(localized)
+    return candidates
+
+
+def next_weekly_run(days: Iterable[int], hhmm: str, tz, after: datetime.datetime) -> Optional[datetime.datetime]:
+    """First time strictly after ``after`` that falls on one of ``days`` (0=Monday) at ``hhmm`` in ``tz``."""
+    future = [c for c in _weekly_candidates(days, hhmm, tz, after, range(0, 8)) if c > after]
+    return min(future) if future else None
+
+
+def previous_weekly_run(days: Iterable[int], hhmm: str, tz, before: datetime.datetime) -> Optional[datetime.datetime]:
+    """Latest time at or before ``before`` that falls on one of ``days`` at ``hhmm`` in ``tz``."""
+    past = [c for c in _weekly_candidates(days, hhmm, tz, before, range(-7, 1)) if c <= before]
+    return max(past) if past else None
+
+
+async def fan_out(items: Iterable[Any], worker: Callable[[Any], Awaitable[None]], limit: int = 10,
+                  timeout: Optional[float] = 30, label: Callable[[Any], str] = repr) -> Dict[str, int]:
+    """
+    Run ``worker(item)`` for every item, at most ``limit`` at a time and each
+    bounded by ``timeout`` seconds, so one slow or failing item can't hold up
+    or break the others. ``label(item)`` names an item in logs.
+
+    Returns how many items finished, failed and timed out.
+    """
+    semaphore = asyncio.Semaphore(limit)
+    counts = {"ok": 0, "failed": 0, "timed_out": 0}
+    name = getattr(worker, "__name__", "Task")
+
+    async def run(item):
+        async with semaphore:  # The timeout starts once a slot is free, not while queued
+            try:
+                await asyncio.wait_for(worker(item), timeout=timeout)
+                counts["ok"] += 1
+            except asyncio.TimeoutError:
+                counts["timed_out"] += 1
+                log.warning(f"{name} timed out after {timeout}s for {label(item)}.")
+            except Exception as e:
+                counts["failed"] += 1
+                log.error(f"{name} failed for {label(item)}: {e}", exc_info=True)
+
+    await asyncio.gather(*(run(item) for item in items))
+    return counts
+
+
+class DueScheduler:
+    """
+    Runs ``callback(key)`` when each key's due time arrives.
+
+    Jobs sit in a heap ordered by due time, and one task sleeps until the earliest
+    one instead of waking every minute to compare clocks. Rescheduling a key
+    replaces its job (stale heap entries are skipped when popped). Sleeps are
+    capped at ``max_sleep`` so a wall-clock jump is noticed within that long.
+
+    Jobs that fall due together go through ``fan_out``: up to ``concurrency`` at
+    once, each limited to ``timeout`` seconds (None for no limit). The defaults
+    run them one after another.
+    """
+
+    def __init__(self, callback: Callable[[Hashable], Awaitable[None]], max_sleep: float = 300,
+                 concurrency: int = 1, timeout: Optional[float] = None):
+        self.callback = callback
+        self.max_sleep = max_sleep
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._jobs: Dict[Hashable, Tuple[float, int]] = {}  # key -> (due unix time, sequence)
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {"runs": 0, "failures": 0, "max_lateness": 0.0, "last_lateness": 0.0}
+        self.last_batch: Optional[Dict[str, Any]] = None  # Duration and outcome of the last jobs run together
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        if not self._task or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    def schedule(self, key: Hashable, due_at: float):
+        """(Re)schedule ``key`` to run at unix time ``due_at``."""
+        seq = next(self._counter)
+        self._jobs[key] = (due_at, seq)
+        heapq.heappush(self._heap, (due_at, seq, key))
+        self._wakeup.set()
+
+    def cancel(self, key: Hashable):
+        self._jobs.pop(key, None)
+
+    def next_due(self, key: Hashable) -> Optional[float]:
+        job = self._jobs.get(key)
+        return job[0] if job else None
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def _pop_due(self, now: float) -> List[Hashable]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, seq, key = heapq.heappop(self._heap)
+            if self._jobs.get(key) == (due_at, seq):
+                del self._jobs[key]
+                due.append(key)
+                lateness = now - due_at
+                self.metrics["last_lateness"] = lateness
+                self.metrics["max_lateness"] = max(self.metrics["max_lateness"], lateness)
+        return due
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            due = self._pop_due(time.time())
+            if due:
+                started = time.monotonic()
+                counts = await fan_out(due, self.callback, self.concurrency, self.timeout,
+                                       label=lambda key: f"job {key}")
+                self.metrics["runs"] += counts["ok"]
+                self.metrics["failures"] += counts["failed"] + counts["timed_out"]
+                self.last_batch = {"duration": time.monotonic() - started, "jobs": len(due),
+                                   "at": time.time(), **counts}
+
+            # Drop cancelled/replaced entries from the top so the sleep targets a live job
+            while self._heap and self._jobs.get(self._heap[0][2]) != self._heap[0][:2]:
+                heapq.heappop(self._heap)
+            delay = self.max_sleep
+            if self._heap:
+                delay = min(max(self._heap[0][0] - time.time(), 0), self.max_sleep)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
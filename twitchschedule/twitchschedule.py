@@ -6,15 +6,24 @@ import datetime
 from datetime import timedelta
 import asyncio
 import traceback
-from PIL import Image, ImageDraw, ImageFont
 import io
+import logging
 import os
 import pytz
 import re
 import dateutil.parser
+from urllib.parse import urlencode
 from typing import Optional, List, Dict, Any
 
+from redbot.core.data_manager import cog_data_path
+
+from .image_cache import ImageCache, content_key, file_digest
+from .lookup_cache import MISSING, LookupCache
+from .renderer import ScheduleRenderer
+from .scheduler import DueScheduler, next_weekly_run, previous_weekly_run
+
 london_tz = pytz.timezone("Europe/London")
+log = logging.getLogger("red.twitchschedule")
 
 class TwitchAPIError(Exception):
     """Custom exception for Twitch API errors"""
@@ -40,6 +49,8 @@ class RateLimiter:
 class TwitchSchedule(commands.Cog):
     """Sync Twitch streaming schedule to Discord"""
 
+    RESCHEDULE_INTERVAL = 3600  # Seconds between safety-net rebuilds of every guild's next update
+
     def __init__(self, bot: Red):
         self.bot = bot
         self.config = Config.get_conf(self, identifier=1234567890)
@@ -60,7 +71,11 @@ class TwitchSchedule(commands.Cog):
             "story_enabled": False,
             "story_channel_id": None,
             "story_template_url": None,
-            "story_event_count": 7
+            "story_event_count": 7,
+            "last_post_digest": None,
+            "schedule_message_ids": [],  # Every message of the current post, removed when it is replaced
+            "schedule_message_channel_id": None,  # Channel those messages were posted in
+            "last_auto_update": None  # Unix time of the last scheduled post, for catching up missed runs
         }
         self.config.register_guild(**default_guild)
         
@@ -68,7 +83,14 @@ class TwitchSchedule(commands.Cog):
         self.access_token = None
         self.token_expires_at = None
         self.rate_limiter = RateLimiter()
+        # Only used when the Zerolivesleft Helix client is not loaded
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
         self._update_lock = asyncio.Lock()
+        self.scheduler = DueScheduler(self._run_scheduled_update)
+        self._running_updates = set()  # Guild IDs whose scheduled update is in progress
+        self.renderer = ScheduleRenderer()
+        self.image_cache = ImageCache(str(cog_data_path(self) / "schedule_images"))
+        self.lookup_cache = LookupCache(str(cog_data_path(self) / "lookups.sqlite3"))
         
         self.cache_dir = os.path.join(os.path.dirname(__file__), "cache")
         self.font_path = os.path.join(self.cache_dir, "P22.ttf")
@@ -90,6 +112,15 @@ class TwitchSchedule(commands.Cog):
     def cog_unload(self):
         if self.task:
             self.task.cancel()
+        self.scheduler.stop()
+        self.renderer.shutdown()
+        self.lookup_cache.close()
+        asyncio.create_task(self.session.close())
+
+    def _helix(self):
+        """The shared Helix client on the Zerolivesleft cog, if it is loaded."""
+        zll_cog = self.bot.get_cog("Zerolivesleft")
+        return getattr(zll_cog, "helix", None)
 
     async def get_credentials(self) -> Optional[tuple]:
         """Get Twitch API credentials with validation"""
@@ -107,6 +138,13 @@ class TwitchSchedule(commands.Cog):
 
     async def get_twitch_token(self) -> Optional[str]:
         """Get or refresh Twitch access token with proper error handling"""
+        helix = self._helix()
+        if helix:
+            token = await helix.get_token()
+            if not token:
+                raise TwitchAPIError("Token acquisition failed")
+            return token
+
         try:
             if self.access_token and self.token_expires_at:
                 if datetime.datetime.now() < self.token_expires_at - timedelta(minutes=5):
@@ -118,26 +156,25 @@ class TwitchSchedule(commands.Cog):
             
             client_id, client_secret = credentials
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
-                url = "https://id.twitch.tv/oauth2/token"
-                params = {
-                    "client_id": client_id,
-                    "client_secret": client_secret,
-                    "grant_type": "client_credentials"
-                }
+            url = "https://id.twitch.tv/oauth2/token"
+            params = {
+                "client_id": client_id,
+                "client_secret": client_secret,
+                "grant_type": "client_credentials"
+            }
+            
+            await self.rate_limiter.wait_if_needed()
+            async with self.session.post(url, params=params) as resp:
+                if resp.status != 200:
+                    error_text = await resp.text()
+                    raise TwitchAPIError(f"Failed to get access token: {resp.status} - {error_text}")
                 
-                await self.rate_limiter.wait_if_needed()
-                async with session.post(url, params=params) as resp:
-                    if resp.status != 200:
-                        error_text = await resp.text()
-                        raise TwitchAPIError(f"Failed to get access token: {resp.status} - {error_text}")
-                    
-                    data = await resp.json()
-                    self.access_token = data.get("access_token")
-                    expires_in = data.get("expires_in", 3600)
-                    self.token_expires_at = datetime.datetime.now() + timedelta(seconds=expires_in)
-                    
-                    return self.access_token
+                data = await resp.json()
+                self.access_token = data.get("access_token")
+                expires_in = data.get("expires_in", 3600)
+                self.token_expires_at = datetime.datetime.now() + timedelta(seconds=expires_in)
+                
+                return self.access_token
                     
         except Exception as e:
             self.access_token = None
@@ -225,39 +262,52 @@ class TwitchSchedule(commands.Cog):
 
     async def _make_twitch_request(self, url: str, headers: Dict[str, str]) -> Optional[Dict[str, Any]]:
         """Make Twitch API request with proper error handling"""
+        helix = self._helix()
+        if helix:
+            # Pooled connection, shared token and rate-limit bucket; retries happen in the client
+            status, data = await helix.get(url)
+            if status is None:
+                raise TwitchAPIError("Request failed")
+            if status == 401:
+                raise TwitchAPIError("Authentication failed")
+            if status == 404:
+                return {"data": {"segments": []}}
+            if status != 200:
+                raise TwitchAPIError(f"API request failed: {status} - {data}")
+            return data
+
         max_retries = 3
         for attempt in range(max_retries):
             try:
                 await self.rate_limiter.wait_if_needed()
                 
-                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
-                    async with session.get(url, headers=headers) as resp:
-                        if resp.status == 401:
-                            if attempt == 0:
-                                self.access_token = None
-                                self.token_expires_at = None
-                                new_token = await self.get_twitch_token()
-                                if new_token:
-                                    headers["Authorization"] = f"Bearer {new_token}"
-                                    continue
-                            raise TwitchAPIError("Authentication failed")
-                        
-                        elif resp.status == 429:
-                            retry_after = int(resp.headers.get('Retry-After', 60))
-                            await asyncio.sleep(min(retry_after, 300))
-                            continue
-                        
-                        elif resp.status == 404:
-                            return {"data": {"segments": []}}
-                        
-                        elif resp.status != 200:
-                            error_text = await resp.text()
-                            if attempt == max_retries - 1:
-                                raise TwitchAPIError(f"API request failed: {resp.status} - {error_text}")
-                            await asyncio.sleep(2 ** attempt)
-                            continue
-                        
-                        return await resp.json()
+                async with self.session.get(url, headers=headers) as resp:
+                    if resp.status == 401:
+                        if attempt == 0:
+                            self.access_token = None
+                            self.token_expires_at = None
+                            new_token = await self.get_twitch_token()
+                            if new_token:
+                                headers["Authorization"] = f"Bearer {new_token}"
+                                continue
+                        raise TwitchAPIError("Authentication failed")
+                    
+                    elif resp.status == 429:
+                        retry_after = int(resp.headers.get('Retry-After', 60))
+                        await asyncio.sleep(min(retry_after, 300))
+                        continue
+                    
+                    elif resp.status == 404:
+                        return {"data": {"segments": []}}
+                    
+                    elif resp.status != 200:
+                        error_text = await resp.text()
+                        if attempt == max_retries - 1:
+                            raise TwitchAPIError(f"API request failed: {resp.status} - {error_text}")
+                        await asyncio.sleep(2 ** attempt)
+                        continue
+                    
+                    return await resp.json()
                         
             except asyncio.TimeoutError:
                 if attempt == max_retries - 1:
@@ -293,14 +343,12 @@ class TwitchSchedule(commands.Cog):
             }
             
             # Get user ID first
-            user_url = f"https://api.twitch.tv/helix/users?login={username}"
-            user_data = await self._make_twitch_request(user_url, headers)
-            
-            if not user_data or not user_data.get("data"):
+            user = await self.get_user(username, headers)
+            if not user:
                 raise TwitchAPIError(f"User '{username}' not found")
             
-            broadcaster_id = user_data["data"][0]["id"]
-            broadcaster_name = user_data["data"][0]["login"]
+            broadcaster_id = user["id"]
+            broadcaster_name = user["login"]
             
             # Get schedule
             schedule_url = f"https://api.twitch.tv/helix/schedule?broadcaster_id={broadcaster_id}"
@@ -332,11 +380,56 @@ class TwitchSchedule(commands.Cog):
         except Exception as e:
             raise TwitchAPIError(f"Unexpected error getting schedule: {str(e)}")
 
+    async def get_user(self, username: str, headers: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """Resolve a login to {"id", "login"}, cached (unknown logins are cached briefly too)"""
+        username = username.strip().lower()
+        cached = await self.lookup_cache.aget("user", username)
+        if cached is not MISSING:
+            return cached
+        
+        user_data = await self._make_twitch_request(f"https://api.twitch.tv/helix/users?login={username}", headers)
+        if user_data is None:
+            return None
+        users = user_data.get("data")
+        users = users if isinstance(users, list) else []
+        user = {"id": users[0]["id"], "login": users[0]["login"]} if users else None
+        await self.lookup_cache.aput("user", username, user)
+        return user
+
+    async def prefetch_categories(self, guild: discord.Guild, category_ids: List[str]):
+        """Resolve every uncached category in one games?id=...&id=... call per 100 IDs"""
+        _, missing = await self.lookup_cache.aget_many("category", category_ids)
+        if not missing:
+            return
+        try:
+            token = await self.get_twitch_token()
+            credentials = await self.get_credentials()
+            if not token or not credentials:
+                return
+            headers = {"Client-ID": credentials[0], "Authorization": f"Bearer {token}"}
+            
+            for i in range(0, len(missing), 100):
+                batch = missing[i:i + 100]
+                url = "https://api.twitch.tv/helix/games?" + urlencode([("id", cid) for cid in batch])
+                data = await self._make_twitch_request(url, headers)
+                if data is None:
+                    continue
+                games = data.get("data")
+                found = {game["id"]: game for game in games} if isinstance(games, list) else {}
+                await self.lookup_cache.aput_many("category", {cid: found.get(cid) for cid in batch})
+        except Exception as e:
+            # Per-category lookups still work if the batch fails
+            await self._log_error(guild, f"Error prefetching categories: {str(e)}")
+
     async def get_category_info(self, category_id: str) -> Optional[Dict[str, Any]]:
         """Get category info with error handling"""
         try:
             if not category_id:
                 return None
+            
+            cached = await self.lookup_cache.aget("category", category_id)
+            if cached is not MISSING:
+                return cached
                 
             token = await self.get_twitch_token()
             if not token:
@@ -354,10 +447,13 @@ class TwitchSchedule(commands.Cog):
             
             url = f"https://api.twitch.tv/helix/games?id={category_id}"
             data = await self._make_twitch_request(url, headers)
+            if data is None:
+                return None
             
-            if data and data.get("data"):
-                return data["data"][0]
-            return None
+            games = data.get("data")
+            game = games[0] if isinstance(games, list) and games else None
+            await self.lookup_cache.aput("category", category_id, game)
+            return game
             
         except Exception:
             return None
@@ -379,13 +475,11 @@ class TwitchSchedule(commands.Cog):
                 "Authorization": f"Bearer {token}"
             }
             
-            user_url = f"https://api.twitch.tv/helix/users?login={username}"
-            user_data = await self._make_twitch_request(user_url, headers)
-            
-            if not user_data or not user_data.get("data"):
+            user = await self.get_user(username, headers)
+            if not user:
                 return None
             
-            broadcaster_id = user_data["data"][0]["id"]
+            broadcaster_id = user["id"]
             
             vods_url = f"https://api.twitch.tv/helix/videos?user_id={broadcaster_id}&type=archive&first=5&period=month"
             vod_data = await self._make_twitch_request(vods_url, headers)
@@ -416,45 +510,7 @@ class TwitchSchedule(commands.Cog):
             if not isinstance(schedule_for_image, list):
                 return None
             
-            with Image.open(self.template_path) as template_img:
-                img = template_img.copy()
-            
             event_count = await self.config.guild(guild).event_count()
-            actual_events = min(len(schedule_for_image), event_count)
-            
-            # Adjust image height if fewer events
-            if actual_events < event_count:
-                width, height = img.size
-                row_height = 150
-                height_to_remove = (event_count - actual_events) * row_height
-                new_height = max(height - height_to_remove, 400)
-                new_img = Image.new(img.mode, (width, new_height), color=(0, 0, 0))
-                
-                header_height = min(350, height)
-                new_img.paste(img.crop((0, 0, width, header_height)), (0, 0))
-                
-                if actual_events > 0:
-                    event_section_height = actual_events * row_height
-                    event_section_end = min(header_height + event_section_height, height)
-                    if event_section_end > header_height:
-                        new_img.paste(
-                            img.crop((0, header_height, width, event_section_end)), 
-                            (0, header_height)
-                        )
-                
-                img = new_img
-            
-            draw = ImageDraw.Draw(img)
-            
-            # Load fonts with fallback
-            try:
-                title_font = ImageFont.truetype(self.font_path, 90)
-                date_font = ImageFont.truetype(self.font_path, 40)
-                schedule_font = ImageFont.truetype(self.font_path, 42)
-            except Exception:
-                title_font = ImageFont.load_default()
-                date_font = ImageFont.load_default()
-                schedule_font = ImageFont.load_default()
             
             # Calculate date text
             if start_date is None:
@@ -474,42 +530,12 @@ class TwitchSchedule(commands.Cog):
             else:
                 date_text = start_of_week.strftime("%B %d")
             
-            width, _ = img.size
-            right_margin = 100
-            
             week_of_text = "Week of" if weeks_to_show == 1 else "Weeks of"
             
-            # Draw header text
-            try:
-                week_of_bbox = title_font.getbbox(week_of_text)
-                date_bbox = date_font.getbbox(date_text)
-                week_of_width = week_of_bbox[2] - week_of_bbox[0]
-                date_width = date_bbox[2] - date_bbox[0]
-                
-                week_of_x = max(0, width - right_margin - week_of_width)
-                date_x = max(0, width - right_margin - date_width)
-                
-                draw.text((week_of_x, 100), week_of_text, font=title_font, fill=(255, 255, 255))
-                draw.text((date_x, 180), date_text, font=date_font, fill=(255, 255, 255))
-            except Exception:
-                pass
-            
-            # Draw schedule items
-            day_x = 125
-            game_x = 125
-            initial_y = 350
-            row_height = 150
-            day_offset = -45
-            
-            for i, segment in enumerate(schedule_for_image):
-                if i >= actual_events:
-                    break
-                
+            # Prepare row text here; drawing happens in the renderer's worker thread
+            rows = []
+            for segment in schedule_for_image[:event_count]:
                 try:
-                    bar_y = initial_y + (i * row_height)
-                    day_y = bar_y + day_offset
-                    game_y = bar_y + 15
-                    
                     start_time_utc = dateutil.parser.isoparse(segment["start_time"])
                     if start_time_utc.tzinfo is None:
                         start_time_utc = start_time_utc.replace(tzinfo=datetime.timezone.utc)
@@ -523,52 +549,106 @@ class TwitchSchedule(commands.Cog):
                         category = segment.get("category", {})
                         title = category.get("name", "Untitled Stream")
                     
-                    title = str(title)[:50]
-                    
-                    draw.text((day_x, day_y), day_time, font=schedule_font, fill=(255, 255, 255))
-                    draw.text((game_x, game_y), title, font=schedule_font, fill=(255, 255, 255))
-                    
+                    rows.append((day_time, str(title)[:50]))
                 except Exception:
                     continue
             
-            buf = io.BytesIO()
-            img.save(buf, format="PNG", optimize=True)
-            buf.seek(0)
-            return buf
+            # Identical inputs (rows, layout, template and font contents) reuse the cached PNG
+            loop = asyncio.get_running_loop()
+            cache_key = content_key(
+                "schedule", rows, event_count, week_of_text, date_text, london_tz.zone,
+                await loop.run_in_executor(None, file_digest, self.template_path),
+                await loop.run_in_executor(None, file_digest, self.font_path),
+            )
+            image_bytes = await self.image_cache.aget(cache_key)
+            if image_bytes is None:
+                image_bytes = await self.renderer.render(
+                    self.template_path, self.font_path, rows, event_count, week_of_text, date_text
+                )
+                await self.image_cache.aput(cache_key, image_bytes)
+            return io.BytesIO(image_bytes)
             
         except Exception as e:
             await self._log_error(guild, f"Error generating schedule image: {str(e)}")
             return None
 
     async def schedule_update_loop(self):
-        """Main update loop with better error handling"""
+        """
+        Schedule every guild's next update and let the scheduler sleep until the earliest one.
+        Rebuilt hourly as a safety net, catching up on any run that was missed or never rescheduled.
+        """
         await self.bot.wait_until_ready()
         
         while True:
             try:
-                async with self._update_lock:
-                    for guild in self.bot.guilds:
-                        try:
-                            await self._process_guild_update(guild)
-                        except Exception as e:
-                            await self._log_error(guild, f"Error processing guild {guild.id}: {str(e)}")
-                
-                await asyncio.sleep(60)
-                
-            except asyncio.CancelledError:
-                break
+                all_guilds = await self.config.all_guilds()
+                for guild in self.bot.guilds:
+                    if guild.id in self._running_updates:
+                        continue  # Rescheduled when it finishes
+                    try:
+                        self._schedule_guild(guild.id, all_guilds.get(guild.id, {}), catch_up=True)
+                    except Exception as e:
+                        await self._log_error(guild, f"Error scheduling guild {guild.id}: {str(e)}")
+                self.scheduler.start(self.bot.loop)
             except Exception:
-                await asyncio.sleep(60)
+                # Keep the hourly rebuild alive; the next pass retries
+                log.exception("Error rebuilding the schedule")
+            await asyncio.sleep(self.RESCHEDULE_INTERVAL)
+
+    def _schedule_guild(self, guild_id: int, settings: dict, catch_up: bool = False):
+        """
+        (Re)schedule a guild's automatic update from its settings.
+        With catch_up, an occurrence missed while the bot was down runs straight away.
+        """
+        update_days = settings.get("update_days")
+        update_time = settings.get("update_time")
+        if not all([settings.get("channel_id"), settings.get("twitch_username"), update_days, update_time]):
+            self.scheduler.cancel(guild_id)
+            return
+        
+        now = datetime.datetime.now(london_tz)
+        last_run = settings.get("last_auto_update")
+        if catch_up and last_run:
+            missed = previous_weekly_run(update_days, update_time, london_tz, now)
+            if missed and missed.timestamp() > last_run:
+                self.scheduler.schedule(guild_id, now.timestamp())
+                return
+        
+        next_run = next_weekly_run(update_days, update_time, london_tz, now)
+        if next_run:
+            self.scheduler.schedule(guild_id, next_run.timestamp())
+
+    async def reschedule_guild(self, guild: discord.Guild):
+        """Call after changing a guild's channel, username, update days or update time"""
+        self._schedule_guild(guild.id, await self.config.guild(guild).all())
+
+    async def _run_scheduled_update(self, guild_id: int):
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return
+        self._running_updates.add(guild_id)
+        try:
+            async with self._update_lock:
+                await self._process_guild_update(guild)
+        except Exception as e:
+            await self._log_error(guild, f"Error processing guild {guild.id}: {str(e)}")
+        finally:
+            self._running_updates.discard(guild_id)
+            try:
+                # Mark the occurrence as handled even on failure, so a crash loop doesn't repost
+                await self.config.guild(guild).last_auto_update.set(datetime.datetime.now(datetime.timezone.utc).timestamp())
+                await self.reschedule_guild(guild)
+            except Exception as e:
+                # The hourly rebuild in schedule_update_loop picks the guild up again
+                await self._log_error(guild, f"Error rescheduling guild {guild.id}: {str(e)}")
 
     async def _process_guild_update(self, guild: discord.Guild):
-        """Process update for a single guild"""
+        """Post the scheduled update for a single guild"""
         config = self.config.guild(guild)
         channel_id = await config.channel_id()
         twitch_username = await config.twitch_username()
-        update_days = await config.update_days()
-        update_time = await config.update_time()
 
-        if not all([channel_id, twitch_username, update_days, update_time]):
+        if not channel_id or not twitch_username:
             return
 
         channel = guild.get_channel(channel_id)
@@ -581,27 +661,22 @@ class TwitchSchedule(commands.Cog):
             await self._log_error(guild, f"Missing permissions in {channel.name}")
             return
 
-        now = datetime.datetime.now(london_tz)
-        current_day = now.weekday()
-        current_time = now.strftime("%H:%M")
+        try:
+            weeks_to_show = await config.weeks_to_show()
+            today_utc = datetime.datetime.now(datetime.timezone.utc)
+            end_of_range = today_utc + timedelta(days=max(14, weeks_to_show * 7 + 7))
+            
+            all_upcoming_segments = await self.get_schedule_for_range(
+                twitch_username, today_utc.astimezone(london_tz), end_of_range.astimezone(london_tz)
+            )
 
-        if current_day in update_days and current_time == update_time:
-            try:
-                weeks_to_show = await config.weeks_to_show()
-                today_utc = datetime.datetime.now(datetime.timezone.utc)
-                end_of_range = today_utc + timedelta(days=max(14, weeks_to_show * 7 + 7))
+            if all_upcoming_segments is not None:
+                await self.post_schedule(channel, all_upcoming_segments)
+            else:
+                await self._log_error(guild, f"Failed to fetch schedule for {twitch_username}")
                 
-                all_upcoming_segments = await self.get_schedule_for_range(
-                    twitch_username, today_utc.astimezone(london_tz), end_of_range.astimezone(london_tz)
-                )
-
-                if all_upcoming_segments is not None:
-                    await self.post_schedule(channel, all_upcoming_segments)
-                else:
-                    await self._log_error(guild, f"Failed to fetch schedule for {twitch_username}")
-                    
-            except Exception as e:
-                await self._log_error(guild, f"Error in automated update: {str(e)}")
+        except Exception as e:
+            await self._log_error(guild, f"Error in automated update: {str(e)}")
 
     async def _log_error(self, guild: discord.Guild, error_message: str):
         """Enhanced error logging"""
@@ -626,8 +701,9 @@ class TwitchSchedule(commands.Cog):
         except Exception:
             pass
 
-    async def post_schedule(self, channel: discord.TextChannel, all_segments: list, dry_run: bool = False, start_date_for_image=None):
-        """Post schedule with improved error handling"""
+    async def post_schedule(self, channel: discord.TextChannel, all_segments: list, dry_run: bool = False,
+                            start_date_for_image=None, force: bool = False):
+        """Post schedule with improved error handling. Unchanged schedules are left in place unless forced."""
         try:
             if not isinstance(all_segments, list):
                 raise ValueError("Invalid segments data")
@@ -652,154 +728,189 @@ class TwitchSchedule(commands.Cog):
             
             future_segments.sort(key=lambda x: dateutil.parser.isoparse(x["start_time"]))
 
+            if start_date_for_image is None:
+                today_london = datetime.datetime.now(london_tz)
+                days_since_sunday = today_london.weekday() + 1
+                if days_since_sunday == 7:
+                    days_since_sunday = 0
+                start_of_first_week = today_london - timedelta(days=days_since_sunday)
+                start_of_first_week = start_of_first_week.replace(hour=0, minute=0, second=0, microsecond=0)
+            else:
+                start_of_first_week = start_date_for_image
+
+            # Skip the delete-and-repost when what would be posted is identical to what is up
+            post_digest = await self._post_digest(future_segments, twitch_username, event_count, weeks_to_show, start_of_first_week)
+            if not dry_run and not force and post_digest == await config.last_post_digest():
+                message_id = await config.schedule_message_id()
+                if message_id:
+                    try:
+                        await channel.fetch_message(message_id)
+                        return
+                    except (discord.NotFound, discord.Forbidden, discord.HTTPException):
+                        pass
+
             permissions = channel.permissions_for(guild.me)
             if not dry_run and not permissions.manage_messages:
                 await self._log_error(guild, f"Missing manage_messages permission in {channel.name}")
                 return
 
-            # Delete previous messages
+            # The new schedule goes up first and the old one is removed afterwards, so the
+            # channel never shows a half-deleted schedule
+            posted_ids = []
+            mention = None
             if not dry_run:
                 notify_role_id = await config.notify_role_id()
                 notify_role = guild.get_role(notify_role_id) if notify_role_id else None
-                
-                warning_content = "⚠️ Updating schedule - Previous messages will be deleted in 10 seconds..."
                 if notify_role:
                     # Special handling for @everyone role to prevent double @
-                    if notify_role.id == guild.default_role.id:  # @everyone role
-                        warning_content = f"@everyone\n{warning_content}"
-                    else:
-                        warning_content = f"{notify_role.mention}\n{warning_content}"
-                
-                try:
-                    warning_msg = await channel.send(warning_content)
-                    await asyncio.sleep(10)
-                    await warning_msg.delete()
-                except discord.errors.Forbidden:
-                    await self._log_error(guild, f"Cannot send/delete messages in {channel.name}")
-                    return
-                
-                # Delete bot messages
-                try:
-                    async for message in channel.history(limit=50):
-                        if message.author == self.bot.user and message.id != warning_msg.id:
-                            try:
-                                await message.delete()
-                                await asyncio.sleep(1.5)
-                            except:
-                                break
-                except Exception as e:
-                    await self._log_error(guild, f"Error during message cleanup: {str(e)}")
+                    mention = "@everyone" if notify_role.id == guild.default_role.id else notify_role.mention
 
-            # Generate content
-            async with channel.typing():
-                if start_date_for_image is None:
-                    today_london = datetime.datetime.now(london_tz)
-                    days_since_sunday = today_london.weekday() + 1
-                    if days_since_sunday == 7:
-                        days_since_sunday = 0
-                    start_of_first_week = today_london - timedelta(days=days_since_sunday)
-                    start_of_first_week = start_of_first_week.replace(hour=0, minute=0, second=0, microsecond=0)
-                else:
-                    start_of_first_week = start_date_for_image
+            async def send(**kwargs) -> discord.Message:
+                nonlocal mention
+                if mention:
+                    kwargs["content"] = mention
+                    mention = None
+                message = await channel.send(**kwargs)
+                posted_ids.append(message.id)
+                return message
 
-                next_stream_posted = False
-                first_message_for_pinning = None
+            # Box art for every embed below in one request
+            await self.prefetch_categories(guild, [(seg.get("category") or {}).get("id") for seg in future_segments])
 
-                # Process each week
-                for week_num in range(weeks_to_show):
-                    week_start = start_of_first_week + timedelta(days=week_num * 7)
-                    week_end = week_start + timedelta(days=6, hours=23, minutes=59, seconds=59)
-                    
-                    week_streams = []
-                    for stream in future_segments:
-                        try:
-                            stream_time = dateutil.parser.isoparse(stream["start_time"]).astimezone(london_tz)
-                            if week_start <= stream_time <= week_end:
-                                week_streams.append(stream)
-                        except (ValueError, KeyError):
-                            continue
-                    
-                    # Generate and post week image
-                    if week_streams:
-                        if dry_run:
-                            await channel.send(f"🧪 Dry run: Generating week {week_num + 1} schedule image...")
-                        
-                        image_streams = week_streams[:event_count]
-                        image_buf = await self.generate_schedule_image(image_streams, guild, start_date=week_start)
+            # Generate content
+            try:
+                async with channel.typing():
+                    next_stream_posted = False
+                    first_message_for_pinning = None
+
+                    # Process each week
+                    for week_num in range(weeks_to_show):
+                        week_start = start_of_first_week + timedelta(days=week_num * 7)
+                        week_end = week_start + timedelta(days=6, hours=23, minutes=59, seconds=59)
                         
-                        if image_buf:
+                        week_streams = []
+                        for stream in future_segments:
                             try:
-                                week_message = await channel.send(
-                                    file=discord.File(image_buf, filename=f"schedule_week_{week_num + 1}.png")
+                                stream_time = dateutil.parser.isoparse(stream["start_time"]).astimezone(london_tz)
+                                if week_start <= stream_time <= week_end:
+                                    week_streams.append(stream)
+                            except (ValueError, KeyError):
+                                continue
+                        
+                        # Generate and post week image
+                        if week_streams:
+                            if dry_run:
+                                await send(content=f"🧪 Dry run: Generating week {week_num + 1} schedule image...")
+                            
+                            image_streams = week_streams[:event_count]
+                            image_buf = await self.generate_schedule_image(image_streams, guild, start_date=week_start)
+                            
+                            if image_buf:
+                                try:
+                                    week_message = await send(
+                                        file=discord.File(image_buf, filename=f"schedule_week_{week_num + 1}.png")
+                                    )
+                                    if first_message_for_pinning is None:
+                                        first_message_for_pinning = week_message
+                                except discord.errors.HTTPException as e:
+                                    await self._log_error(guild, f"Failed to send image: {str(e)}")
+                            else:
+                                embed_fallback = discord.Embed(
+                                    title=f"Week {week_num + 1} Schedule",
+                                    description="Image generation failed, but streams are listed below.",
+                                    color=discord.Color.orange()
                                 )
+                                if dry_run:
+                                    embed_fallback.set_author(name="DRY RUN PREVIEW")
+                                week_message = await send(embed=embed_fallback)
                                 if first_message_for_pinning is None:
                                     first_message_for_pinning = week_message
-                            except discord.errors.HTTPException as e:
-                                await self._log_error(guild, f"Failed to send image: {str(e)}")
                         else:
-                            embed_fallback = discord.Embed(
-                                title=f"Week {week_num + 1} Schedule",
-                                description="Image generation failed, but streams are listed below.",
+                            week_title = f"Week of {week_start.strftime('%B %d')}"
+                            embed_no_streams = discord.Embed(
+                                title=f"No Streams Scheduled - {week_title}",
+                                description="No streams currently scheduled for this week on Twitch.",
                                 color=discord.Color.orange()
                             )
                             if dry_run:
-                                embed_fallback.set_author(name="DRY RUN PREVIEW")
-                            week_message = await channel.send(embed=embed_fallback)
+                                embed_no_streams.set_author(name="DRY RUN PREVIEW")
+                                embed_no_streams.color = discord.Color.dark_grey()
+                            
+                            week_message = await send(embed=embed_no_streams)
                             if first_message_for_pinning is None:
                                 first_message_for_pinning = week_message
-                    else:
-                        week_title = f"Week of {week_start.strftime('%B %d')}"
-                        embed_no_streams = discord.Embed(
-                            title=f"No Streams Scheduled - {week_title}",
-                            description="No streams currently scheduled for this week on Twitch.",
-                            color=discord.Color.orange()
+
+                        # Post individual stream embeds, up to Discord's 10 per message
+                        week_embeds = []
+                        for stream in week_streams:
+                            try:
+                                embed = await self._create_stream_embed(
+                                    stream, twitch_username, future_segments, 
+                                    next_stream_posted, dry_run
+                                )
+                                if embed:
+                                    week_embeds.append(embed)
+                                    if not next_stream_posted and stream == future_segments[0] if future_segments else False:
+                                        next_stream_posted = True
+                            except Exception as e:
+                                await self._log_error(guild, f"Error creating stream embed: {str(e)}")
+                                continue
+                        for i in range(0, len(week_embeds), 10):
+                            try:
+                                await send(embeds=week_embeds[i:i + 10])
+                            except discord.errors.HTTPException as e:
+                                await self._log_error(guild, f"Error posting stream embeds: {str(e)}")
+
+                    # Handle case with no streams at all
+                    if not future_segments:
+                        week_text = "week" if weeks_to_show == 1 else f"{weeks_to_show} weeks"
+                        embed = discord.Embed(
+                            title="No Upcoming Streams",
+                            description=f"No streams currently scheduled on Twitch for the next {week_text}.",
+                            color=discord.Color.red()
                         )
                         if dry_run:
-                            embed_no_streams.set_author(name="DRY RUN PREVIEW")
-                            embed_no_streams.color = discord.Color.dark_grey()
-                        
-                        week_message = await channel.send(embed=embed_no_streams)
-                        if first_message_for_pinning is None:
-                            first_message_for_pinning = week_message
-
-                    # Post individual stream embeds
-                    for stream in week_streams:
-                        try:
-                            embed = await self._create_stream_embed(
-                                stream, twitch_username, future_segments, 
-                                next_stream_posted, dry_run
-                            )
-                            if embed:
-                                await channel.send(embed=embed)
-                                if not next_stream_posted and stream == future_segments[0] if future_segments else False:
-                                    next_stream_posted = True
-                                await asyncio.sleep(0.5)
-                        except Exception as e:
-                            await self._log_error(guild, f"Error posting stream embed: {str(e)}")
-                            continue
-
-                # Handle case with no streams at all
-                if not future_segments:
-                    week_text = "week" if weeks_to_show == 1 else f"{weeks_to_show} weeks"
-                    embed = discord.Embed(
-                        title="No Upcoming Streams",
-                        description=f"No streams currently scheduled on Twitch for the next {week_text}.",
-                        color=discord.Color.red()
-                    )
-                    if dry_run:
-                        embed.set_author(name="DRY RUN PREVIEW")
-                        embed.color = discord.Color.dark_grey()
-                    await channel.send(embed=embed)
+                            embed.set_author(name="DRY RUN PREVIEW")
+                            embed.color = discord.Color.dark_grey()
+                        await send(embed=embed)
+            except Exception:
+                # Leave the previous schedule up rather than a partial new one
+                if not dry_run:
+                    await self._delete_messages(channel, posted_ids)
+                raise
 
-                # Pin the first message
-                if not dry_run and first_message_for_pinning and permissions.manage_messages:
-                    try:
-                        await first_message_for_pinning.pin()
-                        await config.schedule_message_id.set(first_message_for_pinning.id)
-                    except discord.errors.Forbidden:
-                        await self._log_error(guild, f"Cannot pin messages in {channel.name}")
-                    except Exception as e:
-                        await self._log_error(guild, f"Error pinning message: {str(e)}")
+            if dry_run:
+                return
+
+            # Swap: remove the previous schedule now that the new one is complete
+            previous_ids = [mid for mid in await config.schedule_message_ids() if mid not in posted_ids]
+            if previous_ids:
+                # The schedule channel may have changed since; delete where the old post lives
+                previous_channel_id = await config.schedule_message_channel_id()
+                previous_channel = guild.get_channel(previous_channel_id) if previous_channel_id else channel
+                if previous_channel:
+                    await self._delete_messages(previous_channel, previous_ids)
+            else:
+                # Nothing tracked yet (first post since upgrading); clear our recent messages as before
+                try:
+                    stale = [message.id async for message in channel.history(limit=50)
+                             if message.author == self.bot.user and message.id not in posted_ids]
+                    await self._delete_messages(channel, stale)
+                except Exception as e:
+                    await self._log_error(guild, f"Error during message cleanup: {str(e)}")
+            await config.schedule_message_ids.set(posted_ids)
+            await config.schedule_message_channel_id.set(channel.id)
+
+            # Pin the first message
+            if first_message_for_pinning and permissions.manage_messages:
+                try:
+                    await first_message_for_pinning.pin()
+                    await config.schedule_message_id.set(first_message_for_pinning.id)
+                    await config.last_post_digest.set(post_digest)
+                except discord.errors.Forbidden:
+                    await self._log_error(guild, f"Cannot pin messages in {channel.name}")
+                except Exception as e:
+                    await self._log_error(guild, f"Error pinning message: {str(e)}")
 
         except Exception as e:
             await self._log_error(guild, f"Error in post_schedule: {str(e)}")
@@ -811,6 +922,57 @@ class TwitchSchedule(commands.Cog):
             except:
                 pass
 
+    async def _delete_messages(self, channel: discord.TextChannel, message_ids: list):
+        """Delete messages by ID: bulk for those under 14 days old, one at a time for older ones"""
+        if not message_ids:
+            return
+        # Discord rejects bulk deletes of messages older than 14 days; keep a margin for clock skew
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - timedelta(days=14) + timedelta(minutes=10)
+        recent, old = [], []
+        for message_id in dict.fromkeys(message_ids):
+            if discord.utils.snowflake_time(message_id) > cutoff:
+                recent.append(discord.Object(id=message_id))
+            else:
+                old.append(discord.Object(id=message_id))
+
+        try:
+            for i in range(0, len(recent), 100):
+                chunk = recent[i:i + 100]
+                try:
+                    await channel.delete_messages(chunk)
+                except discord.NotFound:
+                    old.extend(chunk)  # Some were already gone; delete the rest individually
+            for message in old:
+                try:
+                    await channel.get_partial_message(message.id).delete()
+                except discord.NotFound:
+                    pass
+        except discord.Forbidden:
+            await self._log_error(channel.guild, f"Cannot delete messages in {channel.name}")
+        except discord.HTTPException as e:
+            await self._log_error(channel.guild, f"Error deleting old schedule messages: {str(e)}")
+
+    async def _post_digest(self, future_segments: list, twitch_username: str, event_count: int,
+                           weeks_to_show: int, start_of_first_week) -> str:
+        """Hash of everything that decides what post_schedule sends for the weeks shown."""
+        range_end = start_of_first_week + timedelta(days=weeks_to_show * 7)
+        shown = []
+        for seg in future_segments:
+            try:
+                if dateutil.parser.isoparse(seg["start_time"]).astimezone(london_tz) < range_end:
+                    shown.append((
+                        seg.get("start_time"), seg.get("end_time"), seg.get("title"),
+                        (seg.get("category") or {}).get("id"), (seg.get("category") or {}).get("name"),
+                    ))
+            except (ValueError, KeyError, TypeError):
+                continue
+        loop = asyncio.get_running_loop()
+        return content_key(
+            shown, twitch_username, event_count, weeks_to_show, start_of_first_week.isoformat(), london_tz.zone,
+            await loop.run_in_executor(None, file_digest, self.template_path),
+            await loop.run_in_executor(None, file_digest, self.font_path),
+        )
+
     async def _create_stream_embed(self, stream: dict, twitch_username: str, 
                                  all_streams: list, next_stream_posted: bool, 
                                  dry_run: bool) -> Optional[discord.Embed]:
@@ -988,7 +1150,7 @@ class TwitchSchedule(commands.Cog):
                     )
 
                     if all_segments is not None:
-                        await self.post_schedule(channel, all_segments, start_date_for_image=start_date_for_image_param)
+                        await self.post_schedule(channel, all_segments, start_date_for_image=start_date_for_image_param, force=True)
                         await ctx.send("✅ Schedule updated!")
                     else:
                         await ctx.send("❌ Failed to fetch schedule from Twitch!")
@@ -1165,6 +1327,11 @@ class TwitchSchedule(commands.Cog):
         embed.add_field(name="Username", value=username, inline=True)
         embed.add_field(name="Weeks", value=str(weeks), inline=True)
         
+        await self.reschedule_guild(ctx.guild)
+        next_due = self.scheduler.next_due(ctx.guild.id)
+        if next_due:
+            embed.add_field(name="Next Update", value=f"<t:{int(next_due)}:F>", inline=False)
+        
         await ctx.send(embed=embed)
 
     @twitchschedule.command(name="notify")
@@ -1220,12 +1387,35 @@ class TwitchSchedule(commands.Cog):
         embed.add_field(name="Weeks to Show", value=f"{weeks_to_show} {week_text}", inline=True)
         embed.add_field(name="Update Time (UK)", value=update_time or "Not set", inline=True)
         embed.add_field(name="Update Days (UK)", value=update_days_str, inline=True)
+        next_due = self.scheduler.next_due(ctx.guild.id)
+        embed.add_field(name="Next Update", value=f"<t:{int(next_due)}:R>" if next_due else "Not scheduled", inline=True)
         embed.add_field(name="Notify Role", value=notify_role.mention if notify_role else "Not set", inline=True)
         embed.add_field(name="Event Count", value=str(event_count), inline=True)
         embed.add_field(name="Error Log Channel", value=log_channel.mention if log_channel else "Not set", inline=True)
         embed.add_field(name="Custom Template", value=custom_template_url or "Default", inline=True)
         embed.add_field(name="Custom Font", value=custom_font_url or "Default", inline=True)
         
+        render = self.renderer.metrics
+        embed.add_field(
+            name="Image Renderer",
+            value=(
+                f"Renders: {render['renders']} ({render['failures']} failed)\n"
+                f"Last: {render['last_render_ms']:.0f}ms render, {render['last_wait_ms']:.0f}ms queued\n"
+                f"Max: {render['max_render_ms']:.0f}ms render, {render['max_wait_ms']:.0f}ms queued"
+            ),
+            inline=False
+        )
+        
+        lookups = self.lookup_cache.stats
+        embed.add_field(
+            name="Lookup Cache",
+            value=(
+                f"Hits: {lookups['memory_hits']} memory, {lookups['disk_hits']} disk\n"
+                f"Misses: {lookups['misses']}, writes: {lookups['writes']}"
+            ),
+            inline=False
+        )
+        
         await ctx.send(embed=embed)
 
     @twitchschedule.command(name="test")
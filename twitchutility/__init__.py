@@ -0,0 +1,4 @@
+from .twitchutility import TwitchUtility
+
+async def setup(bot):
+    await bot.add_cog(TwitchUtility(bot))
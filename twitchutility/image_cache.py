@@ -0,0 +1,109 @@
+"""
+Content-addressed on-disk cache of rendered schedule images, shared by
+TwitchSchedule and TwitchUtility.
+
+Each cog is installed on its own, so this module is kept byte-identical in
+twitchschedule/ and twitchutility/. twitchschedule/image_cache.py is the
+canonical copy: change it there, then copy it across.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+_digests: Dict[str, Tuple[tuple, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: str) -> Optional[str]:
+    """SHA-1 of a file's contents, recomputed only when its mtime or size changes."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (stat.st_mtime, stat.st_size)
+    with _digests_lock:
+        cached = _digests.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _digests_lock:
+        _digests[path] = (key, digest)
+    return digest
+
+
+def content_key(*parts) -> str:
+    """Stable hash of JSON-serialisable render inputs."""
+    blob = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """
+    On-disk LRU cache of rendered images, addressed by a hash of their inputs.
+
+    Entries are ``<key>.png`` files in ``directory``. Reading an entry bumps
+    its mtime, and writing one evicts the least recently used entries until
+    the directory is under ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.png")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".png"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, key)
+
+    async def aput(self, key: str, data: bytes):
+        await asyncio.get_running_loop().run_in_executor(None, self.put, key, data)
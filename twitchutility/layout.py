@@ -0,0 +1,170 @@
+import io
+import logging
+import os
+import threading # Guards the layout caches across render threads
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageFont # Core library for image generation
+
+log = logging.getLogger("red.twitchutility.layout")
+
+
+class ScheduleLayout:
+    """
+    Layout engine for schedule images drawn from one template/font pair.
+    Fonts, row geometry and text widths are worked out once per template/font version, and the template
+    cut down to N rows (with the static "Week of" heading drawn in) is kept as a pre-rendered base layer.
+    A render copies that layer and draws only the text that changes from week to week.
+    """
+
+    HEADER_HEIGHT = 350 # Height of the top part of the template (the "Week of" title)
+    ROW_HEIGHT = 150 # Height allocated for each event row
+    FOOTER_HEIGHT = 100 # Height of the bottom part of the template
+    RIGHT_MARGIN = 100
+    TEXT_X = 125 # Left edge of the day/time and title text in each row
+    ROW_TEXT_Y = 20 # Offset of the first text line from the top of its row
+    LINE_SPACING = 5 # Space between date/time and title/game
+    HEADING_Y = 100
+    HEADING_TEXT = "Week of"
+    FONT_SIZES = {"title": 90, "date": 40, "event": 42, "small_event": 30} # small_event is for longer titles
+    TEXT_COLOR = (255, 255, 255)
+    # Output format -> (file extension, Pillow save arguments)
+    FORMATS = {
+        "png": ("png", {"format": "PNG"}),
+        "webp": ("webp", {"format": "WEBP", "lossless": True, "method": 4}),
+        "palette": ("png", {"format": "PNG", "optimize": True}), # Quantised to 256 colours first
+    }
+
+    def __init__(self, max_text_widths: int = 4096):
+        self.max_text_widths = max_text_widths
+        self._lock = threading.Lock() # Renders run in executor threads
+        self._assets_key = None
+        self._template = None
+        self._fonts = {}
+        self._date_y = 0
+        self._layers = {} # rows shown -> base layer
+        self._text_widths = OrderedDict() # (font name, text) -> width in pixels
+        self.stats = {"renders": 0, "asset_loads": 0, "layer_builds": 0, "width_hits": 0, "width_misses": 0}
+
+    @staticmethod
+    def _file_version(path: str):
+        stat = os.stat(path)
+        return (path, stat.st_mtime, stat.st_size)
+
+    def _load_assets(self, template_path: str, font_path: str):
+        """(Re)loads the template and fonts if either file changed since the last render."""
+        key = (self._file_version(template_path), self._file_version(font_path))
+        if key == self._assets_key:
+            return
+        with Image.open(template_path) as template:
+            self._template = template.convert("RGBA") # Ensure RGBA for potential transparency
+        self._fonts = {name: ImageFont.truetype(font_path, size) for name, size in self.FONT_SIZES.items()}
+        self._layers.clear()
+        self._text_widths.clear()
+        heading_bbox = self._fonts["title"].getbbox(self.HEADING_TEXT)
+        self._date_y = self.HEADING_Y + (heading_bbox[3] - heading_bbox[1]) + 20 # Below "Week of"
+        self._assets_key = key
+        self.stats["asset_loads"] += 1
+
+    def text_width(self, font_name: str, text: str) -> int:
+        key = (font_name, text)
+        width = self._text_widths.get(key)
+        if width is not None:
+            self._text_widths.move_to_end(key)
+            self.stats["width_hits"] += 1
+            return width
+        left, _, right, _ = self._fonts[font_name].getbbox(text)
+        width = right - left
+        self._text_widths[key] = width
+        if len(self._text_widths) > self.max_text_widths:
+            self._text_widths.popitem(last=False)
+        self.stats["width_misses"] += 1
+        return width
+
+    def _fit_title(self, title: str, max_width: int) -> tuple:
+        """
+        Returns (font name, text) for a stream title: the event font if it fits, else the small font,
+        else the longest prefix that fits in the small font followed by "...".
+        """
+        if self.text_width("event", title) <= max_width:
+            return "event", title
+        if self.text_width("small_event", title) <= max_width:
+            return "small_event", title
+        # Widths grow with length, so binary search the cut instead of trimming a character at a time
+        low, high = 1, len(title)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.text_width("small_event", title[:mid].rstrip() + "...") <= max_width:
+                low = mid
+            else:
+                high = mid - 1
+        return "small_event", title[:low].rstrip() + "..."
+
+    def _base_layer(self, rows: int) -> Image.Image:
+        """The template trimmed to `rows` event rows with the static heading drawn, built once per row count."""
+        layer = self._layers.get(rows)
+        if layer is not None:
+            return layer
+
+        template = self._template
+        width, height = template.size
+        target_height = self.HEADER_HEIGHT + rows * self.ROW_HEIGHT + self.FOOTER_HEIGHT
+        if target_height < height: # Crop if fewer events than template allows
+            layer = Image.new("RGBA", (width, target_height), (0, 0, 0, 0)) # Transparent background
+            # Header and the rows in use sit at the same offsets as in the template, so they copy in one paste
+            layer.paste(template.crop((0, 0, width, self.HEADER_HEIGHT + rows * self.ROW_HEIGHT)), (0, 0))
+            # Footer moves up to the new bottom
+            layer.paste(template.crop((0, height - self.FOOTER_HEIGHT, width, height)), (0, target_height - self.FOOTER_HEIGHT))
+        else:
+            if target_height > height:
+                log.warning(f"Calculated image height ({target_height}) exceeds template height ({height}). "
+                            f"Consider a taller template or fewer events.")
+            layer = template.copy()
+
+        heading_x = width - self.RIGHT_MARGIN - self.text_width("title", self.HEADING_TEXT)
+        ImageDraw.Draw(layer).text((heading_x, self.HEADING_Y), self.HEADING_TEXT, font=self._fonts["title"], fill=self.TEXT_COLOR)
+        self._layers[rows] = layer
+        self.stats["layer_builds"] += 1
+        return layer
+
+    def render(self, template_path: str, font_path: str, date_text: str, rows: list, max_rows: int) -> Image.Image:
+        """
+        Draws a schedule image. `rows` are (day/time text, stream title) pairs; at most `max_rows` are shown.
+        Raises OSError if the template or font can't be loaded.
+        """
+        with self._lock:
+            self._load_assets(template_path, font_path)
+            rows = rows[:max_rows]
+            img = self._base_layer(len(rows)).copy()
+            draw = ImageDraw.Draw(img)
+            width = img.width
+
+            date_x = width - self.RIGHT_MARGIN - self.text_width("date", date_text)
+            draw.text((date_x, self._date_y), date_text, font=self._fonts["date"], fill=self.TEXT_COLOR)
+
+            max_title_width = width - self.TEXT_X - self.RIGHT_MARGIN
+            title_offset = self.FONT_SIZES["event"] + self.LINE_SPACING
+            for i, (day_time_text, stream_title) in enumerate(rows):
+                row_y = self.HEADER_HEIGHT + self.ROW_TEXT_Y + i * self.ROW_HEIGHT
+                draw.text((self.TEXT_X, row_y), day_time_text, font=self._fonts["event"], fill=self.TEXT_COLOR)
+                font_name, title_text = self._fit_title(stream_title, max_title_width)
+                draw.text((self.TEXT_X, row_y + title_offset), title_text, font=self._fonts[font_name], fill=self.TEXT_COLOR)
+            self.stats["renders"] += 1
+            return img
+
+    @classmethod
+    def encode(cls, img: Image.Image, image_format: str = "png") -> bytes:
+        """
+        Encodes a rendered image. "png" is fastest to encode, "webp" (lossless) is smaller for more CPU,
+        and "palette" quantises to 256 colours for the smallest PNG at the cost of some colour fidelity.
+        """
+        _, save_args = cls.FORMATS.get(image_format, cls.FORMATS["png"])
+        if image_format == "palette":
+            img = img.quantize(colors=256, method=Image.FASTOCTREE) # FASTOCTREE is the quantiser that handles RGBA
+        buffer = io.BytesIO()
+        img.save(buffer, **save_args)
+        return buffer.getvalue()
+
+    @classmethod
+    def extension(cls, image_format: str) -> str:
+        return cls.FORMATS.get(image_format, cls.FORMATS["png"])[0]
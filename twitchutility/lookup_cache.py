@@ -0,0 +1,134 @@
+"""
+Twitch user/category lookup cache, shared by TwitchSchedule and TwitchUtility.
+
+Each cog is installed on its own, so this module is kept byte-identical in
+twitchschedule/ and twitchutility/. twitchschedule/lookup_cache.py is the
+canonical copy: change it there, then copy it across.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Returned by get() when there is no usable entry (None is a valid, negatively cached value)
+MISSING = object()
+
+DEFAULT_TTLS = {
+    "user": 7 * 86400,       # login -> user record
+    "category": 30 * 86400,  # category id -> game record (name, box art)
+}
+NEGATIVE_TTL = 3600          # unknown users / categories are retried hourly
+
+
+class LookupCache:
+    """
+    Two-tier TTL cache for Twitch lookups that almost never change.
+
+    Entries live in a small in-memory LRU in front of a SQLite file. A
+    memory miss falls through to disk and promotes the entry. Each kind
+    has its own TTL, and a ``None`` value caches a negative result for
+    ``negative_ttl`` so unknown users aren't looked up on every call.
+    """
+
+    def __init__(self, path: str, max_memory: int = 512, ttls: Optional[Dict[str, int]] = None,
+                 negative_ttl: int = NEGATIVE_TTL):
+        self.path = path
+        self.max_memory = max_memory
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.negative_ttl = negative_ttl
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            "kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT, expires REAL NOT NULL, "
+            "PRIMARY KEY (kind, key))"
+        )
+        self._db.execute("DELETE FROM lookups WHERE expires < ?", (time.time(),))
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _remember(self, mem_key: Tuple[str, str], expires: float, value: Any):
+        self._memory[mem_key] = (expires, value)
+        self._memory.move_to_end(mem_key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def get(self, kind: str, key: str) -> Any:
+        """The cached value (possibly None for a negative entry), or MISSING."""
+        mem_key = (kind, str(key).lower())
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(mem_key)
+            if cached is not None:
+                if cached[0] > now:
+                    self._memory.move_to_end(mem_key)
+                    self.stats["memory_hits"] += 1
+                    return cached[1]
+                del self._memory[mem_key]
+
+            row = self._db.execute(
+                "SELECT value, expires FROM lookups WHERE kind = ? AND key = ?", mem_key
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.stats["misses"] += 1
+                return MISSING
+            value = json.loads(row[0]) if row[0] is not None else None
+            self._remember(mem_key, row[1], value)
+            self.stats["disk_hits"] += 1
+            return value
+
+    def get_many(self, kind: str, keys: Iterable[str]) -> Tuple[Dict[str, Any], List[str]]:
+        """Split ``keys`` into ({key: cached value}, [keys to fetch])."""
+        found, missing = {}, []
+        for key in dict.fromkeys(str(k) for k in keys if k):
+            value = self.get(kind, key)
+            if value is MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        return found, missing
+
+    def put_many(self, kind: str, items: Dict[str, Any]):
+        """Store results; a None value is cached as a negative result."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        with self._lock:
+            for key, value in items.items():
+                expires = now + (self.negative_ttl if value is None else self.ttls.get(kind, NEGATIVE_TTL))
+                mem_key = (kind, str(key).lower())
+                self._remember(mem_key, expires, value)
+                rows.append((*mem_key, json.dumps(value) if value is not None else None, expires))
+            self._db.executemany("INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?)", rows)
+            self._db.commit()
+            self.stats["writes"] += len(rows)
+
+    def put(self, kind: str, key: str, value: Any):
+        self.put_many(kind, {key: value})
+
+    # Async wrappers: SQLite reads and commits run in the default executor, off the event loop
+
+    async def aget(self, kind: str, key: str) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, kind, key)
+
+    async def aget_many(self, kind: str, keys: Iterable[str]) -> Tuple[Dict[str, Any], List[str]]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_many, kind, list(keys))
+
+    async def aput_many(self, kind: str, items: Dict[str, Any]):
+        await asyncio.get_running_loop().run_in_executor(None, self.put_many, kind, items)
+
+    async def aput(self, kind: str, key: str, value: Any):
+        await self.aput_many(kind, {key: value})
@@ -4,9 +4,9 @@ import aiohttp
 import discord
 from redbot.core import commands, Config
 from redbot.core.bot import Red
+from redbot.core.data_manager import cog_data_path
 from redbot.core.tasks import loop
 from redbot.core.utils.predicates import MessagePredicate
-from PIL import Image, ImageDraw, ImageFont # Core library for image generation
 import io
 import os
 import datetime
@@ -15,6 +15,14 @@ import pytz # For timezone handling
 import dateutil.parser # For parsing ISO 8601 dates from Twitch API
 import re # For time format validation
 import traceback # For detailed error logging
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from .image_cache import ImageCache, content_key, file_digest
+from .layout import ScheduleLayout
+from .lookup_cache import MISSING, LookupCache
+from .scheduler import DueScheduler, fan_out, next_weekly_run, previous_weekly_run
 
 log = logging.getLogger("red.twitchutility")
 
@@ -33,20 +41,29 @@ DEFAULT_GUILD_SETTINGS = {
     "auto_update_days": [],  # List of integers (0=Monday, 6=Sunday) for automatic update days
     "auto_update_time": None,  # String (HH:MM) for the time of automatic updates
     "schedule_message_id": None,  # The ID of the last posted schedule message (for pin/delete)
+    "schedule_message_ids": [],  # IDs of every message in the current schedule post, removed when it is replaced
+    "schedule_message_channel_id": None,  # Channel the schedule_message_ids were posted in
     "schedule_ping_role_id": None,  # Role ID to ping for schedule updates (renamed for clarity)
     "display_event_count": 5,  # Number of upcoming events to display on the image (1-10)
     "display_timezone": "Europe/London",  # Timezone for displaying times on the image and text list
     "last_auto_update_date": None, # Stores the date (YYYY-MM-DD) of the last successful auto-update
     "font_url": "https://zerolivesleft.net/notelkz/P22.ttf", # Default URL for the font file
     "template_image_url": "https://zerolivesleft.net/notelkz/schedule.png", # Default URL for the template image
+    "schedule_image_key": None, # Content hash of the schedule image currently posted
+    "schedule_image_format": "png", # Upload format: "png", "webp" (lossless) or "palette" (256-colour PNG)
 }
 
+
 class TwitchUtility(commands.Cog):
     """
     A comprehensive utility cog for Twitch streamers, offering live notifications
     and automatic schedule posting.
     """
 
+    GUILD_CONCURRENCY = 10 # Guilds handled at once by the background loops
+    GUILD_TIMEOUT = 30 # Seconds one guild's live check may take before it is abandoned for this tick
+    SCHEDULE_UPDATE_TIMEOUT = 180 # Seconds one guild's automatic schedule post may take
+
     def __init__(self, bot: Red):
         self.bot = bot
         # Initialize Config for guild-specific settings
@@ -77,6 +94,23 @@ class TwitchUtility(commands.Cog):
             os.makedirs(self.cache_directory)
             log.info(f"Created asset cache directory: {self.cache_directory}")
 
+        # Rendered schedule images, reused when nothing that goes into them has changed
+        self.image_cache = ImageCache(str(cog_data_path(self) / "schedule_images"))
+        self.schedule_layout = ScheduleLayout()
+
+        # User IDs and categories, cached across reloads (see lookup_cache.LookupCache)
+        self.lookup_cache = LookupCache(str(cog_data_path(self) / "lookups.sqlite3"))
+
+        # Automatic schedule posts, keyed by guild ID and run at each guild's next due time
+        self.schedule_scheduler = DueScheduler(
+            self._run_auto_schedule_update, concurrency=self.GUILD_CONCURRENCY, timeout=self.SCHEDULE_UPDATE_TIMEOUT
+        )
+        self.loop_stats = {} # Duration and outcome of the last pass of each background loop
+
+        # Live-status transitions can come from the poll loop and EventSub at once; one lock per guild
+        self._live_status_locks = defaultdict(asyncio.Lock)
+        self._last_live_reconcile = 0.0
+
         # Asyncio Event to ensure the cog is fully initialized and credentials are ready
         self.initialization_complete = asyncio.Event()
 
@@ -102,8 +136,10 @@ class TwitchUtility(commands.Cog):
         log.info("TwitchUtility cog unloading...")
         self.check_twitch_stream_status.cancel() # Stop live notification loop
         self.auto_schedule_updater.cancel() # Stop schedule update loop
+        self.schedule_scheduler.stop()
         if self.session:
             await self.session.close() # Close the aiohttp session gracefully
+        self.lookup_cache.close()
         log.info("TwitchUtility cog unloaded successfully.")
 
     # --- Shared Twitch API Authentication and Helpers ---
@@ -177,26 +213,61 @@ class TwitchUtility(commands.Cog):
             "Authorization": f"Bearer {self.twitch_access_token}"
         }
 
+    def _helix_client(self):
+        """
+        Shared Helix client from the Zerolivesleft cog, or None if that cog isn't loaded.
+        It pools connections and shares one app token and rate-limit bucket across the Twitch cogs.
+        """
+        cog = self.bot.get_cog("Zerolivesleft")
+        return getattr(cog, "helix", None)
+
+    async def _twitch_get_json(self, api_url: str) -> tuple:
+        """
+        GETs a Helix URL and returns (status, json). Status is None if no request could be made.
+        Prefers the shared Helix client and falls back to this cog's own session and token.
+        """
+        helix = self._helix_client()
+        if helix:
+            return await helix.get(api_url)
+
+        headers = await self._get_twitch_request_headers()
+        if not headers:
+            return None, None
+        async with self.session.get(api_url, headers=headers) as response:
+            if response.status == 401:
+                # Token revoked or expired early; refresh on the next request
+                self.twitch_access_token = None
+            try:
+                data = await response.json()
+            except (aiohttp.ContentTypeError, ValueError):
+                data = None
+            return response.status, data
+
     async def _fetch_twitch_user_id(self, username: str) -> str | None:
         """
         Fetches the Twitch user ID for a given Twitch username.
         Returns the user ID as a string, or None if not found/error.
         """
-        headers = await self._get_twitch_request_headers()
-        if not headers:
-            return None
+        cached = await self.lookup_cache.aget("user", username)
+        if cached is not MISSING:
+            return cached
 
         api_url = f"https://api.twitch.tv/helix/users?login={username}"
         try:
-            async with self.session.get(api_url, headers=headers) as response:
-                response.raise_for_status()
-                data = await response.json()
-                if data and data.get("data"):
-                    user_id = data["data"][0]["id"]
-                    log.debug(f"Resolved Twitch username '{username}' to ID '{user_id}'.")
-                    return user_id
-                log.warning(f"Twitch user ID not found for username '{username}'. API response: {data}")
+            status, data = await self._twitch_get_json(api_url)
+            if status is None:
+                return None
+            if status != 200:
+                log.error(f"HTTP error fetching Twitch user ID for '{username}': {status} - {data}")
                 return None
+            if data and data.get("data"):
+                user_id = data["data"][0]["id"]
+                log.debug(f"Resolved Twitch username '{username}' to ID '{user_id}'.")
+                await self.lookup_cache.aput_many("user", {username: user_id})
+                return user_id
+            log.warning(f"Twitch user ID not found for username '{username}'. API response: {data}")
+            await self.lookup_cache.aput_many("user", {username: None}) # Don't ask again for a while
+            return None
         except aiohttp.ClientError as e:
             log.error(f"HTTP error fetching Twitch user ID for '{username}': {e}", exc_info=True)
             return None
@@ -206,28 +277,12 @@ class TwitchUtility(commands.Cog):
 
     # --- Live Notification Specifics ---
 
-    async def _is_streamer_live(self, twitch_user_id: str) -> bool | None:
+    def _live_status_registry(self):
         """
-        Checks if a Twitch streamer is currently live.
-        Returns True if live, False if offline, None if error/not found.
+        Shared live-status registry from the Zerolivesleft cog, or None if that cog isn't loaded.
         """
-        headers = await self._get_twitch_request_headers()
-        if not headers:
-            return None
-
-        api_url = f"https://api.twitch.tv/helix/streams?user_id={twitch_user_id}"
-        try:
-            async with self.session.get(api_url, headers=headers) as response:
-                response.raise_for_status()
-                data = await response.json()
-                # If 'data' is not empty, the streamer is live
-                return bool(data and data.get("data"))
-        except aiohttp.ClientError as e:
-            log.error(f"Error checking live status for {twitch_user_id}: {e}", exc_info=True)
-            return None
-        except Exception as e:
-            log.error(f"Unexpected error checking live status for {twitch_user_id}: {e}", exc_info=True)
-            return None
+        cog = self.bot.get_cog("Zerolivesleft")
+        return getattr(cog, "live_status", None)
 
     async def _send_go_live_notification(self, guild: discord.Guild, channel: discord.TextChannel, settings: dict):
         """
@@ -269,36 +324,32 @@ class TwitchUtility(commands.Cog):
         Fetches Twitch schedule segments for a broadcaster within a UTC time range.
         Returns a list of schedule segments, an empty list if no schedule, or None on error.
         """
-        headers = await self._get_twitch_request_headers()
-        if not headers:
-            return None
-
         api_url = f"https://api.twitch.tv/helix/schedule?broadcaster_id={broadcaster_id}"
         
         try:
-            async with self.session.get(api_url, headers=headers) as response:
-                response.raise_for_status()
-                data = await response.json()
-                segments = data.get("data", {}).get("segments", [])
-
-                filtered_segments = []
-                for seg in segments:
-                    segment_start_utc = dateutil.parser.isoparse(seg["start_time"])
-                    if segment_start_utc.tzinfo is None:
-                        segment_start_utc = segment_start_utc.replace(tzinfo=datetime.timezone.utc)
-
-                    if start_time_utc <= segment_start_utc <= end_time_utc:
-                        filtered_segments.append(seg)
-
-                filtered_segments.sort(key=lambda s: dateutil.parser.isoparse(s["start_time"]))
-                log.info(f"Fetched {len(filtered_segments)} relevant schedule segments for broadcaster ID {broadcaster_id}.")
-                return filtered_segments
-        except aiohttp.ClientResponseError as e:
-            if e.status == 404:
+            status, data = await self._twitch_get_json(api_url)
+            if status is None:
+                return None
+            if status == 404:
                 log.warning(f"No Twitch schedule found for broadcaster ID {broadcaster_id}.")
                 return []
-            log.error(f"HTTP error fetching schedule for {broadcaster_id}: {e.status} - {e.message}", exc_info=True)
-            return None
+            if status != 200:
+                log.error(f"HTTP error fetching schedule for {broadcaster_id}: {status} - {data}")
+                return None
+            segments = (data.get("data") or {}).get("segments") or []
+
+            filtered_segments = []
+            for seg in segments:
+                segment_start_utc = dateutil.parser.isoparse(seg["start_time"])
+                if segment_start_utc.tzinfo is None:
+                    segment_start_utc = segment_start_utc.replace(tzinfo=datetime.timezone.utc)
+
+                if start_time_utc <= segment_start_utc <= end_time_utc:
+                    filtered_segments.append(seg)
+
+            filtered_segments.sort(key=lambda s: dateutil.parser.isoparse(s["start_time"]))
+            log.info(f"Fetched {len(filtered_segments)} relevant schedule segments for broadcaster ID {broadcaster_id}.")
+            return filtered_segments
         except aiohttp.ClientError as e:
             log.error(f"Network error fetching schedule for {broadcaster_id}: {e}", exc_info=True)
             return None
@@ -310,26 +361,41 @@ class TwitchUtility(commands.Cog):
         """
         Fetches information about a Twitch game category (game).
         """
-        headers = await self._get_twitch_request_headers()
-        if not headers:
-            return None
+        return (await self._fetch_twitch_categories([category_id])).get(str(category_id))
 
-        api_url = f"https://api.twitch.tv/helix/games?id={category_id}"
-        try:
-            async with self.session.get(api_url, headers=headers) as response:
-                response.raise_for_status()
-                data = await response.json()
-                if data and data.get("data"):
-                    log.debug(f"Fetched category info for ID {category_id}: {data['data'][0].get('name')}")
-                    return data["data"][0]
-                log.warning(f"No category info found for ID: {category_id}. API response: {data}")
-                return None
-        except aiohttp.ClientError as e:
-            log.error(f"HTTP error fetching category info for {category_id}: {e}", exc_info=True)
-            return None
-        except Exception as e:
-            log.error(f"Unexpected error fetching category info for {category_id}: {e}", exc_info=True)
-            return None
+    async def _fetch_twitch_categories(self, category_ids: list) -> dict:
+        """
+        Fetches several Twitch categories at once. Cached entries are served from the lookup cache,
+        the rest are resolved with one `games?id=...&id=...` request per 100 IDs.
+        Returns {category_id: category dict}; unknown or failed IDs are left out.
+        """
+        categories, missing = {}, []
+        for category_id in dict.fromkeys(str(c) for c in category_ids if c):
+            cached = await self.lookup_cache.aget("category", category_id)
+            if cached is MISSING:
+                missing.append(category_id)
+            elif cached is not None:
+                categories[category_id] = cached
+
+        for i in range(0, len(missing), 100):
+            batch = missing[i:i + 100]
+            api_url = "https://api.twitch.tv/helix/games?" + urlencode([("id", category_id) for category_id in batch])
+            try:
+                status, data = await self._twitch_get_json(api_url)
+                if status != 200 or not data:
+                    log.error(f"HTTP error fetching category info for {batch}: {status} - {data}")
+                    continue
+                found = {game["id"]: game for game in data.get("data") or []}
+                for category_id in batch:
+                    if category_id not in found:
+                        log.warning(f"No category info found for ID: {category_id}.")
+                await self.lookup_cache.aput_many("category", {category_id: found.get(category_id) for category_id in batch})
+                categories.update(found)
+            except aiohttp.ClientError as e:
+                log.error(f"HTTP error fetching category info for {batch}: {e}", exc_info=True)
+            except Exception as e:
+                log.error(f"Unexpected error fetching category info for {batch}: {e}", exc_info=True)
+        return categories
 
     # --- Asset Management (Font and Template Image) ---
 
@@ -423,11 +489,10 @@ class TwitchUtility(commands.Cog):
             return None
 
         try:
-            img = Image.open(self.template_image_path).convert("RGBA") # Ensure RGBA for potential transparency
-            draw = ImageDraw.Draw(img)
+            guild_settings = await self.config.guild(guild).all()
 
             # Get guild's configured timezone
-            guild_timezone_str = await self.config.guild(guild).display_timezone()
+            guild_timezone_str = guild_settings["display_timezone"]
             try:
                 display_tz = pytz.timezone(guild_timezone_str)
             except pytz.UnknownTimeZoneError:
@@ -446,160 +511,31 @@ class TwitchUtility(commands.Cog):
                 current_week_start = today_in_tz - timedelta(days=days_since_monday)
                 current_week_start = current_week_start.replace(hour=0, minute=0, second=0, microsecond=0)
 
-            # --- Text and Font Definitions (adjust sizes and positions based on your template) ---
-            title_font_size = 90
-            date_font_size = 40
-            event_font_size = 42
-            small_event_font_size = 30 # For longer titles/game names
-
-            # Load fonts. Error handling for font loading.
-            try:
-                title_font = ImageFont.truetype(self.font_file_path, title_font_size)
-                date_font = ImageFont.truetype(self.font_file_path, date_font_size)
-                event_font = ImageFont.truetype(self.font_file_path, event_font_size)
-                small_event_font = ImageFont.truetype(self.font_file_path, small_event_font_size)
-            except IOError:
-                log.error(f"Could not load font file from {self.font_file_path}. Please ensure it exists and is valid.")
-                return None
-
-            # --- Dynamic Image Resizing based on event count ---
-            max_events_to_show = await self.config.guild(guild).display_event_count()
-            actual_events_rendered = min(len(schedule_segments), max_events_to_show)
-
-            # Assuming your template has a fixed header part and then repeating rows
-            # This logic needs to be tailored to your specific `schedule.png` template.
-            # Here's a generic example based on typical schedule layouts:
-            header_height = 350 # Height of the top part of your template (e.g., "Week of" title)
-            single_event_row_height = 150 # Height allocated for each event row
-            footer_height = 100 # Height of the bottom part of your template (if any)
-
-            # Calculate the required height for the image
-            new_image_height = header_height + (actual_events_rendered * single_event_row_height) + footer_height
-
-            # Create a new image with the calculated height if it's different from the template's original height
-            original_width, original_height = img.size
-            if new_image_height < original_height: # Crop if fewer events than template allows
-                # Create a new blank image with the desired dimensions
-                resized_img = Image.new("RGBA", (original_width, new_image_height), (0,0,0,0)) # Transparent background
-                # Paste the header part
-                resized_img.paste(img.crop((0, 0, original_width, header_height)), (0, 0))
-                # Paste the required number of event rows
-                for i in range(actual_events_rendered):
-                    source_y = header_height + (i * single_event_row_height)
-                    dest_y = header_height + (i * single_event_row_height)
-                    resized_img.paste(img.crop((0, source_y, original_width, source_y + single_event_row_height)), (0, dest_y))
-                # Paste the footer part at the new bottom
-                resized_img.paste(img.crop((0, original_height - footer_height, original_width, original_height)), (0, new_image_height - footer_height))
-                img = resized_img
-                draw = ImageDraw.Draw(img) # Re-initialize draw object for the new image
-            elif new_image_height > original_height: # Extend if more events needed (requires more complex template logic or a simple background extension)
-                log.warning(f"Calculated image height ({new_image_height}) exceeds original template height ({original_height}). "
-                            f"Displaying only {actual_events_rendered} events. Consider a taller template or fewer events.")
-                pass
-            else: # If height matches, use original image
-                pass
-
-
-            # --- Drawing Title (Week of...) ---
-            week_of_text = "Week of"
-            date_text_for_title = current_week_start.strftime("%B %d")
-            
-            # Text color (White)
-            text_color = (255, 255, 255)
-
-            # Measure text sizes (Pillow's getsize/getbbox methods)
-            try:
-                week_of_bbox = title_font.getbbox(week_of_text)
-                week_of_width = week_of_bbox[2] - week_of_bbox[0]
-                week_of_height = week_of_bbox[3] - week_of_bbox[1]
-
-                date_bbox = date_font.getbbox(date_text_for_title)
-                date_width = date_bbox[2] - date_bbox[0]
-                date_height = date_bbox[3] - date_bbox[1]
-            except AttributeError: # Fallback for older Pillow versions
-                week_of_width, week_of_height = title_font.getsize(week_of_text)
-                date_width, date_height = date_font.getsize(date_text_for_title)
-
-
-            # Positioning (adjust these based on your template's layout)
-            img_width, _ = img.size
-            right_margin = 100
-            
-            week_of_x = img_width - right_margin - week_of_width
-            week_of_y = 100 # Example Y coordinate
-            
-            date_x = img_width - right_margin - date_width
-            date_y = week_of_y + week_of_height + 20 # Below "Week of"
-
-            draw.text((week_of_x, week_of_y), week_of_text, font=title_font, fill=text_color)
-            draw.text((date_x, date_y), date_text_for_title, font=date_font, fill=text_color)
-
-            # --- Drawing Schedule Events ---
-            # Starting Y position for the first event, and vertical spacing
-            event_start_y = header_height + 20 # Start below the header
-            event_line_spacing = 5 # Space between date/time and title/game
-            
-            # X positions for event text
-            day_time_x = 125
-            title_game_x = 125
-
-            for i, segment in enumerate(schedule_segments):
-                if i >= actual_events_rendered:
-                    break # Stop if we've drawn enough events
-
-                # Calculate Y position for the current event row
-                current_event_y_top = event_start_y + (i * single_event_row_height)
-
+            # Only the per-week text is worked out here; the layout engine owns geometry, fonts and static layers
+            max_events_to_show = guild_settings["display_event_count"]
+            rows = []
+            for segment in schedule_segments[:max_events_to_show]:
                 # Parse and format time for display
                 segment_start_utc = dateutil.parser.isoparse(segment["start_time"])
                 if segment_start_utc.tzinfo is None:
                     segment_start_utc = segment_start_utc.replace(tzinfo=datetime.timezone.utc)
-                
-                # Convert to display timezone
                 segment_start_display_tz = segment_start_utc.astimezone(display_tz)
-                
-                day_time_text = segment_start_display_tz.strftime("%A // %I:%M%p").upper()
-                stream_title = segment["title"]
+                rows.append((segment_start_display_tz.strftime("%A // %I:%M%p").upper(), segment["title"]))
 
-                # Fetch game name (category)
-                game_name = "No Category"
-                category_info = segment.get("category")
-                if category_info and category_info.get("id"):
-                    game_name = category_info.get("name", "No Category")
+            loop = asyncio.get_running_loop()
+            try:
+                img = await loop.run_in_executor(
+                    None, self.schedule_layout.render, self.template_image_path, self.font_file_path,
+                    current_week_start.strftime("%B %d"), rows, max_events_to_show
+                )
+            except OSError as e:
+                log.error(f"Could not load template or font for the schedule image ({self.template_image_path}, {self.font_file_path}): {e}")
+                return None
 
-                # Text positioning for each event
-                draw.text((day_time_x, current_event_y_top), day_time_text, font=event_font, fill=text_color)
-                
-                # Adjust font size for title if it's too long
-                title_bbox = event_font.getbbox(stream_title) if hasattr(event_font, 'getbbox') else event_font.getsize(stream_title)
-                title_width = title_bbox[2] - title_bbox[0] if hasattr(event_font, 'getbbox') else title_bbox[0]
-                
-                # Assuming max width for title, adjust as per your template design
-                max_title_width = img_width - title_game_x - right_margin
-                
-                current_title_font = event_font
-                if title_width > max_title_width and small_event_font is not None:
-                    current_title_font = small_event_font
-                    title_bbox = current_title_font.getbbox(stream_title) if hasattr(current_title_font, 'getbbox') else current_title_font.getsize(stream_title)
-                    title_width = title_bbox[2] - title_bbox[0] if hasattr(current_title_font, 'getbbox') else title_bbox[0]
-
-                # If still too long, truncate
-                while title_width > max_title_width and len(stream_title) > 3:
-                    stream_title = stream_title[:-1] # Remove last character
-                    title_bbox = current_title_font.getbbox(stream_title + "...") if hasattr(current_title_font, 'getbbox') else current_title_font.getsize(stream_title + "...")
-                    title_width = title_bbox[2] - title_bbox[0] if hasattr(current_title_font, 'getbbox') else title_bbox[0]
-                if title_width > max_title_width and len(stream_title) <= 3: # To avoid infinite loop for very short words
-                     stream_title = stream_title[:1] + "..."
-                elif len(stream_title) > 0 and title_width > max_title_width: # If truncation happened, add ellipses
-                    stream_title += "..."
-
-
-                draw.text((title_game_x, current_event_y_top + event_font_size + event_line_spacing), stream_title, font=current_title_font, fill=text_color)
-                
             # Convert the Pillow Image to a BytesIO object (in-memory file)
-            buffer = io.BytesIO()
-            img.save(buffer, format="PNG")
-            buffer.seek(0) # Rewind to the beginning of the buffer
+            buffer = io.BytesIO(await loop.run_in_executor(
+                None, ScheduleLayout.encode, img, guild_settings["schedule_image_format"]
+            ))
             log.info("Schedule image generated successfully.")
             return buffer
 
@@ -609,70 +545,119 @@ class TwitchUtility(commands.Cog):
 
     # --- Discord Posting Logic ---
 
-    async def _post_schedule_to_discord(self, guild: discord.Guild, channel: discord.TextChannel, schedule_segments: list, week_start_date_utc: datetime.datetime = None):
+    async def _schedule_image_filename(self, guild: discord.Guild, stem: str) -> str:
         """
-        Posts the generated schedule image to the specified Discord channel.
-        Handles warning message, previous message deletion, and pinning.
+        Upload filename for a schedule image, with the extension of the guild's image format.
         """
-        try:
-            # Send a warning message about updating
-            ping_role_id = await self.config.guild(guild).schedule_ping_role_id()
-            ping_role = guild.get_role(ping_role_id) if ping_role_id else None
-            
-            warning_content = "⚠️ Updating schedule... Previous schedule messages will be deleted shortly."
-            if ping_role:
-                warning_content = f"{ping_role.mention}\n{warning_content}"
-            
+        return f"{stem}.{ScheduleLayout.extension(await self.config.guild(guild).schedule_image_format())}"
+
+    async def _schedule_image_key(self, guild: discord.Guild, schedule_segments: list, week_start_date_utc: datetime.datetime = None) -> str:
+        """
+        Content hash of a schedule image's inputs: segments, template, font, timezone, event count and week.
+        """
+        guild_settings = await self.config.guild(guild).all()
+        if week_start_date_utc is None:
             try:
-                warning_msg = await channel.send(warning_content, allowed_mentions=discord.AllowedMentions(roles=True))
-                await asyncio.sleep(5) # Give users a moment to see the warning
-            except discord.Forbidden:
-                log.warning(f"Missing permissions to send warning message to {channel.name} in {guild.name}.")
-                warning_msg = None # Cannot send warning, proceed without it
-            except Exception as e:
-                log.error(f"Error sending warning message to {channel.name} in {guild.name}: {e}", exc_info=True)
-                warning_msg = None
+                display_tz = pytz.timezone(guild_settings["display_timezone"])
+            except pytz.UnknownTimeZoneError:
+                display_tz = pytz.timezone("Europe/London")
+            today_in_tz = datetime.datetime.now(display_tz)
+            week_start_date_utc = (today_in_tz - timedelta(days=today_in_tz.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        segments = [
+            (s.get("start_time"), s.get("title"), (s.get("category") or {}).get("id"), (s.get("category") or {}).get("name"))
+            for s in schedule_segments
+        ]
+        loop = asyncio.get_running_loop()
+        return content_key(
+            segments,
+            await loop.run_in_executor(None, file_digest, self.template_image_path),
+            await loop.run_in_executor(None, file_digest, self.font_file_path),
+            guild_settings["display_timezone"],
+            guild_settings["display_event_count"],
+            week_start_date_utc.isoformat(),
+            guild_settings["schedule_image_format"],
+        )
 
+    async def _delete_messages(self, channel: discord.TextChannel, message_ids: list) -> int:
+        """
+        Deletes messages by ID, in bulk (up to 100 per request) where Discord allows it.
+        Messages older than 14 days can't be bulk deleted and are removed one at a time.
+        Returns how many were deleted.
+        """
+        # Small margin so a message doesn't cross the 14 day line between the check and the request
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - timedelta(days=14) + timedelta(minutes=10)
+        recent, old = [], []
+        for message_id in dict.fromkeys(message_ids):
+            if discord.utils.snowflake_time(message_id) > cutoff:
+                recent.append(discord.Object(id=message_id))
+            else:
+                old.append(discord.Object(id=message_id))
 
-            # Delete previous bot messages in the channel to keep it clean
-            log.info(f"Attempting to delete old schedule messages in {channel.name} ({guild.name})...")
-            deleted_count = 0
-            async for message in channel.history(limit=50): # Look at last 50 messages
-                if message.author == self.bot.user and (warning_msg is None or message.id != warning_msg.id):
-                    try:
-                        await message.delete()
-                        deleted_count += 1
-                        await asyncio.sleep(0.5) # Add a small delay to avoid rate limits
-                    except discord.NotFound:
-                        pass # Message already deleted
-                    except discord.Forbidden:
-                        log.warning(f"Missing permissions to delete messages in {channel.name} in {guild.name}. Stopping deletion.")
-                        break # Cannot delete, stop trying
-                    except Exception as e:
-                        log.error(f"Error deleting message {message.id} in {channel.name}: {e}", exc_info=True)
-                        break # Something else went wrong, stop
-            log.info(f"Deleted {deleted_count} old messages in {channel.name} ({guild.name}).")
-
-            if warning_msg:
+        deleted_count = 0
+        try:
+            for i in range(0, len(recent), 100):
+                chunk = recent[i:i + 100]
                 try:
-                    await warning_msg.delete() # Delete the warning message itself
+                    await channel.delete_messages(chunk)
+                    deleted_count += len(chunk)
                 except discord.NotFound:
-                    pass
-                except discord.Forbidden:
-                    log.warning(f"Missing permissions to delete warning message in {channel.name} in {guild.name}.")
-                except Exception as e:
-                    log.error(f"Error deleting warning message {warning_msg.id}: {e}", exc_info=True)
-
-            # Generate the schedule image
-            image_buffer = await self._generate_schedule_image(schedule_segments, guild, week_start_date_utc)
-            if not image_buffer:
+                    old.extend(chunk) # Some were already gone, delete the rest individually
+            for message in old:
+                try:
+                    await channel.get_partial_message(message.id).delete()
+                    deleted_count += 1
+                except discord.NotFound:
+                    pass # Message already deleted
+        except discord.Forbidden:
+            log.warning(f"Missing permissions to delete messages in {channel.name} in {channel.guild.name}.")
+        except discord.HTTPException as e:
+            log.error(f"Error deleting old messages in {channel.name}: {e}", exc_info=True)
+        return deleted_count
+
+    async def _post_schedule_to_discord(self, guild: discord.Guild, channel: discord.TextChannel, schedule_segments: list, week_start_date_utc: datetime.datetime = None, force: bool = False):
+        """
+        Posts the generated schedule image to the specified Discord channel.
+        The new image goes up before the previous schedule is removed, so the channel is never left without one.
+        Handles previous message deletion and pinning.
+        If the posted schedule would be identical to the one already up, it is left alone unless `force` is set.
+        """
+        try:
+            # Make sure the key reflects the assets the image will be drawn with
+            if not await self._ensure_guild_assets(guild):
                 await channel.send("❌ Failed to generate schedule image. Please check bot logs.")
                 return
+            image_key = await self._schedule_image_key(guild, schedule_segments, week_start_date_utc)
+            if not force and image_key == await self.config.guild(guild).schedule_image_key():
+                message_id = await self.config.guild(guild).schedule_message_id()
+                if message_id:
+                    try:
+                        await channel.fetch_message(message_id)
+                        log.info(f"Schedule for guild {guild.name} unchanged since last post. Leaving message {message_id} in place.")
+                        return
+                    except discord.HTTPException:
+                        pass # Message is gone, post a new one
+
+            # Reuse a cached render of identical inputs, otherwise generate the schedule image
+            cached_png = await self.image_cache.aget(image_key)
+            if cached_png is not None:
+                image_buffer = io.BytesIO(cached_png)
+            else:
+                image_buffer = await self._generate_schedule_image(schedule_segments, guild, week_start_date_utc)
+                if not image_buffer:
+                    await channel.send("❌ Failed to generate schedule image. Please check bot logs.")
+                    return
+                await self.image_cache.aput(image_key, image_buffer.getvalue())
 
-            # Post the new schedule image
+            # Post the new schedule first, pinging the schedule role on it, and only then remove the old one
+            ping_role_id = await self.config.guild(guild).schedule_ping_role_id()
+            ping_role = guild.get_role(ping_role_id) if ping_role_id else None
             try:
-                schedule_file = discord.File(image_buffer, filename="twitch_schedule.png")
-                posted_message = await channel.send(file=schedule_file)
+                schedule_file = discord.File(image_buffer, filename=await self._schedule_image_filename(guild, "twitch_schedule"))
+                posted_message = await channel.send(
+                    content=ping_role.mention if ping_role else None,
+                    file=schedule_file,
+                    allowed_mentions=discord.AllowedMentions(roles=True)
+                )
                 log.info(f"Successfully posted new schedule image to {channel.name} in {guild.name}.")
             except discord.Forbidden:
                 log.error(f"Missing permissions to send files/messages to {channel.name} in {guild.name}.")
@@ -681,6 +666,30 @@ class TwitchUtility(commands.Cog):
                 log.error(f"Error sending schedule image to {channel.name} in {guild.name}: {e}", exc_info=True)
                 return
 
+            # Remove the previous schedule message(s)
+            previous_ids = [mid for mid in await self.config.guild(guild).schedule_message_ids() if mid != posted_message.id]
+            # The schedule channel may have changed since the last post; delete where the old messages live
+            previous_channel_id = await self.config.guild(guild).schedule_message_channel_id()
+            previous_channel = guild.get_channel(previous_channel_id) if previous_channel_id else channel
+            if not previous_ids:
+                previous_channel = channel
+                # Nothing tracked yet (first post since upgrading), fall back to our recent messages in the channel
+                try:
+                    previous_ids = [message.id async for message in channel.history(limit=50) # Look at last 50 messages
+                                    if message.author == self.bot.user and message.id != posted_message.id]
+                except discord.HTTPException as e:
+                    log.warning(f"Could not read history of {channel.name} in {guild.name}: {e}")
+            if previous_channel:
+                deleted_count = await self._delete_messages(previous_channel, previous_ids)
+                log.info(f"Deleted {deleted_count} old schedule messages in {previous_channel.name} ({guild.name}).")
+            else:
+                log.info(f"Previous schedule channel {previous_channel_id} in {guild.name} no longer exists; nothing to delete.")
+
+            await self.config.guild(guild).schedule_image_key.set(image_key)
+            await self.config.guild(guild).schedule_message_id.set(posted_message.id)
+            await self.config.guild(guild).schedule_message_ids.set([posted_message.id])
+            await self.config.guild(guild).schedule_message_channel_id.set(channel.id)
+
             # Pin the new schedule message (optional, can fail if too many pins)
             try:
                 await posted_message.pin()
@@ -719,118 +728,254 @@ class TwitchUtility(commands.Cog):
             log.warning("Twitch credentials not set. Skipping live stream checks.")
             return
 
-        for guild in self.bot.guilds:
-            try:
-                settings = await self.config.guild(guild).all()
-                twitch_user_id = settings["twitch_user_id"]
-                notification_channel_id = settings["notification_channel_id"]
-                last_stream_status = settings["last_stream_status"]
-                twitch_username = settings["twitch_username"]
-
-                if not twitch_user_id or not notification_channel_id:
-                    # log.debug(f"Guild {guild.name} ({guild.id}) has incomplete live notification setup. Skipping.")
-                    continue
+        all_settings = await self.config.all_guilds()
+        eventsub = self._eventsub()
+        if eventsub:
+            eventsub.watch("TwitchUtility", [s.get("twitch_user_id") for s in all_settings.values()])
+            # While EventSub pushes go-lives, this loop only reconciles missed events every so often
+            now = asyncio.get_event_loop().time()
+            if eventsub.active and now - self._last_live_reconcile < eventsub.FALLBACK_POLL_INTERVAL:
+                return
+            self._last_live_reconcile = now
+
+        started = time.monotonic()
+        configured = [
+            (guild, all_settings[guild.id]) for guild in self.bot.guilds
+            if all_settings.get(guild.id, {}).get("twitch_user_id") and all_settings[guild.id].get("notification_channel_id")
+        ]
+        # One lookup per streamer, however many guilds follow them
+        live_statuses = await self._fetch_live_statuses(
+            {settings["twitch_user_id"]: settings["twitch_username"] for _, settings in configured}
+        )
 
-                notification_channel = guild.get_channel(notification_channel_id)
-                if not notification_channel:
-                    log.warning(f"Live notification channel for guild {guild.name} ({guild.id}) not found or accessible. Skipping.")
-                    continue
+        async def check_guild(entry):
+            guild, settings = entry
+            is_live = live_statuses.get(settings["twitch_user_id"])
+            if is_live is None: # Error occurred during API call
+                log.error(f"Failed to get live status for {settings['twitch_username']} ({settings['twitch_user_id']}) in guild {guild.name}.")
+                return
+            await self._apply_live_status(guild, settings, is_live)
 
-                is_live = await self._is_streamer_live(twitch_user_id)
+        counts = await fan_out(configured, check_guild, self.GUILD_CONCURRENCY, self.GUILD_TIMEOUT,
+                               label=lambda entry: f"guild {entry[0].name} ({entry[0].id})")
+        self._record_tick("live_check", started, len(live_statuses), counts)
 
-                if is_live is None: # Error occurred during API call
-                    log.error(f"Failed to get live status for {twitch_username} ({twitch_user_id}) in guild {guild.name}.")
-                    continue
+    def _record_tick(self, name: str, started: float, lookups: int, counts: dict):
+        """
+        Records how long one pass of a background loop took, for `[p]twitchutility loopstats`.
+        """
+        duration = time.monotonic() - started
+        self.loop_stats[name] = {"duration": duration, "lookups": lookups, "at": time.time(), **counts}
+        message = (f"{name} tick took {duration:.2f}s: {counts['ok']} guilds ok, {counts['failed']} failed, "
+                   f"{counts['timed_out']} timed out, {lookups} unique streamers.")
+        if duration > self.GUILD_TIMEOUT or counts["failed"] or counts["timed_out"]:
+            log.warning(message)
+        else:
+            log.debug(message)
 
-                if is_live and last_stream_status == "offline":
-                    # Stream just went live! Send notification.
-                    log.info(f"Streamer {twitch_username} just went LIVE in guild {guild.name}.")
-                    await self._send_go_live_notification(guild, notification_channel, settings)
-                    await self.config.guild(guild).last_stream_status.set("online")
-                elif not is_live and last_stream_status == "online":
-                    # Stream just went offline. Update status.
-                    log.info(f"Streamer {twitch_username} just went OFFLINE in guild {guild.name}.")
-                    await self.config.guild(guild).last_stream_status.set("offline")
-                # else: Stream status unchanged, do nothing.
+    async def _fetch_live_statuses(self, streamers: dict) -> dict:
+        """
+        Live status for many streamers at once: {twitch_user_id: username} -> {twitch_user_id: True/False/None}.
+        Recent results from the shared live-status registry are reused; the rest are requested
+        100 IDs per Helix call. None means the status could not be fetched.
+        """
+        registry = self._live_status_registry()
+        statuses = {}
+        to_fetch = []
+        for twitch_user_id in streamers:
+            cached = registry.for_twitch_id(twitch_user_id, max_age=60) if registry else None
+            if cached is not None:
+                statuses[twitch_user_id] = cached.is_live
+            else:
+                to_fetch.append(twitch_user_id)
+
+        for i in range(0, len(to_fetch), 100):
+            chunk = to_fetch[i:i + 100]
+            params = [("user_id", twitch_user_id) for twitch_user_id in chunk] + [("first", 100)]
+            status, data = await self._twitch_get_json(f"https://api.twitch.tv/helix/streams?{urlencode(params)}")
+            if status != 200:
+                if status is not None:
+                    log.error(f"Error checking live status for {len(chunk)} streamers: {status} - {data}")
+                statuses.update(dict.fromkeys(chunk))
+                continue
+            live = {str(stream.get("user_id")): stream for stream in (data or {}).get("data") or []}
+            for twitch_user_id in chunk:
+                stream = live.get(str(twitch_user_id))
+                statuses[twitch_user_id] = stream is not None
+                login = stream.get("user_login") if stream else streamers[twitch_user_id]
+                if registry and login:
+                    registry.update_from_twitch(login, stream, twitch_user_id=twitch_user_id)
+        return statuses
+
+    async def _apply_live_status(self, guild: discord.Guild, settings: dict, is_live: bool):
+        """
+        Acts on a live/offline result for a guild's streamer, from polling or EventSub.
+        Notifies on an offline -> online transition only, so a push and a poll can't both ping.
+        """
+        twitch_username = settings["twitch_username"]
+        notification_channel = guild.get_channel(settings["notification_channel_id"])
+        if not notification_channel:
+            log.warning(f"Live notification channel for guild {guild.name} ({guild.id}) not found or accessible. Skipping.")
+            return
 
-            except Exception as e:
-                log.error(f"Error in check_twitch_stream_status for guild {guild.name} ({guild.id}): {e}", exc_info=True)
+        async with self._live_status_locks[guild.id]:
+            last_stream_status = await self.config.guild(guild).last_stream_status()
+            if is_live and last_stream_status == "offline":
+                # Stream just went live! Send notification.
+                log.info(f"Streamer {twitch_username} just went LIVE in guild {guild.name}.")
+                await self.config.guild(guild).last_stream_status.set("online")
+                await self._send_go_live_notification(guild, notification_channel, settings)
+            elif not is_live and last_stream_status == "online":
+                # Stream just went offline. Update status.
+                log.info(f"Streamer {twitch_username} just went OFFLINE in guild {guild.name}.")
+                await self.config.guild(guild).last_stream_status.set("offline")
+            # else: Stream status unchanged, do nothing.
 
+    def _eventsub(self):
+        """
+        EventSub receiver from the Zerolivesleft cog, or None if that cog isn't loaded.
+        """
+        cog = self.bot.get_cog("Zerolivesleft")
+        return getattr(cog, "eventsub_logic", None)
+
+    async def _handle_eventsub_status(self, broadcaster_id: str, is_live: bool):
+        all_settings = await self.config.all_guilds()
+        following = [
+            (guild, all_settings[guild.id]) for guild in self.bot.guilds
+            if str(all_settings.get(guild.id, {}).get("twitch_user_id")) == str(broadcaster_id)
+            and all_settings[guild.id].get("notification_channel_id")
+        ]
+
+        async def apply(entry):
+            await self._apply_live_status(entry[0], entry[1], is_live)
+
+        await fan_out(following, apply, self.GUILD_CONCURRENCY, self.GUILD_TIMEOUT,
+                      label=lambda entry: f"guild {entry[0].name} ({entry[0].id})")
+
+    @commands.Cog.listener()
+    async def on_twitch_stream_online(self, event: dict, stream: dict | None):
+        """EventSub push (via the Zerolivesleft cog): the monitored streamer went live."""
+        await self._handle_eventsub_status(event.get("broadcaster_user_id"), True)
+
+    @commands.Cog.listener()
+    async def on_twitch_stream_offline(self, event: dict):
+        """EventSub push (via the Zerolivesleft cog): the monitored streamer went offline."""
+        await self._handle_eventsub_status(event.get("broadcaster_user_id"), False)
 
-    @loop(minutes=5) # Check every 5 minutes to see if an update is due for schedule
+
+    @loop(hours=1) # Rebuild the due-time schedule hourly; the scheduler itself fires on time
     async def auto_schedule_updater(self):
         """
-        Background task that checks if it's time to automatically update the schedule
-        image for each configured guild.
+        Background task that (re)computes every guild's next automatic schedule update
+        and hands it to the scheduler, catching up on any update missed while offline.
         """
         await self.bot.wait_until_ready() # Ensure bot is fully connected to Discord
         await self.initialization_complete.wait() # Ensure cog's internal setup is done
 
         log.debug("Running auto_schedule_updater loop.")
 
+        all_settings = await self.config.all_guilds()
         for guild in self.bot.guilds:
             try:
-                guild_settings = await self.config.guild(guild).all()
-                schedule_channel_id = guild_settings["schedule_channel_id"]
-                twitch_username = guild_settings["twitch_username"]
-                auto_update_days = guild_settings["auto_update_days"]
-                auto_update_time_str = guild_settings["auto_update_time"]
-                last_auto_update_date = guild_settings["last_auto_update_date"]
-                display_timezone_str = guild_settings["display_timezone"]
-
-                # Skip if essential settings for schedule are not configured
-                if not schedule_channel_id or not twitch_username or not auto_update_days or not auto_update_time_str:
-                    # log.debug(f"Guild {guild.name} ({guild.id}) has incomplete schedule auto-update settings. Skipping.")
-                    continue
+                self._schedule_auto_update(guild, all_settings.get(guild.id, {}), catch_up=True)
+            except Exception as e:
+                log.error(f"Error in auto_schedule_updater for guild {guild.name} ({guild.id}): {e}", exc_info=True)
+        self.schedule_scheduler.start(self.bot.loop)
 
-                schedule_channel = guild.get_channel(schedule_channel_id)
-                if not schedule_channel:
-                    log.warning(f"Configured schedule channel {schedule_channel_id} not found or accessible for guild {guild.name} ({guild.id}). Skipping.")
-                    continue
-                
-                try:
-                    display_tz = pytz.timezone(display_timezone_str)
-                except pytz.UnknownTimeZoneError:
-                    log.error(f"Invalid timezone '{display_timezone_str}' configured for guild {guild.name}. Skipping auto-update.")
-                    continue
+    def _schedule_auto_update(self, guild: discord.Guild, guild_settings: dict, catch_up: bool = False):
+        """
+        Schedules a guild's next automatic update from its settings, or cancels it if unconfigured.
+        With `catch_up`, an update whose time passed since the last one (e.g. during downtime) runs now.
+        """
+        auto_update_days = guild_settings.get("auto_update_days")
+        auto_update_time_str = guild_settings.get("auto_update_time")
+        # Skip if essential settings for schedule are not configured
+        if not (guild_settings.get("schedule_channel_id") and guild_settings.get("twitch_username")
+                and auto_update_days and auto_update_time_str):
+            self.schedule_scheduler.cancel(guild.id)
+            return
 
-                now_in_display_tz = datetime.datetime.now(display_tz)
-                current_day_of_week = now_in_display_tz.weekday() # Monday is 0, Sunday is 6
-                current_time_hhmm = now_in_display_tz.strftime("%H:%M")
-                current_date_yyyymmdd = now_in_display_tz.strftime("%Y-%m-%d")
-
-                # Check if it's the correct day and time for an update AND if we haven't updated today yet
-                if (current_day_of_week in auto_update_days and
-                    current_time_hhmm == auto_update_time_str and
-                    last_auto_update_date != current_date_yyyymmdd):
-
-                    log.info(f"Initiating auto-schedule update for guild {guild.name} ({guild.id}).")
-                    
-                    # Calculate current week's schedule range
-                    start_of_current_week_display_tz = now_in_display_tz - timedelta(days=current_day_of_week)
-                    start_of_current_week_display_tz = start_of_current_week_display_tz.replace(hour=0, minute=0, second=0, microsecond=0)
-                    end_of_current_week_display_tz = start_of_current_week_display_tz + timedelta(days=6, hours=23, minutes=59, seconds=59)
-
-                    broadcaster_id = await self._fetch_twitch_user_id(twitch_username)
-                    if not broadcaster_id:
-                        log.error(f"Could not resolve Twitch username '{twitch_username}' for guild {guild.name} during auto-update.")
-                        continue
-
-                    schedule = await self._fetch_twitch_schedule_segments(
-                        broadcaster_id,
-                        start_of_current_week_display_tz.astimezone(datetime.timezone.utc),
-                        end_of_current_week_display_tz.astimezone(datetime.timezone.utc)
-                    )
-
-                    if schedule is not None:
-                        await self._post_schedule_to_discord(guild, schedule_channel, schedule, start_of_current_week_display_tz.astimezone(datetime.timezone.utc))
-                        await self.config.guild(guild).last_auto_update_date.set(current_date_yyyymmdd) # Mark as updated today
-                        log.info(f"Auto-schedule update completed for guild {guild.name}.")
-                    else:
-                        log.error(f"Failed to fetch schedule during auto-update for guild {guild.name}.")
+        display_timezone_str = guild_settings.get("display_timezone") or DEFAULT_GUILD_SETTINGS["display_timezone"]
+        try:
+            display_tz = pytz.timezone(display_timezone_str)
+        except pytz.UnknownTimeZoneError:
+            log.error(f"Invalid timezone '{display_timezone_str}' configured for guild {guild.name}. Skipping auto-update.")
+            self.schedule_scheduler.cancel(guild.id)
+            return
 
-            except Exception as e:
-                log.error(f"Error in auto_schedule_updater for guild {guild.name} ({guild.id}): {e}", exc_info=True)
+        now_in_display_tz = datetime.datetime.now(display_tz)
+        last_auto_update_date = guild_settings.get("last_auto_update_date")
+        if catch_up and last_auto_update_date:
+            missed = previous_weekly_run(auto_update_days, auto_update_time_str, display_tz, now_in_display_tz)
+            if missed and missed.strftime("%Y-%m-%d") > last_auto_update_date:
+                log.info(f"Catching up on missed auto-schedule update ({missed.isoformat()}) for guild {guild.name}.")
+                self.schedule_scheduler.schedule(guild.id, time.time())
+                return
+
+        next_run = next_weekly_run(auto_update_days, auto_update_time_str, display_tz, now_in_display_tz)
+        if next_run and next_run.strftime("%Y-%m-%d") == last_auto_update_date:
+            # Already updated today; go to the following occurrence
+            next_run = next_weekly_run(auto_update_days, auto_update_time_str, display_tz, next_run)
+        if next_run:
+            self.schedule_scheduler.schedule(guild.id, next_run.timestamp())
+
+    async def _reschedule_auto_update(self, guild: discord.Guild):
+        """
+        Call after changing any setting that affects when (or whether) the schedule auto-updates.
+        """
+        self._schedule_auto_update(guild, await self.config.guild(guild).all())
+
+    async def _run_auto_schedule_update(self, guild_id: int):
+        """
+        Scheduler callback: posts the current week's schedule for one guild, then schedules its next update.
+        """
+        guild = self.bot.get_guild(guild_id)
+        if not guild:
+            return
+        try:
+            guild_settings = await self.config.guild(guild).all()
+            schedule_channel_id = guild_settings["schedule_channel_id"]
+            twitch_username = guild_settings["twitch_username"]
+
+            schedule_channel = guild.get_channel(schedule_channel_id) if schedule_channel_id else None
+            if not schedule_channel or not twitch_username:
+                log.warning(f"Configured schedule channel {schedule_channel_id} not found or accessible for guild {guild.name} ({guild.id}). Skipping.")
+                return
+
+            display_tz = pytz.timezone(guild_settings["display_timezone"])
+            now_in_display_tz = datetime.datetime.now(display_tz)
+            current_day_of_week = now_in_display_tz.weekday() # Monday is 0, Sunday is 6
+            current_date_yyyymmdd = now_in_display_tz.strftime("%Y-%m-%d")
+
+            log.info(f"Initiating auto-schedule update for guild {guild.name} ({guild.id}).")
+            
+            # Calculate current week's schedule range
+            start_of_current_week_display_tz = now_in_display_tz - timedelta(days=current_day_of_week)
+            start_of_current_week_display_tz = start_of_current_week_display_tz.replace(hour=0, minute=0, second=0, microsecond=0)
+            end_of_current_week_display_tz = start_of_current_week_display_tz + timedelta(days=6, hours=23, minutes=59, seconds=59)
+
+            broadcaster_id = await self._fetch_twitch_user_id(twitch_username)
+            if not broadcaster_id:
+                log.error(f"Could not resolve Twitch username '{twitch_username}' for guild {guild.name} during auto-update.")
+                return
+
+            schedule = await self._fetch_twitch_schedule_segments(
+                broadcaster_id,
+                start_of_current_week_display_tz.astimezone(datetime.timezone.utc),
+                end_of_current_week_display_tz.astimezone(datetime.timezone.utc)
+            )
+
+            if schedule is not None:
+                await self._post_schedule_to_discord(guild, schedule_channel, schedule, start_of_current_week_display_tz.astimezone(datetime.timezone.utc))
+                await self.config.guild(guild).last_auto_update_date.set(current_date_yyyymmdd) # Mark as updated today
+                log.info(f"Auto-schedule update completed for guild {guild.name}.")
+            else:
+                log.error(f"Failed to fetch schedule during auto-update for guild {guild.name}.")
+
+        except Exception as e:
+            log.error(f"Error in auto-schedule update for guild {guild.name} ({guild.id}): {e}", exc_info=True)
+        finally:
+            await self._reschedule_auto_update(guild)
 
 
     # --- Combined Commands ---
@@ -1004,9 +1149,37 @@ class TwitchUtility(commands.Cog):
         except asyncio.TimeoutError:
             await ctx.send("⌛ Template URL setup timed out. Using default template.")
 
+        await self._reschedule_auto_update(ctx.guild)
         await ctx.send("🎉 Twitch Utility setup is complete!")
         await self.show_settings(ctx) # Show current settings
 
+    @twitchutility.command(name="loopstats")
+    @commands.is_owner()
+    async def twitchutility_loopstats(self, ctx: commands.Context):
+        """
+        Shows how long the last pass of each background loop took, across all guilds.
+        """
+        stats = dict(self.loop_stats)
+        if self.schedule_scheduler.last_batch:
+            stats["schedule_update"] = self.schedule_scheduler.last_batch
+        if not stats:
+            return await ctx.send("No background loop has completed a pass yet.")
+
+        embed = discord.Embed(title="TwitchUtility Loop Stats", color=discord.Color.blue())
+        for name, tick in stats.items():
+            if "jobs" in tick: # A batch of scheduled posts rather than a loop pass
+                detail = (f"Schedule posts: {tick['jobs']} run, {tick['ok']} ok, "
+                          f"{tick['failed']} failed, {tick['timed_out']} timed out")
+            else:
+                detail = (f"Guilds: {tick['ok']} ok, {tick['failed']} failed, {tick['timed_out']} timed out\n"
+                          f"Unique streamers checked: {tick['lookups']}")
+            embed.add_field(
+                name=name,
+                value=f"Took {tick['duration']:.2f}s <t:{int(tick['at'])}:R>\n{detail}",
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
     # --- Live Notification Commands (previously streamset) ---
 
     @twitchutility.group(name="livenotify")
@@ -1072,6 +1245,7 @@ class TwitchUtility(commands.Cog):
         Sets the Discord text channel for schedule posts.
         """
         await self.config.guild(ctx.guild).schedule_channel_id.set(channel.id)
+        await self._reschedule_auto_update(ctx.guild)
         await ctx.send(f"✅ Schedule posting channel set to {channel.mention}.")
 
     @schedule_group.command(name="setautoupdatedays")
@@ -1083,6 +1257,7 @@ class TwitchUtility(commands.Cog):
         """
         if not days:
             await self.config.guild(ctx.guild).auto_update_days.set([])
+            await self._reschedule_auto_update(ctx.guild)
             return await ctx.send("✅ Automatic schedule update days cleared. Schedule will no longer auto-update on a specific day.")
         
         valid_days = []
@@ -1097,6 +1272,7 @@ class TwitchUtility(commands.Cog):
         day_names = [["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"][d] for d in unique_sorted_days]
         await ctx.send(f"✅ Automatic schedule update days set to: {', '.join(day_names)}.")
         await self.config.guild(ctx.guild).last_auto_update_date.set(None)
+        await self._reschedule_auto_update(ctx.guild)
 
     @schedule_group.command(name="setautoupdatetime")
     async def set_auto_update_time(self, ctx: commands.Context, time_str: str):
@@ -1109,6 +1285,7 @@ class TwitchUtility(commands.Cog):
         await self.config.guild(ctx.guild).auto_update_time.set(time_str)
         await ctx.send(f"✅ Automatic schedule update time set to `{time_str}`.")
         await self.config.guild(ctx.guild).last_auto_update_date.set(None)
+        await self._reschedule_auto_update(ctx.guild)
 
     @schedule_group.command(name="setnotifyrole")
     async def set_schedule_notify_role(self, ctx: commands.Context, role: discord.Role = None):
@@ -1134,6 +1311,20 @@ class TwitchUtility(commands.Cog):
         await self.config.guild(ctx.guild).display_event_count.set(count)
         await ctx.send(f"✅ Display event count set to `{count}`.")
 
+    @schedule_group.command(name="setimageformat")
+    async def set_schedule_image_format(self, ctx: commands.Context, image_format: str):
+        """
+        Sets the schedule image upload format: `png`, `webp` or `palette`.
+        `png` is quickest to produce, `webp` is lossless but smaller, and `palette`
+        (a 256-colour PNG) is smallest but may band gradients in the template.
+        """
+        image_format = image_format.lower()
+        if image_format not in ScheduleLayout.FORMATS:
+            return await ctx.send(f"❌ Image format must be one of: {', '.join(f'`{name}`' for name in ScheduleLayout.FORMATS)}.")
+
+        await self.config.guild(ctx.guild).schedule_image_format.set(image_format)
+        await ctx.send(f"✅ Schedule image format set to `{image_format}`.")
+
     @schedule_group.command(name="settimezone")
     async def set_display_timezone(self, ctx: commands.Context, *, timezone_name: str):
         """
@@ -1143,6 +1334,7 @@ class TwitchUtility(commands.Cog):
         try:
             pytz.timezone(timezone_name)
             await self.config.guild(ctx.guild).display_timezone.set(timezone_name)
+            await self._reschedule_auto_update(ctx.guild)
             await ctx.send(f"✅ Display timezone set to `{timezone_name}`.")
         except pytz.UnknownTimeZoneError:
             await ctx.send("❌ That is not a valid timezone. Please use a valid TZ database name.")
@@ -1220,7 +1412,7 @@ class TwitchUtility(commands.Cog):
             )
 
             if schedule is not None:
-                await self._post_schedule_to_discord(ctx.guild, target_channel, schedule, start_of_week_tz.astimezone(datetime.timezone.utc))
+                await self._post_schedule_to_discord(ctx.guild, target_channel, schedule, start_of_week_tz.astimezone(datetime.timezone.utc), force=True)
                 await ctx.send("✅ Schedule posted successfully!")
             else:
                 await ctx.send("❌ Failed to fetch schedule from Twitch. Please check bot logs.")
@@ -1281,7 +1473,7 @@ class TwitchUtility(commands.Cog):
                 await channel.send("❌ Failed to generate schedule image for test post.")
                 return
 
-            schedule_file = discord.File(image_buffer, filename="test_schedule.png")
+            schedule_file = discord.File(image_buffer, filename=await self._schedule_image_filename(channel.guild, "test_schedule"))
             await channel.send("This is a test post:", file=schedule_file)
             log.info(f"Successfully sent test schedule image to {channel.name} in {channel.guild.name}.")
         except discord.Forbidden:
@@ -1489,7 +1681,10 @@ class TwitchUtility(commands.Cog):
             
             image_buffer = await self._generate_schedule_image(schedule, ctx.guild, start_of_week_tz.astimezone(datetime.timezone.utc))
             if image_buffer:
-                schedule_file = discord.File(image_buffer, filename=f"schedule_week_of_{start_of_week_tz.strftime('%Y%m%d')}.png")
+                schedule_file = discord.File(
+                    image_buffer,
+                    filename=await self._schedule_image_filename(ctx.guild, f"schedule_week_of_{start_of_week_tz.strftime('%Y%m%d')}")
+                )
                 await ctx.send(f"Here is the schedule for the week of {start_of_week_tz.strftime('%B %d, %Y')}:", file=schedule_file)
             else:
                 await ctx.send("❌ Failed to generate the schedule image.")
@@ -1567,10 +1762,3 @@ class TwitchUtility(commands.Cog):
         except Exception as e:
             log.error(f"Error listing upcoming streams: {e}", exc_info=True)
             await ctx.send("❌ An unexpected error occurred while fetching the schedule.")
-
-
-def setup(bot):
-    """
-    Adds the TwitchUtility cog to the bot.
-    """
-    bot.add_cog(TwitchUtility(bot))
@@ -25,6 +25,9 @@ from .lfg_logic import LFGLogic # NEW
 from .report_logic import ReportLogic, ReportModerationView # NEW
 from . import role_menus
 from .twitch_roles import TwitchRolesLogic
+from .live_status import LiveStatusRegistry
+from .twitch_helix import HelixClient
+from .eventsub import EventSubLogic
 
 log = logging.getLogger("red.Elkz.zerolivesleft")
 
@@ -105,6 +108,8 @@ class Zerolivesleft(commands.Cog):
         self.web_runner = None
         self.web_site = None
         
+        self.live_status = LiveStatusRegistry()
+        self.helix = HelixClient(self.bot)
         self.web_manager = WebApiManager(self)
         self.role_counting_logic = RoleCountingLogic(self)
         self.activity_tracking_logic = ActivityTrackingLogic(self)
@@ -116,15 +121,18 @@ class Zerolivesleft(commands.Cog):
         self.lfg_logic = LFGLogic(self) # NEW
         self.report_logic = ReportLogic(self) # NEW
         self.twitch_roles_logic = TwitchRolesLogic(self)
+        self.eventsub_logic = EventSubLogic(self)
 
         self.bot.add_view(role_menus.AutoRoleView())
         self.view_init_task = self.bot.loop.create_task(self.initialize_persistent_views())
         self.web_manager.register_all_routes()
         self.application_ping_logic.register_routes(self.web_app)  # NEW - Register ping routes
+        self.eventsub_logic.register_routes(self.web_app)
         asyncio.create_task(self.initialize_webserver())
         self.role_counting_logic.start_tasks()
         self.calendar_sync_logic.start_tasks()
         self.activity_tracking_logic.start_tasks()
+        self.eventsub_logic.start_tasks()
         self.bot.loop.create_task(self._run_migrations())
 
     async def _run_migrations(self):
@@ -184,15 +192,24 @@ class Zerolivesleft(commands.Cog):
                 log.error(f"Failed to start central web server: {e}")
                 self.web_runner = None
 
-    def cog_unload(self):
+    async def cog_unload(self):
         self.role_counting_logic.stop_tasks()
         self.calendar_sync_logic.stop_tasks()
         self.activity_tracking_logic.stop_tasks()
         self.application_roles_logic.stop_tasks()
         self.lfg_logic.stop_tasks() # NEW
+        self.eventsub_logic.stop_tasks()
         if hasattr(self, 'view_init_task'): self.view_init_task.cancel()
-        if self.web_runner: asyncio.create_task(self.shutdown_webserver())
-        asyncio.create_task(self.session.close())
+        # Persist the ledger and send queued website updates while the session is still open
+        try:
+            await self.activity_tracking_logic.save_and_flush()
+        except Exception:
+            log.exception("Failed to flush activity data during unload.")
+        finally:
+            # Always release the port and sessions, or the next load can't bind
+            if self.web_runner: await self.shutdown_webserver()
+            await self.session.close()
+            await self.helix.close()
         log.info("Zerolivesleft cog unloaded.")
 
     async def shutdown_webserver(self):
@@ -217,6 +234,38 @@ class Zerolivesleft(commands.Cog):
             return
         await self.activity_tracking_logic.handle_voice_state_update(member, before, after)
 
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        """Rank returning members on the XP leaderboard again."""
+        if member.bot:
+            return
+        await self.activity_tracking_logic.handle_member_join(member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        """Keep the XP leaderboard and role member caches limited to current members."""
+        self.web_manager.handle_member_remove(member)
+        self.live_status.forget_member(member.id)
+        if member.bot:
+            return
+        await self.activity_tracking_logic.handle_member_remove(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        """Drop cached role member listings and queue role reconciliation when a member's roles change."""
+        self.web_manager.handle_member_update(before, after)
+        self.activity_tracking_logic.handle_member_update(before, after)
+
+    @commands.Cog.listener()
+    async def on_presence_update(self, before, after):
+        """Keep the shared live-status registry current."""
+        if after.bot:
+            return
+        was_streaming = any(isinstance(a, discord.Streaming) for a in before.activities)
+        is_streaming = any(isinstance(a, discord.Streaming) for a in after.activities)
+        if was_streaming != is_streaming or is_streaming:
+            self.live_status.update_from_member(after)
+
     @commands.Cog.listener()
     async def on_message(self, message):
         """Handle messages for XP awards, LFG forum filtering, and report DM responses."""
@@ -409,6 +458,11 @@ class Zerolivesleft(commands.Cog):
         """Set message XP cooldown to prevent spam."""
         await self.activity_tracking_logic.set_message_cooldown(ctx, seconds)
 
+    @xp_group.command(name="voiceexclude")
+    async def xp_voice_exclude(self, ctx, afk: bool = True, solo: bool = False, *channels: discord.VoiceChannel):
+        """Set which voice time earns nothing: AFK channel, solo channels, and listed channels."""
+        await self.activity_tracking_logic.set_voice_exclusions(ctx, afk, solo, *channels)
+
     # === ADMIN TOOLS ===
     @xp_group.command(name="give")
     async def xp_give(self, ctx, member: discord.Member, amount: int, *, reason: str = "Admin award"):
@@ -726,6 +780,32 @@ class Zerolivesleft(commands.Cog):
     async def webserver_show_config(self, ctx): 
         await self.web_manager.show_config_command(ctx)
 
+    @webserver_group.group(name="eventsub", aliases=["es"])
+    async def eventsub_group(self, ctx: commands.Context):
+        """Twitch EventSub webhooks (stream online/offline pushed instead of polled)."""
+        if ctx.invoked_subcommand is None:
+            await ctx.send_help(ctx.command)
+
+    @eventsub_group.command(name="setcallback")
+    async def eventsub_set_callback(self, ctx, url: str = None):
+        """Set the public https URL Twitch should call (proxied to /twitch/eventsub). Leave empty to disable."""
+        await self.eventsub_logic.set_callback_url(ctx, url)
+
+    @eventsub_group.command(name="sync")
+    async def eventsub_sync(self, ctx):
+        """Create/remove subscriptions now to match what the Twitch cogs track."""
+        await self.eventsub_logic.force_sync(ctx)
+
+    @eventsub_group.command(name="status")
+    async def eventsub_status(self, ctx):
+        """Show subscriptions, message counters and sync state."""
+        await self.eventsub_logic.show_status(ctx)
+
+    @eventsub_group.command(name="fake")
+    async def eventsub_fake(self, ctx, event: str, twitch_login: str):
+        """Send a signed fake online/offline notification to the local web server."""
+        await self.eventsub_logic.send_fake(ctx, event, twitch_login)
+
     # =============================================================================
     # APPLICATION PING COMMANDS (NEW)
     # =============================================================================
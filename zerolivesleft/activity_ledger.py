@@ -0,0 +1,206 @@
+# zerolivesleft/activity_ledger.py
+# In-memory write-behind ledger for per-user XP/activity counters
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Set
+
+log = logging.getLogger("red.Elkz.zerolivesleft.activity_ledger")
+
+
+class ActivityLedger:
+    """
+    Holds the per-user activity counters for every guild in memory.
+
+    The counters live in guild-wide Config dicts (``at_user_xp`` etc.), so
+    touching them through Config on every message re-serializes the whole
+    dict. The ledger loads each guild once, applies increments in memory and
+    writes only the changed users back in batches.
+
+    Unflushed state is bounded: a flush is forced every ``flush_interval``
+    seconds and as soon as ``max_pending`` changes have accumulated, so a
+    crash loses at most that much activity.
+    """
+
+    FIELDS = ("at_user_xp", "at_user_prestige", "at_user_message_count", "at_user_activity")
+
+    def __init__(self, config, flush_interval: int = 30, max_pending: int = 500):
+        self.config = config
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._data: Dict[int, Dict[str, Dict[str, int]]] = {}   # guild_id -> field -> uid -> value
+        self._dirty: Dict[int, Dict[str, Set[str]]] = {}        # guild_id -> field -> {uid}
+        self._modified: Dict[int, Dict[str, Dict[str, float]]] = {}  # guild_id -> field -> uid -> unix time
+        self._versions: Dict[int, Dict[str, int]] = {}          # guild_id -> field -> change counter
+        self._loaded_at: Dict[int, float] = {}
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._load_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._forced_flush_task = None
+        self.flush_task = None
+
+        # Stats for the debug command
+        self.flushes = 0
+        self.last_flush_writes = 0
+
+    # --- LIFECYCLE ---
+
+    async def load_all(self):
+        """Load counters for every guild that already has data stored."""
+        all_guilds = await self.config.all_guilds()
+        async with self._load_lock:
+            for guild_id, data in all_guilds.items():
+                if guild_id not in self._data:
+                    self._data[guild_id] = {field: dict(data.get(field) or {}) for field in self.FIELDS}
+                    self._loaded_at[guild_id] = time.time()
+        log.info(f"ActivityLedger: Loaded counters for {len(self._data)} guilds.")
+
+    def start(self, loop):
+        """Start the periodic flush loop."""
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = loop.create_task(self._flush_loop())
+
+    def stop(self):
+        """Stop the flush loop. Call ``flush()`` afterwards to persist what is left."""
+        if self.flush_task and not self.flush_task.done():
+            self.flush_task.cancel()
+        if self._forced_flush_task and not self._forced_flush_task.done():
+            self._forced_flush_task.cancel()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                log.info("ActivityLedger: Flush loop cancelled.")
+                break
+            except Exception as e:
+                log.exception(f"ActivityLedger: Error during periodic flush: {e}")
+
+    # --- ACCESS ---
+
+    async def _guild_data(self, guild_id: int) -> Dict[str, Dict[str, int]]:
+        data = self._data.get(guild_id)
+        if data is not None:
+            return data
+        async with self._load_lock:
+            if guild_id not in self._data:
+                stored = await self.config.guild_from_id(guild_id).all()
+                self._data[guild_id] = {field: dict(stored.get(field) or {}) for field in self.FIELDS}
+                self._loaded_at[guild_id] = time.time()
+            return self._data[guild_id]
+
+    async def get(self, guild, field: str, user_id, default: int = 0) -> int:
+        """Get a single counter value for a user."""
+        data = await self._guild_data(guild.id)
+        return data[field].get(str(user_id), default)
+
+    async def get_all(self, guild, field: str) -> Dict[str, int]:
+        """Get the full counter dict for a guild. Treat the result as read-only."""
+        data = await self._guild_data(guild.id)
+        return data[field]
+
+    async def add(self, guild, field: str, user_id, amount: int) -> int:
+        """Increment a counter and return the new value."""
+        data = await self._guild_data(guild.id)
+        uid = str(user_id)
+        new_value = data[field].get(uid, 0) + amount
+        data[field][uid] = new_value
+        self._mark_dirty(guild.id, field, uid)
+        self._touch(guild.id, field, uid)
+        return new_value
+
+    async def set(self, guild, field: str, user_id, value: int) -> int:
+        """Overwrite a counter and return the previous value."""
+        data = await self._guild_data(guild.id)
+        uid = str(user_id)
+        old_value = data[field].get(uid, 0)
+        data[field][uid] = value
+        self._mark_dirty(guild.id, field, uid)
+        self._touch(guild.id, field, uid)
+        return old_value
+
+    def _touch(self, guild_id: int, field: str, uid: str):
+        self._modified.setdefault(guild_id, {}).setdefault(field, {})[uid] = time.time()
+        versions = self._versions.setdefault(guild_id, {})
+        versions[field] = versions.get(field, 0) + 1
+
+    def version(self, guild_id: int, field: str) -> str:
+        """
+        Token that changes whenever any user's value for ``field`` changes.
+
+        The change counter only lives in memory, so it is paired with the
+        load time to keep tokens from one run from matching the next.
+        """
+        return f"{self._loaded_at.get(guild_id, 0)!r}-{self._versions.get(guild_id, {}).get(field, 0)}"
+
+    async def modified_since(self, guild, field: str, since: float) -> Optional[Set[str]]:
+        """
+        User IDs whose ``field`` changed at or after the unix time ``since``.
+
+        Returns None when ``since`` predates the ledger load, since changes
+        made before the load were not stamped and every user must be sent.
+        """
+        await self._guild_data(guild.id)
+        if since < self._loaded_at.get(guild.id, 0):
+            return None
+        stamps = self._modified.get(guild.id, {}).get(field, {})
+        return {uid for uid, stamp in stamps.items() if stamp >= since}
+
+    def _mark_dirty(self, guild_id: int, field: str, uid: str):
+        dirty = self._dirty.setdefault(guild_id, {}).setdefault(field, set())
+        if uid not in dirty:
+            dirty.add(uid)
+            self._pending += 1
+
+        if self._pending >= self.max_pending and (self._forced_flush_task is None or self._forced_flush_task.done()):
+            self._forced_flush_task = asyncio.create_task(self.flush())
+
+    @property
+    def pending(self) -> int:
+        """Number of changed user counters not yet written to Config."""
+        return self._pending
+
+    @property
+    def seconds_since_flush(self) -> float:
+        return time.monotonic() - self._last_flush
+
+    # --- PERSISTENCE ---
+
+    async def flush(self):
+        """Write every changed counter back to Config, one write per guild field."""
+        async with self._flush_lock:
+            if not self._dirty:
+                self._last_flush = time.monotonic()
+                return
+
+            dirty, self._dirty = self._dirty, {}
+            self._pending = 0
+            writes = 0
+
+            for guild_id, fields in dirty.items():
+                data = self._data.get(guild_id)
+                if data is None:
+                    continue
+                group = self.config.guild_from_id(guild_id)
+                for field, uids in fields.items():
+                    values = data[field]
+                    try:
+                        async with getattr(group, field)() as stored:
+                            for uid in uids:
+                                stored[uid] = values.get(uid, 0)
+                        writes += len(uids)
+                    except Exception as e:
+                        # Put the users back so the next flush retries them
+                        log.error(f"ActivityLedger: Failed to flush {field} for guild {guild_id}: {e}")
+                        for uid in uids:
+                            self._mark_dirty(guild_id, field, uid)
+
+            self.flushes += 1
+            self.last_flush_writes = writes
+            self._last_flush = time.monotonic()
+            log.debug(f"ActivityLedger: Flushed {writes} counters.")
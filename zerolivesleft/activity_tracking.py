@@ -146,7 +146,7 @@ import aiohttp
 import os
 import json
 import time
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from redbot.core import commands, Config
 from aiohttp import web
@@ -155,6 +155,13 @@ from redbot.core.utils.views import ConfirmView
 
 import logging
 
+from .activity_ledger import ActivityLedger
+from .website_sync import WebsiteSyncQueue
+from .guild_settings import GuildSettingsCache
+from .leaderboard_index import LeaderboardIndex
+from .role_reconciler import RoleReconciler
+from .voice_sessions import VoiceSessionEngine
+
 log = logging.getLogger("red.Elkz.zerolivesleft.activity_tracking")
 
 class ActivityTrackingLogic:
@@ -163,14 +170,22 @@ class ActivityTrackingLogic:
     Tracks voice minutes for website display and awards XP for various activities.
     """
 
+    ROLE_CHECK_INTERVAL = 900      # seconds between role reconciliation passes
+    ACTIVITY_UPDATE_INTERVAL = 300 # seconds between voice crediting ticks
+
     def __init__(self, cog_instance):
         self.cog = cog_instance
         self.config = cog_instance.config
         self.session = cog_instance.session
-        self.voice_tracking = {}
+        self.voice_sessions = VoiceSessionEngine(self.config)
         self.message_cooldowns = {}  # user_id: last_message_time
         self.role_check_task = None
         self.activity_update_task = None
+        self.ledger = ActivityLedger(self.config)
+        self.settings = GuildSettingsCache(self.config)
+        self.leaderboard_index = LeaderboardIndex(self.ledger)
+        self.website_sync = WebsiteSyncQueue(cog_instance, self.settings)
+        self.role_reconciler = RoleReconciler(self._reconcile_member, self._promotion_fingerprint)
         
         # Register XP system config
         default_guild = {
@@ -205,33 +220,59 @@ class ActivityTrackingLogic:
             
             # NEW: Base role requirements for XP earning
             "at_base_role_ids": [],  # List of role IDs that allow XP earning
+            
+            # Voice session engine
+            "at_voice_sessions": {},  # user_id: unix time credited up to, for sessions open at last save
+            "at_voice_exclude_afk": True,
+            "at_voice_exclude_solo": False,
+            "at_voice_excluded_channel_ids": [],
         }
         
         self.config.register_guild(**default_guild)
 
     def start_tasks(self):
         """Starts periodic tasks for role checking and activity updates."""
+        self.cog.bot.loop.create_task(self._setup_ledger())
+        self.website_sync.start(self.cog.bot.loop)
         self.cog.bot.loop.create_task(self._setup_periodic_tasks())
 
+    async def _setup_ledger(self):
+        """Loads the in-memory XP/activity ledger and starts its flush loop."""
+        try:
+            await self.ledger.load_all()
+        except Exception as e:
+            log.exception(f"ActivityTracking: Failed to preload activity ledger: {e}")
+        self.ledger.start(self.cog.bot.loop)
+
     def stop_tasks(self):
         """Stops all periodic tasks."""
         if self.role_check_task and not self.role_check_task.done():
             self.role_check_task.cancel()
         if self.activity_update_task and not self.activity_update_task.done():
             self.activity_update_task.cancel()
-    
-        # Save voice activity for users currently being tracked
-        for guild_id, members_tracking in self.voice_tracking.items():
+        self.ledger.stop()
+        self.website_sync.stop()
+
+    async def save_and_flush(self):
+        """Credits open voice sessions on unload, persists them for the next load, then persists the ledger."""
+        for guild_id in list(self.voice_sessions.sessions):
             guild = self.cog.bot.get_guild(guild_id)
-            if guild:
-                for member_id, join_time in list(members_tracking.items()):
-                    member = guild.get_member(member_id)
-                    if member:
-                        duration_minutes = (datetime.utcnow() - join_time).total_seconds() / 60
-                        if duration_minutes >= 1:
-                            log.info(f"ActivityTracking: Unloading: Logging {duration_minutes:.2f} minutes for {member.name} due to cog unload.")
-                            asyncio.create_task(self._update_user_voice_minutes(guild, member, int(duration_minutes)))
-        self.voice_tracking.clear()
+            if not guild:
+                continue
+            try:
+                await self._credit_voice_tick(guild)
+                log.info(f"ActivityTracking: Unloading: Saved {len(self.voice_sessions.sessions.get(guild_id, {}))} open voice sessions for guild {guild_id}.")
+            except Exception as e:
+                log.exception(f"ActivityTracking: Failed to save voice sessions for guild {guild_id} on unload: {e}")
+        try:
+            await self.ledger.flush()
+            log.info("ActivityTracking: Activity ledger flushed on unload.")
+        except Exception as e:
+            log.exception(f"ActivityTracking: Failed to flush activity ledger on unload: {e}")
+        try:
+            await self.website_sync.flush()
+        except Exception as e:
+            log.exception(f"ActivityTracking: Failed to flush website sync queue on unload: {e}")
 
     async def _migrate_existing_users(self, guild):
         """One-time migration to estimate message counts for existing users"""
@@ -245,13 +286,13 @@ class ActivityTrackingLogic:
         message_xp = await self.config.guild(guild).at_message_xp()
         
         if message_xp > 0:
-            async with self.config.guild(guild).at_user_message_count() as user_message_count:
-                for user_id, data in user_data.items():
-                    if user_id not in user_message_count:
-                        # Rough estimate: total_xp / message_xp
-                        estimated_messages = data.get("xp", 0) // message_xp
-                        user_message_count[user_id] = estimated_messages
-                        log.info(f"ActivityTracking: Migrated {estimated_messages} estimated messages for user {user_id}")
+            user_message_count = await self.ledger.get_all(guild, "at_user_message_count")
+            for user_id, data in user_data.items():
+                if user_id not in user_message_count:
+                    # Rough estimate: total_xp / message_xp
+                    estimated_messages = data.get("xp", 0) // message_xp
+                    await self.ledger.set(guild, "at_user_message_count", user_id, estimated_messages)
+                    log.info(f"ActivityTracking: Migrated {estimated_messages} estimated messages for user {user_id}")
         
         await self.config.custom("migrations", migration_key).set(True)
         log.info(f"ActivityTracking: Message count migration completed for guild {guild.id}")
@@ -260,7 +301,7 @@ class ActivityTrackingLogic:
     
     async def _check_base_role_eligibility(self, guild, member):
         """Check if user has a required base role for XP earning."""
-        base_role_ids = await self.config.guild(guild).at_base_role_ids()
+        base_role_ids = (await self.settings.get(guild)).base_role_ids
         
         if not base_role_ids:
             # If no base roles configured, everyone can earn XP
@@ -277,47 +318,36 @@ class ActivityTrackingLogic:
             log.debug(f"ActivityTracking: {member.name} not eligible for XP (missing base role)")
             return
         
-        async with self.config.guild(guild).at_user_xp() as user_xp:
-            uid = str(member.id)
-            old_xp = user_xp.get(uid, 0)
-            user_xp[uid] = old_xp + xp_amount
-            new_xp = user_xp[uid]
-            log.info(f"ActivityTracking: Added {xp_amount} XP to {member.name} from {source}. Total: {new_xp}")
+        new_xp = await self.ledger.add(guild, "at_user_xp", member.id, xp_amount)
+        log.info(f"ActivityTracking: Added {xp_amount} XP to {member.name} from {source}. Total: {new_xp}")
+        await self.leaderboard_index.update(guild, member.id, new_xp, await self._get_user_prestige(guild, member.id))
         
         # Sync XP to website
-        asyncio.create_task(self._update_website_xp(guild, member, new_xp))
+        await self._update_website_xp(guild, member, new_xp)
         
         # Check for promotions
         await self._check_for_promotion(guild, member, new_xp)
 
     async def _get_user_xp(self, guild, user_id):
         """Get total XP for a user."""
-        user_xp = await self.config.guild(guild).at_user_xp()
-        return user_xp.get(str(user_id), 0)
+        return await self.ledger.get(guild, "at_user_xp", user_id)
 
     async def _get_user_prestige(self, guild, user_id):
         """Get prestige level for a user."""
-        user_prestige = await self.config.guild(guild).at_user_prestige()
-        return user_prestige.get(str(user_id), 0)
+        return await self.ledger.get(guild, "at_user_prestige", user_id)
 
     async def _prestige_user(self, guild, member):
         """Prestige a user (reset XP, increase prestige level, keep voice minutes)."""
-        async with self.config.guild(guild).at_user_prestige() as user_prestige:
-            uid = str(member.id)
-            old_prestige = user_prestige.get(uid, 0)
-            user_prestige[uid] = old_prestige + 1
-            new_prestige = user_prestige[uid]
+        new_prestige = await self.ledger.add(guild, "at_user_prestige", member.id, 1)
         
         # Reset XP but keep voice minutes for website
-        async with self.config.guild(guild).at_user_xp() as user_xp:
-            user_xp[str(member.id)] = 0
+        await self.ledger.set(guild, "at_user_xp", member.id, 0)
+        await self.leaderboard_index.update(guild, member.id, 0, new_prestige)
+        self.role_reconciler.mark_dirty(guild.id, member.id)
         
         # Remove all military rank roles
-        military_ranks = await self.config.guild(guild).at_military_ranks()
-        roles_to_remove = []
-        for role_obj in member.roles:
-            if any(str(role_obj.id) == str(rank.get('discord_role_id')) for rank in military_ranks):
-                roles_to_remove.append(role_obj)
+        settings = await self.settings.get(guild)
+        roles_to_remove = settings.rank_ladder().held_roles(member)
         
         if roles_to_remove:
             await member.remove_roles(*roles_to_remove, reason="Prestige reset")
@@ -326,7 +356,7 @@ class ActivityTrackingLogic:
         await self._update_website_prestige(guild, member, new_prestige)
         
         # Send prestige notification
-        channel_id = await self.config.guild(guild).at_promotion_channel_id()
+        channel_id = settings.promotion_channel_id
         if channel_id:
             channel = guild.get_channel(channel_id)
             if channel:
@@ -340,33 +370,40 @@ class ActivityTrackingLogic:
 
     async def _update_user_voice_minutes(self, guild, member, minutes_to_add):
         """Update voice minutes (for website) and award XP."""
-        # Update voice minutes for website
-        async with self.config.guild(guild).at_user_activity() as user_activity:
-            uid = str(member.id)
-            user_activity[uid] = user_activity.get(uid, 0) + minutes_to_add
-            log.info(f"ActivityTracking: Updated voice minutes for {member.name}: added {minutes_to_add}, new total: {user_activity[uid]}")
-        
-        # Award XP for voice activity
-        voice_xp_rate = await self.config.guild(guild).at_voice_xp_rate()
-        if voice_xp_rate > 0:
-            xp_to_award = minutes_to_add * voice_xp_rate
-            await self._add_xp(guild, member, xp_to_award, "voice_activity")
-        
-        # Sync voice minutes to website
-        total_minutes_for_website = await self._get_user_voice_minutes(guild, member.id)
-        asyncio.create_task(self._update_website_activity(guild, member, total_minutes_for_website))
+        await self._credit_voice_minutes(guild, {member: minutes_to_add})
+
+    async def _credit_voice_minutes(self, guild, credits):
+        """Credit voice minutes and voice XP for a batch of ``{member: minutes}`` in one pass."""
+        if not credits:
+            return
+        voice_xp_rate = (await self.settings.get(guild)).voice_xp_rate
+        for member, minutes_to_add in credits.items():
+            # Update voice minutes for website
+            new_total = await self.ledger.add(guild, "at_user_activity", member.id, minutes_to_add)
+            log.debug(f"ActivityTracking: Updated voice minutes for {member.name}: added {minutes_to_add}, new total: {new_total}")
+            
+            # Award XP for voice activity
+            if voice_xp_rate > 0:
+                await self._add_xp(guild, member, minutes_to_add * voice_xp_rate, "voice_activity")
+            
+            # Sync voice minutes to website
+            await self._update_website_activity(guild, member, new_total)
+
+    async def _credit_voice_tick(self, guild) -> int:
+        """Credit every open voice session in a guild and persist the sessions. Returns members credited."""
+        settings = await self.settings.get(guild)
+        credits = self.voice_sessions.collect(guild, settings)
+        await self._credit_voice_minutes(guild, credits)
+        await self.voice_sessions.persist(guild.id)
+        return len(credits)
 
     async def _get_user_voice_minutes(self, guild, user_id):
         """Get total voice minutes for a user."""
-        user_activity = await self.config.guild(guild).at_user_activity()
-        total_minutes = user_activity.get(str(user_id), 0)
-        guild_id = guild.id
-        if guild_id in self.voice_tracking and user_id in self.voice_tracking[guild_id]:
-            join_time = self.voice_tracking[guild_id][user_id]
-            current_session_minutes = int((datetime.utcnow() - join_time).total_seconds() / 60)
-            if current_session_minutes >= 1:
-                total_minutes += current_session_minutes
-                log.debug(f"ActivityTracking: Added {current_session_minutes} minutes from current session for user {user_id}")
+        total_minutes = await self.ledger.get(guild, "at_user_activity", user_id)
+        current_session_minutes = self.voice_sessions.pending_minutes(guild.id, user_id)
+        if current_session_minutes >= 1:
+            total_minutes += current_session_minutes
+            log.debug(f"ActivityTracking: Added {current_session_minutes} minutes from current session for user {user_id}")
         return total_minutes
 
     # --- MESSAGE XP TRACKING ---
@@ -382,14 +419,12 @@ class ActivityTrackingLogic:
         current_time = time.time()
         
         # NEW: Always count the message (no cooldown for counting)
-        async with self.config.guild(guild).at_user_message_count() as user_message_count:
-            uid = str(user_id)
-            user_message_count[uid] = user_message_count.get(uid, 0) + 1
-            new_count = user_message_count[uid]
-            log.debug(f"ActivityTracking: Message count for {member.name}: {new_count}")
+        new_count = await self.ledger.add(guild, "at_user_message_count", user_id, 1)
+        log.debug(f"ActivityTracking: Message count for {member.name}: {new_count}")
         
         # XP award (with cooldown)
-        message_cooldown = await self.config.guild(guild).at_message_cooldown()
+        settings = await self.settings.get(guild)
+        message_cooldown = settings.message_cooldown
         if user_id in self.message_cooldowns:
             if current_time - self.message_cooldowns[user_id] < message_cooldown:
                 return  # Still on cooldown for XP, but message was still counted
@@ -397,7 +432,7 @@ class ActivityTrackingLogic:
         self.message_cooldowns[user_id] = current_time
         
         # Award XP for message
-        message_xp = await self.config.guild(guild).at_message_xp()
+        message_xp = settings.message_xp
         if message_xp > 0:
             await self._add_xp(guild, member, message_xp, "message")
 
@@ -412,114 +447,51 @@ class ActivityTrackingLogic:
             return
         
         # Award XP for giving reaction
-        reaction_xp = await self.config.guild(guild).at_reaction_xp()
+        reaction_xp = (await self.settings.get(guild)).reaction_xp
         if reaction_xp > 0:
             await self._add_xp(guild, member, reaction_xp, "reaction_given")
 
     # --- WEBSITE SYNC (API Calls) ---
 
     async def _update_website_xp(self, guild, member, total_xp):
-        """Send XP updates to the Django website."""
-        guild_settings = await self.config.guild(guild).all()
-        api_url = guild_settings.get("at_api_url")
-        api_key = guild_settings.get("at_api_key")
-        
-        if not api_url or not api_key:
-            return
-        
-        endpoint = f"{api_url}update-xp/"
-        headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
-        
+        """Queue an XP update for the Django website."""
         prestige_level = await self._get_user_prestige(guild, member.id)
-        payload = {
+        self.website_sync.enqueue(guild.id, "xp", {
             "discord_id": str(member.id),
             "xp": total_xp,
             "prestige_level": prestige_level
-        }
-        
-        try:
-            async with self.session.post(endpoint, headers=headers, json=payload, timeout=10) as resp:
-                if resp.status == 200:
-                    log.info(f"ActivityTracking: Successfully synced XP for user {member.id}: {total_xp} XP, Prestige {prestige_level}")
-                else:
-                    error_text = await resp.text()
-                    log.error(f"ActivityTracking: Failed to update XP: {resp.status} - {error_text}")
-        except Exception as e:
-            log.error(f"ActivityTracking: Exception updating website XP: {str(e)}")
+        })
 
     async def _update_website_prestige(self, guild, member, prestige_level):
-        """Send prestige updates to the Django website."""
-        guild_settings = await self.config.guild(guild).all()
-        api_url = guild_settings.get("at_api_url")
-        api_key = guild_settings.get("at_api_key")
-        
-        if not api_url or not api_key:
-            return
-        
-        endpoint = f"{api_url}update-prestige/"
-        headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
-        payload = {
+        """Queue a prestige update for the Django website."""
+        self.website_sync.enqueue(guild.id, "prestige", {
             "discord_id": str(member.id),
             "prestige_level": prestige_level
-        }
-        
-        try:
-            async with self.session.post(endpoint, headers=headers, json=payload, timeout=10) as resp:
-                if resp.status == 200:
-                    log.info(f"ActivityTracking: Successfully updated prestige for user {member.id}: {prestige_level}")
-                else:
-                    error_text = await resp.text()
-                    log.error(f"ActivityTracking: Failed to update prestige: {resp.status} - {error_text}")
-        except Exception as e:
-            log.error(f"ActivityTracking: Exception updating prestige: {str(e)}")
-
-    # Find this in your activity_tracking.py around line 445 and replace the entire function:
+        })
 
     async def _update_website_activity(self, guild, member, total_minutes_to_send):
-        """Send voice activity and message count updates to the Django website."""
-        guild_settings = await self.config.guild(guild).all()
-        api_url = guild_settings.get("at_api_url")
-        api_key = guild_settings.get("at_api_key")
-        
-        if not api_url or not api_key: 
-            return
-        
-        # Get message count for this user from XP system
+        """Queue a voice activity and message count update for the Django website."""
         message_count = await self._get_user_message_count(guild, member.id)
-        
-        endpoint = f"{api_url}update-activity/"
-        headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
-        payload = {
+        self.website_sync.enqueue(guild.id, "activity", {
             "discord_id": str(member.id), 
             "voice_minutes": total_minutes_to_send,
             "message_count": message_count
-        }
-        
-        try:
-            async with self.session.post(endpoint, headers=headers, json=payload, timeout=10) as resp:
-                if resp.status == 200:
-                    log.info(f"ActivityTracking: Successfully synced activity for user {member.id}: {total_minutes_to_send} voice minutes, {message_count} messages")
-                else:
-                    error_text = await resp.text()
-                    log.error(f"ActivityTracking: Failed to update activity: {resp.status} - {error_text}")
-        except Exception as e:
-            log.error(f"ActivityTracking: Exception updating website activity: {str(e)}")
+        })
 
     async def _get_user_message_count(self, guild, user_id):
         """Get actual message count for a user."""
         try:
-            user_message_count = await self.config.guild(guild).at_user_message_count()
-            return user_message_count.get(str(user_id), 0)
+            return await self.ledger.get(guild, "at_user_message_count", user_id)
         except Exception as e:
             log.error(f"ActivityTracking: Error getting message count for user {user_id}: {e}")
             return 0
 
     async def _notify_website_of_promotion(self, guild, discord_id, new_role_name):
         """Notify the website of a community role promotion."""
-        guild_settings = await self.config.guild(guild).all()
-        promotion_update_url_config = guild_settings.get("at_promotion_update_url")
-        api_url = guild_settings.get("at_api_url")
-        api_key = guild_settings.get("at_api_key")
+        guild_settings = await self.settings.get(guild)
+        promotion_update_url_config = guild_settings.promotion_update_url
+        api_url = guild_settings.api_url
+        api_key = guild_settings.api_key
         
         if not api_key: 
             return
@@ -543,10 +515,10 @@ class ActivityTrackingLogic:
 
     async def _notify_website_of_military_rank(self, guild, discord_id, rank_name):
         """Notify the website of a military rank update."""
-        guild_settings = await self.config.guild(guild).all()
-        military_rank_update_url_config = guild_settings.get("at_military_rank_update_url")
-        api_url = guild_settings.get("at_api_url")
-        api_key = guild_settings.get("at_api_key")
+        guild_settings = await self.settings.get(guild)
+        military_rank_update_url_config = guild_settings.military_rank_update_url
+        api_url = guild_settings.api_url
+        api_key = guild_settings.api_key
         
         if not api_key: 
             return
@@ -598,11 +570,16 @@ class ActivityTrackingLogic:
         if self.role_check_task is None or self.role_check_task.done():
             self.role_check_task = self.cog.bot.loop.create_task(self._schedule_periodic_role_check_loop(guild_id))
         
+        try:
+            await self.voice_sessions.restore(guild)
+        except Exception as e:
+            log.exception(f"ActivityTracking: Failed to restore voice sessions for guild {guild_id}: {e}")
+
         if self.activity_update_task is None or self.activity_update_task.done():
             self.activity_update_task = self.cog.bot.loop.create_task(self._schedule_periodic_activity_updates_loop(guild_id))
 
     async def _schedule_periodic_role_check_loop(self, guild_id: int):
-        """Schedules the periodic role check to run every 24 hours."""
+        """Schedules the periodic role check. Most runs only look at members marked dirty."""
         while True:
             try:
                 log.info(f"ActivityTracking: Running scheduled role check for guild ID: {guild_id}")
@@ -613,7 +590,7 @@ class ActivityTrackingLogic:
                 break
             except Exception as e:
                 log.exception(f"ActivityTracking: An error occurred during the scheduled role check: {e}")
-            await asyncio.sleep(86400)
+            await asyncio.sleep(self.ROLE_CHECK_INTERVAL)
 
     async def _schedule_periodic_activity_updates_loop(self, guild_id: int):
         """Schedules periodic updates of activity for users currently in voice channels."""
@@ -625,73 +602,58 @@ class ActivityTrackingLogic:
                 break
             except Exception as e:
                 log.exception(f"ActivityTracking: An error occurred during the periodic activity update: {e}")
-            await asyncio.sleep(300)
+            await asyncio.sleep(self.ACTIVITY_UPDATE_INTERVAL)
 
     async def _update_active_voice_users(self, guild_id: int):
-        """Updates activity for users currently in voice channels."""
+        """Credits everyone currently in voice in one batch."""
         guild = self.cog.bot.get_guild(guild_id)
         if not guild:
             return
         
-        updates_sent = 0
-        
-        for voice_channel in guild.voice_channels:
-            for member in voice_channel.members:
-                if member.bot:
-                    continue
-                
-                if guild_id in self.voice_tracking and member.id in self.voice_tracking[guild_id]:
-                    join_time = self.voice_tracking[guild_id][member.id]
-                    current_time = datetime.utcnow()
-                    
-                    minutes_since_join = int((current_time - join_time).total_seconds() / 60)
-                    
-                    if minutes_since_join >= 5:
-                        await self._update_user_voice_minutes(guild, member, minutes_since_join)
-                        self.voice_tracking[guild_id][member.id] = current_time
-                        updates_sent += 1
-        
+        updates_sent = await self._credit_voice_tick(guild)
         log.info(f"ActivityTracking: Periodic activity update complete. Sent {updates_sent} updates.")
 
     async def _periodic_role_check(self, guild_id: int):
-        """Performs a periodic check of all guild members' roles based on their XP."""
+        """Reconciles members' roles with their XP (dirty members, or everyone on a full pass)."""
         guild = self.cog.bot.get_guild(guild_id)
         if not guild:
             return
 
-        members_checked = 0
-        promotions_made = 0
-
         try:
-            async for member in guild.fetch_members(limit=None):
-                if member.bot:
-                    continue
-                
-                members_checked += 1
-                total_xp = await self._get_user_xp(guild, member.id)
-
-                initial_roles = {r.id for r in member.roles}
-                await self._check_for_promotion(guild, member, total_xp)
-                final_roles = {r.id for r in member.roles}
-
-                if initial_roles != final_roles:
-                    promotions_made += 1
-                
-                await asyncio.sleep(0.1)
-
+            await self.role_reconciler.run(guild)
         except Exception as e:
             log.exception(f"ActivityTracking: Error during periodic role check: {e}")
 
-        log.info(f"ActivityTracking: Periodic role check complete. Checked {members_checked} members, made {promotions_made} role changes.")
+    async def _reconcile_member(self, guild, member):
+        total_xp = await self._get_user_xp(guild, member.id)
+        await self._check_for_promotion(guild, member, total_xp)
+
+    def _promotion_settings_changed(self, guild_id: int):
+        """Drop the settings snapshot and recheck every member on the next role pass."""
+        self.settings.invalidate(guild_id)
+        self.role_reconciler.request_full(guild_id)
+
+    async def _promotion_fingerprint(self, guild):
+        """Promotion settings that, when changed, require every member to be rechecked."""
+        settings = await self.settings.get(guild)
+        return (
+            settings.recruit_role_id,
+            settings.member_role_id,
+            settings.promotion_threshold_xp,
+            settings.military_ranks,
+            settings.prestige_enabled,
+            settings.prestige_multiplier,
+        )
 
     # --- PROMOTION LOGIC (XP-based) ---
 
     async def _check_for_promotion(self, guild, member, total_xp):
         """Check for promotions based on XP."""
         # Recruit -> Member (XP-based)
-        recruit_role_id = await self.config.guild(guild).at_recruit_role_id()
-        member_role_id = await self.config.guild(guild).at_member_role_id()
-        threshold_xp = await self.config.guild(guild).at_promotion_threshold_xp()
+        settings = await self.settings.get(guild)
+        recruit_role_id = settings.recruit_role_id
+        member_role_id = settings.member_role_id
+        threshold_xp = settings.promotion_threshold_xp
         
         if recruit_role_id and member_role_id and threshold_xp:
             recruit_role = guild.get_role(recruit_role_id)
@@ -701,7 +663,7 @@ class ActivityTrackingLogic:
                     await member.remove_roles(recruit_role, reason="XP Promotion")
                     await member.add_roles(member_role, reason="XP Promotion")
                     await self._notify_website_of_promotion(guild, member.id, "member")
-                    channel_id = await self.config.guild(guild).at_promotion_channel_id()
+                    channel_id = settings.promotion_channel_id
                     if channel_id:
                         channel = guild.get_channel(channel_id)
                         if channel:
@@ -714,57 +676,37 @@ class ActivityTrackingLogic:
 
     async def _check_military_rank_promotion(self, guild, member, total_xp):
         """Check for military rank promotions with prestige support."""
-        military_ranks = await self.config.guild(guild).at_military_ranks()
-        if not military_ranks:
+        settings = await self.settings.get(guild)
+        if not settings.military_ranks:
             return
         
         prestige_level = await self._get_user_prestige(guild, member.id)
-        prestige_enabled = await self.config.guild(guild).at_prestige_enabled()
+        prestige_enabled = settings.prestige_enabled
         
-        # Calculate XP requirements with prestige multiplier
-        prestige_multiplier = await self.config.guild(guild).at_prestige_multiplier()
-        xp_multiplier = 1 + (prestige_level * prestige_multiplier) if prestige_enabled else 1
-        
-        # Find eligible ranks
-        eligible_ranks = []
-        for rank_data in military_ranks:
-            required_xp = rank_data.get('required_xp', 0)
-            adjusted_required_xp = int(required_xp * xp_multiplier)
-            if total_xp >= adjusted_required_xp:
-                eligible_ranks.append((rank_data, adjusted_required_xp))
-        
-        if not eligible_ranks:
-            return
+        # Compiled ladder with the prestige multiplier already applied
+        ladder = settings.rank_ladder(settings.xp_multiplier(prestige_level))
         
         # Get highest eligible rank
-        current_highest_eligible_rank = max(eligible_ranks, key=lambda x: x[1])[0]
+        current_highest_eligible_rank = ladder.highest_eligible(total_xp)
+        if not current_highest_eligible_rank:
+            return
         
         # Check for prestige eligibility
-        max_rank = max(military_ranks, key=lambda x: x.get('required_xp', 0))
-        max_required_xp = int(max_rank.get('required_xp', 0) * xp_multiplier)
-        
-        if prestige_enabled and total_xp >= max_required_xp * 1.5:  # 150% of max rank for prestige
+        if prestige_enabled and total_xp >= ladder.max_required_xp * 1.5:  # 150% of max rank for prestige
             # Offer prestige
             await self._offer_prestige(guild, member)
             return
         
         # Normal rank promotion logic
-        user_current_military_role_ids = {
-            r.id for r in member.roles 
-            if any(str(r.id) == str(rank_data.get('discord_role_id')) for rank_data in military_ranks)
-        }
+        held_military_roles = ladder.held_roles(member)
+        user_current_military_role_ids = {r.id for r in held_military_roles}
 
         target_role_id = int(current_highest_eligible_rank['discord_role_id'])
         target_rank_name = current_highest_eligible_rank['name']
         
         if target_role_id not in user_current_military_role_ids:
             # Remove old military ranks
-            roles_to_remove = []
-            all_military_role_ids = {int(r['discord_role_id']) for r in military_ranks if 'discord_role_id' in r}
-            
-            for role_obj in member.roles:
-                if role_obj.id in all_military_role_ids:
-                    roles_to_remove.append(role_obj)
+            roles_to_remove = held_military_roles
             
             # Add new rank
             add_role_obj = guild.get_role(target_role_id)
@@ -777,7 +719,7 @@ class ActivityTrackingLogic:
                 
                 await self._notify_website_of_military_rank(guild, member.id, target_rank_name)
 
-                channel_id = await self.config.guild(guild).at_promotion_channel_id()
+                channel_id = settings.promotion_channel_id
                 if channel_id:
                     channel = guild.get_channel(channel_id)
                     if channel:
@@ -790,7 +732,7 @@ class ActivityTrackingLogic:
 
     async def _offer_prestige(self, guild, member):
         """Offer prestige to a user who has reached maximum rank."""
-        channel_id = await self.config.guild(guild).at_promotion_channel_id()
+        channel_id = (await self.settings.get(guild)).promotion_channel_id
         if not channel_id:
             return
         
@@ -834,31 +776,53 @@ class ActivityTrackingLogic:
         guild = member.guild
         guild_id = guild.id
         user_id = member.id
-        
-        if guild_id not in self.voice_tracking:
-            self.voice_tracking[guild_id] = {}
+        sessions = self.voice_sessions
         
         # User JOINS a voice channel
         if before.channel is None and after.channel is not None:
-            self.voice_tracking[guild_id][user_id] = datetime.utcnow()
+            sessions.start(guild_id, user_id)
             log.info(f"ActivityTracking: {member.name} joined voice channel {after.channel.name}")
             
             # Award bonus XP for joining voice
-            voice_join_xp = await self.config.guild(guild).at_voice_join_xp()
-            if voice_join_xp > 0:
-                await self._add_xp(guild, member, voice_join_xp, "voice_join")
+            settings = await self.settings.get(guild)
+            if settings.voice_join_xp > 0 and not sessions.is_excluded(after.channel, settings):
+                await self._add_xp(guild, member, settings.voice_join_xp, "voice_join")
         
         # User LEAVES a voice channel
         elif before.channel is not None and after.channel is None:
-            if user_id in self.voice_tracking[guild_id]:
-                join_time = self.voice_tracking[guild_id].pop(user_id)
-                duration = datetime.utcnow() - join_time
-                minutes = duration.total_seconds() / 60
+            if sessions.is_tracking(guild_id, user_id):
+                settings = await self.settings.get(guild)
+                eligible = not sessions.is_excluded(before.channel, settings, leaving=True)
+                minutes = sessions.settle(guild_id, user_id, eligible, end=True)
+                await sessions.forget(guild_id, user_id)
                 
-                log.info(f"ActivityTracking: {member.name} left voice channel {before.channel.name}. Duration: {minutes:.2f} minutes.")
+                log.info(f"ActivityTracking: {member.name} left voice channel {before.channel.name}. Credited {minutes} minutes.")
                 
                 if minutes >= 1:
-                    await self._update_user_voice_minutes(guild, member, int(minutes))
+                    await self._update_user_voice_minutes(guild, member, minutes)
+        
+        # User MOVES between channels: settle time spent in the old one
+        elif before.channel is not None and after.channel is not None and before.channel != after.channel:
+            if not sessions.is_tracking(guild_id, user_id):
+                sessions.start(guild_id, user_id)
+                return
+            settings = await self.settings.get(guild)
+            minutes = sessions.settle(guild_id, user_id, not sessions.is_excluded(before.channel, settings, leaving=True))
+            if minutes >= 1:
+                await self._update_user_voice_minutes(guild, member, minutes)
+
+    async def handle_member_join(self, member):
+        """Put members who rejoin back on the leaderboard index."""
+        await self.leaderboard_index.add_member(member.guild, member)
+
+    async def handle_member_remove(self, member):
+        """Drop members who leave from the leaderboard index."""
+        self.leaderboard_index.remove(member.guild.id, member.id)
+
+    def handle_member_update(self, before, after):
+        """Queue members whose roles changed for the next role reconciliation pass."""
+        if not after.bot and before.roles != after.roles:
+            self.role_reconciler.mark_dirty(after.guild.id, after.id)
 
     def _generate_progress_bar(self, percent, length=10):
         """Generate a progress bar."""
@@ -939,6 +903,7 @@ class ActivityTrackingLogic:
                     })
                 
                 # Already sorted by XP in the list above
+            self._promotion_settings_changed(ctx.guild.id)
             
             embed = discord.Embed(
                 title="🎖️ Military Ranks Setup Complete",
@@ -1031,6 +996,7 @@ class ActivityTrackingLogic:
         await self.config.guild(ctx.guild).at_member_role_id.set(member_role.id)
         await self.config.guild(ctx.guild).at_member_threshold_hours.set(24)
         await self.config.guild(ctx.guild).at_military_start_hours.set(12)
+        self._promotion_settings_changed(ctx.guild.id)
         
         embed = discord.Embed(
             title="⚖️ Dual Progression System Setup Complete",
@@ -1088,6 +1054,7 @@ class ActivityTrackingLogic:
         await self.config.guild(ctx.guild).at_recruit_role_id.set(recruit_role_id)
         await self.config.guild(ctx.guild).at_member_role_id.set(private_role_id)
         await self.config.guild(ctx.guild).at_promotion_threshold_xp.set(100)
+        self._promotion_settings_changed(ctx.guild.id)
         
         embed = discord.Embed(
             title="👥 Recruit System Setup Complete",
@@ -1120,6 +1087,7 @@ class ActivityTrackingLogic:
         await self.config.guild(ctx.guild).at_message_xp.set(message_xp)
         await self.config.guild(ctx.guild).at_reaction_xp.set(reaction_xp)
         await self.config.guild(ctx.guild).at_voice_join_xp.set(voice_join_bonus)
+        self.settings.invalidate(ctx.guild.id)
         
         embed = discord.Embed(title="🎯 XP Rates Updated", color=discord.Color.blue())
         embed.add_field(
@@ -1134,18 +1102,36 @@ class ActivityTrackingLogic:
         )
         await ctx.send(embed=embed)
 
+    async def set_voice_exclusions(self, ctx, afk: bool = True, solo: bool = False, *channels: discord.VoiceChannel):
+        """Set which voice time is not credited: the AFK channel, channels with one human, and specific channels."""
+        guild_config = self.config.guild(ctx.guild)
+        await guild_config.at_voice_exclude_afk.set(afk)
+        await guild_config.at_voice_exclude_solo.set(solo)
+        await guild_config.at_voice_excluded_channel_ids.set([c.id for c in channels])
+        self.settings.invalidate(ctx.guild.id)
+        
+        excluded = humanize_list([c.mention for c in channels]) if channels else "None"
+        await ctx.send(
+            f"Voice exclusions updated:\n"
+            f"AFK channel excluded: **{afk}**\n"
+            f"Solo channels excluded: **{solo}**\n"
+            f"Excluded channels: {excluded}"
+        )
+
     async def set_message_cooldown(self, ctx, seconds: int):
         """Set cooldown between message XP awards."""
         if seconds < 0:
             return await ctx.send("Cooldown cannot be negative.")
         
         await self.config.guild(ctx.guild).at_message_cooldown.set(seconds)
+        self.settings.invalidate(ctx.guild.id)
         await ctx.send(f"Message XP cooldown set to {seconds} seconds.")
 
     async def setup_prestige(self, ctx, enabled: bool = True, multiplier: float = 0.5):
         """Enable/disable prestige system and set XP multiplier."""
         await self.config.guild(ctx.guild).at_prestige_enabled.set(enabled)
         await self.config.guild(ctx.guild).at_prestige_multiplier.set(multiplier)
+        self._promotion_settings_changed(ctx.guild.id)
         
         if enabled:
             await ctx.send(
@@ -1161,24 +1147,19 @@ class ActivityTrackingLogic:
         member = ctx.author
         guild = ctx.guild
         
-        prestige_enabled = await self.config.guild(guild).at_prestige_enabled()
-        if not prestige_enabled:
+        settings = await self.settings.get(guild)
+        if not settings.prestige_enabled:
             return await ctx.send("❌ Prestige system is not enabled on this server.")
         
-        military_ranks = await self.config.guild(guild).at_military_ranks()
-        if not military_ranks:
+        if not settings.military_ranks:
             return await ctx.send("❌ No military ranks configured.")
         
         total_xp = await self._get_user_xp(guild, member.id)
         prestige_level = await self._get_user_prestige(guild, member.id)
         
         # Calculate if eligible for prestige
-        prestige_multiplier = await self.config.guild(guild).at_prestige_multiplier()
-        xp_multiplier = 1 + (prestige_level * prestige_multiplier)
-        
-        max_rank = max(military_ranks, key=lambda x: x.get('required_xp', 0))
-        max_required_xp = int(max_rank.get('required_xp', 0) * xp_multiplier)
-        prestige_threshold = max_required_xp * 1.5
+        ladder = settings.rank_ladder(settings.xp_multiplier(prestige_level))
+        prestige_threshold = ladder.max_required_xp * 1.5
         
         if total_xp < prestige_threshold:
             return await ctx.send(
@@ -1234,6 +1215,7 @@ class ActivityTrackingLogic:
         await self.config.guild(ctx.guild).at_recruit_role_id.set(recruit_role.id)
         await self.config.guild(ctx.guild).at_member_role_id.set(member_role.id)
         await self.config.guild(ctx.guild).at_promotion_threshold_xp.set(required_xp)
+        self._promotion_settings_changed(ctx.guild.id)
         
         await ctx.send(
             f"✅ **Recruit/Member System Updated**\n"
@@ -1257,6 +1239,7 @@ class ActivityTrackingLogic:
             return await ctx.send("XP threshold must be positive.")
         
         await self.config.guild(ctx.guild).at_promotion_threshold_xp.set(xp_amount)
+        self._promotion_settings_changed(ctx.guild.id)
         await ctx.send(f"✅ Promotion threshold set to **{xp_amount:,} XP**.")
 
     async def set_api(self, ctx, url: str, key: str):
@@ -1268,6 +1251,7 @@ class ActivityTrackingLogic:
         
         await self.config.guild(ctx.guild).at_api_url.set(url)
         await self.config.guild(ctx.guild).at_api_key.set(key)
+        self.settings.invalidate(ctx.guild.id)
         await ctx.send("✅ API URL and Key have been saved.")
 
     async def set_promotion_url(self, ctx, url: str):
@@ -1275,6 +1259,7 @@ class ActivityTrackingLogic:
         if not url.startswith("http://") and not url.startswith("https://"):
             return await ctx.send("URL must start with http:// or https://")
         await self.config.guild(ctx.guild).at_promotion_update_url.set(url)
+        self.settings.invalidate(ctx.guild.id)
         await ctx.send("✅ Community role promotion URL set.")
 
     async def set_military_rank_url(self, ctx, url: str):
@@ -1282,11 +1267,13 @@ class ActivityTrackingLogic:
         if not url.startswith("http://") and not url.startswith("https://"):
             return await ctx.send("URL must start with http:// or https://")
         await self.config.guild(ctx.guild).at_military_rank_update_url.set(url)
+        self.settings.invalidate(ctx.guild.id)
         await ctx.send("✅ Military rank update URL set.")
 
     async def set_promotion_channel(self, ctx, channel: discord.TextChannel):
         """Set the channel for promotion notifications."""
         await self.config.guild(ctx.guild).at_promotion_channel_id.set(channel.id)
+        self.settings.invalidate(ctx.guild.id)
         await ctx.send(f"✅ Promotion notification channel set to {channel.mention}.")
 
     async def add_rank(self, ctx, role: discord.Role, required_xp: int):
@@ -1307,6 +1294,7 @@ class ActivityTrackingLogic:
                 "required_xp": required_xp
             })
             ranks.sort(key=lambda r: r['required_xp'])
+        self._promotion_settings_changed(ctx.guild.id)
         
         await ctx.send(f"✅ Added military rank: **{role.name}** at **{required_xp:,} XP**.")
 
@@ -1315,11 +1303,13 @@ class ActivityTrackingLogic:
         async with self.config.guild(ctx.guild).at_military_ranks() as ranks:
             initial_len = len(ranks)
             ranks[:] = [r for r in ranks if str(r.get('discord_role_id')) != role_or_name and r.get('name').lower() != role_or_name.lower()]
+            removed = len(ranks) < initial_len
+        self._promotion_settings_changed(ctx.guild.id)
             
-            if len(ranks) < initial_len:
-                await ctx.send(f"✅ Removed military rank matching '{role_or_name}'.")
-            else:
-                await ctx.send(f"❌ No military rank found matching '{role_or_name}'.")
+        if removed:
+            await ctx.send(f"✅ Removed military rank matching '{role_or_name}'.")
+        else:
+            await ctx.send(f"❌ No military rank found matching '{role_or_name}'.")
 
     async def clear_ranks(self, ctx):
         """Clear all configured military ranks."""
@@ -1331,6 +1321,7 @@ class ActivityTrackingLogic:
         await view.wait()
         if view.result:
             await self.config.guild(ctx.guild).at_military_ranks.set([])
+            self._promotion_settings_changed(ctx.guild.id)
             await ctx.send("✅ All military ranks have been cleared.")
         else:
             await ctx.send("Operation cancelled.")
@@ -1465,10 +1456,13 @@ class ActivityTrackingLogic:
         )
         
         # Voice Tracking
-        total_tracked = sum(len(members) for members in self.voice_tracking.values())
         embed.add_field(
             name="📊 Voice Tracking",
-            value=f"Currently tracking: **{total_tracked}** users",
+            value=(
+                f"Currently tracking: **{self.voice_sessions.tracked_count}** users\n"
+                f"Last tick: **{self.voice_sessions.last_tick_credited}** credited "
+                f"in {self.voice_sessions.last_tick_seconds * 1000:.1f}ms ({self.voice_sessions.ticks} ticks)"
+            ),
             inline=False
         )
         
@@ -1490,6 +1484,52 @@ class ActivityTrackingLogic:
             inline=True
         )
         
+        # Website Sync Queue
+        sync_metrics = self.website_sync.metrics
+        embed.add_field(
+            name="🌐 Website Sync",
+            value=(
+                f"Queued: **{self.website_sync.depth}** (peak {sync_metrics['peak_depth']})\n"
+                f"Sent: **{sync_metrics['sent']}** • Coalesced: **{sync_metrics['coalesced']}**\n"
+                f"Failed: **{sync_metrics['failed']}** • Retries: **{sync_metrics['retries']}**\n"
+                f"Last flush: **{sync_metrics['last_flush_seconds']:.2f}s**"
+            ),
+            inline=False
+        )
+        
+        # Role Reconciliation
+        rc = self.role_reconciler.metrics
+        progress = rc["progress"]
+        if progress:
+            rc_status = f"Running **{progress['mode']}** pass: {progress['checked']}/{progress['total']}"
+        elif rc["last_finished"]:
+            rc_status = (
+                f"Last pass: **{rc['last_mode']}**, {rc['last_checked']} checked, "
+                f"{rc['last_changes']} changed in {rc['last_duration']:.1f}s (<t:{int(rc['last_finished'])}:R>)"
+            )
+        else:
+            rc_status = "No pass yet"
+        embed.add_field(
+            name="🎖️ Role Reconciliation",
+            value=(
+                f"{rc_status}\n"
+                f"Dirty members: **{self.role_reconciler.dirty_count(ctx.guild.id)}**\n"
+                f"Passes: **{rc['passes']}** ({rc['full_passes']} full) • Changes: **{rc['total_changes']}**"
+            ),
+            inline=False
+        )
+        
+        # Activity Ledger
+        embed.add_field(
+            name="💾 Activity Ledger",
+            value=(
+                f"Unflushed changes: **{self.ledger.pending}**\n"
+                f"Last flush: **{int(self.ledger.seconds_since_flush)}s** ago "
+                f"({self.ledger.last_flush_writes} writes)"
+            ),
+            inline=False
+        )
+        
         # Environment
         main_guild_id = os.environ.get("DISCORD_GUILD_ID", "Not set")
         embed.add_field(
@@ -1503,28 +1543,9 @@ class ActivityTrackingLogic:
 
     async def force_sync(self, ctx):
         """Force a sync of all active voice users."""
-        guild = ctx.guild
-        guild_id = guild.id
-        
-        updates_sent = 0
-        
         status_msg = await ctx.send("🔄 Starting forced sync of all active voice users...")
         
-        for voice_channel in guild.voice_channels:
-            for member in voice_channel.members:
-                if member.bot:
-                    continue
-                
-                if guild_id in self.voice_tracking and member.id in self.voice_tracking[guild_id]:
-                    join_time = self.voice_tracking[guild_id][member.id]
-                    current_time = datetime.utcnow()
-                    
-                    minutes_since_join = int((current_time - join_time).total_seconds() / 60)
-                    
-                    if minutes_since_join >= 1:
-                        await self._update_user_voice_minutes(guild, member, minutes_since_join)
-                        self.voice_tracking[guild_id][member.id] = current_time
-                        updates_sent += 1
+        updates_sent = await self._credit_voice_tick(ctx.guild)
         
         await status_msg.edit(content=f"✅ Forced sync complete. Sent **{updates_sent}** updates.")
 
@@ -1593,9 +1614,10 @@ class ActivityTrackingLogic:
         )
         
         # Recruit/Member Progress
-        recruit_role_id = await self.config.guild(ctx.guild).at_recruit_role_id()
-        member_role_id = await self.config.guild(ctx.guild).at_member_role_id()
-        threshold_xp = await self.config.guild(ctx.guild).at_promotion_threshold_xp()
+        settings = await self.settings.get(ctx.guild)
+        recruit_role_id = settings.recruit_role_id
+        member_role_id = settings.member_role_id
+        threshold_xp = settings.promotion_threshold_xp
 
         if recruit_role_id and member_role_id and threshold_xp:
             recruit_role = ctx.guild.get_role(recruit_role_id)
@@ -1628,42 +1650,14 @@ class ActivityTrackingLogic:
                     )
 
         # Military Rank Progress
-        military_ranks = await self.config.guild(ctx.guild).at_military_ranks()
-        if military_ranks:
+        if settings.military_ranks:
             try:
-                prestige_multiplier = await self.config.guild(ctx.guild).at_prestige_multiplier()
-                xp_multiplier = 1 + (prestige_level * prestige_multiplier) if prestige_level > 0 else 1
-                
-                sorted_ranks = sorted(
-                    [r for r in military_ranks if isinstance(r.get('required_xp'), (int, float))],
-                    key=lambda x: x['required_xp']
-                )
-
-                current_rank = None
-                next_rank = None
-
-                # Find current rank
-                user_current_military_role_ids = {
-                    role.id for role in target.roles
-                    if any(str(role.id) == str(r.get('discord_role_id')) for r in military_ranks)
-                }
-                
-                user_eligible_ranks_from_roles = [
-                    r for r in military_ranks 
-                    if int(r.get('discord_role_id', 0)) in user_current_military_role_ids
-                ]
+                xp_multiplier = 1 + (prestige_level * settings.prestige_multiplier) if prestige_level > 0 else 1
+                ladder = settings.rank_ladder(xp_multiplier)
 
-                if user_eligible_ranks_from_roles:
-                    current_rank = max(user_eligible_ranks_from_roles, key=lambda x: x['required_xp'])
-                
-                # Find next rank
-                if current_rank:
-                    higher_ranks = [r for r in sorted_ranks if r['required_xp'] > current_rank['required_xp']]
-                    if higher_ranks:
-                        next_rank = min(higher_ranks, key=lambda x: x['required_xp'])
-                else:
-                    if sorted_ranks:
-                        next_rank = sorted_ranks[0]
+                # Find current and next rank
+                current_rank = ladder.current_rank(target)
+                next_rank = ladder.next_rank(current_rank)
 
                 # Current Rank Display
                 if current_rank:
@@ -1722,11 +1716,8 @@ class ActivityTrackingLogic:
                         )
                 elif current_rank:
                     # Check for prestige eligibility
-                    prestige_enabled = await self.config.guild(ctx.guild).at_prestige_enabled()
-                    if prestige_enabled:
-                        max_rank = max(military_ranks, key=lambda x: x.get('required_xp', 0))
-                        max_required_xp = int(max_rank.get('required_xp', 0) * xp_multiplier)
-                        prestige_threshold = max_required_xp * 1.5
+                    if settings.prestige_enabled:
+                        prestige_threshold = ladder.max_required_xp * 1.5
                         
                         if total_xp >= prestige_threshold:
                             embed.add_field(
@@ -1772,36 +1763,18 @@ class ActivityTrackingLogic:
 
     async def leaderboard(self, ctx, page: int = 1):
         """Show XP leaderboard for the server."""
-        user_xp = await self.config.guild(ctx.guild).at_user_xp()
-        user_prestige = await self.config.guild(ctx.guild).at_user_prestige()
-        
-        if not user_xp:
+        total_users = await self.leaderboard_index.total(ctx.guild)
+        if not total_users:
             return await ctx.send("❌ No XP data found for this server.")
         
-        # Create leaderboard entries
-        leaderboard_data = []
-        for user_id, xp in user_xp.items():
-            member = ctx.guild.get_member(int(user_id))
-            if member and not member.bot:
-                prestige = user_prestige.get(user_id, 0)
-                # Calculate total "score" for sorting (prestige is worth a lot)
-                total_score = xp + (prestige * 100000)  # Prestige is worth 100k XP for sorting
-                leaderboard_data.append((member, xp, prestige, total_score))
-        
-        # Sort by total score (XP + prestige bonus)
-        leaderboard_data.sort(key=lambda x: x[3], reverse=True)
-        
-        if not leaderboard_data:
-            return await ctx.send("❌ No valid users found for leaderboard.")
-        
         # Pagination
         per_page = 10
-        total_pages = (len(leaderboard_data) + per_page - 1) // per_page
+        total_pages = (total_users + per_page - 1) // per_page
         page = max(1, min(page, total_pages))
         
         start_idx = (page - 1) * per_page
         end_idx = start_idx + per_page
-        page_data = leaderboard_data[start_idx:end_idx]
+        page_data = await self.leaderboard_index.page(ctx.guild, page, per_page)
         
         embed = discord.Embed(
             title="🏆 XP Leaderboard",
@@ -1809,7 +1782,7 @@ class ActivityTrackingLogic:
         )
         
         leaderboard_text = ""
-        for i, (member, xp, prestige, _) in enumerate(page_data, start_idx + 1):
+        for i, user_id, xp, prestige in page_data:
             # Medal emojis for top 3
             if i == 1:
                 medal = "🥇"
@@ -1820,17 +1793,19 @@ class ActivityTrackingLogic:
             else:
                 medal = f"**{i}.**"
             
+            member = ctx.guild.get_member(user_id)
+            name = member.display_name if member else f"User {user_id}"
             prestige_text = f" ⭐P{prestige}" if prestige > 0 else ""
-            leaderboard_text += f"{medal} {member.display_name}: **{xp:,} XP**{prestige_text}\n"
+            leaderboard_text += f"{medal} {name}: **{xp:,} XP**{prestige_text}\n"
         
         embed.description = leaderboard_text
-        embed.set_footer(text=f"Page {page}/{total_pages} • {len(leaderboard_data)} total users")
+        embed.set_footer(text=f"Page {page}/{total_pages} • {total_users} total users")
         
         # Add user's position if not on current page
-        user_position = next((i+1 for i, (member, _, _, _) in enumerate(leaderboard_data) if member.id == ctx.author.id), None)
+        user_position = await self.leaderboard_index.position(ctx.guild, ctx.author.id)
         if user_position and not (start_idx < user_position <= end_idx):
-            user_xp_val = user_xp.get(str(ctx.author.id), 0)
-            user_prestige_val = user_prestige.get(str(ctx.author.id), 0)
+            user_xp_val = await self._get_user_xp(ctx.guild, ctx.author.id)
+            user_prestige_val = await self._get_user_prestige(ctx.guild, ctx.author.id)
             prestige_text = f" ⭐P{user_prestige_val}" if user_prestige_val > 0 else ""
             embed.add_field(
                 name="Your Position",
@@ -1853,16 +1828,13 @@ class ActivityTrackingLogic:
             return await ctx.send("Operation cancelled.")
         
         # Reset XP but keep voice minutes and prestige
-        async with self.config.guild(ctx.guild).at_user_xp() as user_xp:
-            old_xp = user_xp.get(str(member.id), 0)
-            user_xp[str(member.id)] = 0
+        old_xp = await self.ledger.set(ctx.guild, "at_user_xp", member.id, 0)
+        await self.leaderboard_index.update(ctx.guild, member.id, 0, await self._get_user_prestige(ctx.guild, member.id))
+        self.role_reconciler.mark_dirty(ctx.guild.id, member.id)
         
         # Remove military ranks
-        military_ranks = await self.config.guild(ctx.guild).at_military_ranks()
-        roles_to_remove = []
-        for role_obj in member.roles:
-            if any(str(role_obj.id) == str(rank.get('discord_role_id')) for rank in military_ranks):
-                roles_to_remove.append(role_obj)
+        settings = await self.settings.get(ctx.guild)
+        roles_to_remove = settings.rank_ladder().held_roles(member)
         
         if roles_to_remove:
             try:
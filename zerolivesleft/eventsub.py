@@ -0,0 +1,375 @@
+# zerolivesleft/eventsub.py
+# Twitch EventSub webhook receiver: stream.online / stream.offline pushed to the Twitch cogs
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import re
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set, Tuple
+
+import discord
+from aiohttp import web
+from redbot.core import commands
+
+log = logging.getLogger("red.Elkz.zerolivesleft.eventsub")
+
+SUBSCRIPTION_TYPES = ("stream.online", "stream.offline")
+
+
+def compute_signature(secret: str, message_id: str, timestamp: str, body: bytes) -> str:
+    """``Twitch-Eventsub-Message-Signature`` for a message: HMAC-SHA256 over id + timestamp + raw body."""
+    mac = hmac.new(secret.encode("utf-8"), message_id.encode("utf-8") + timestamp.encode("utf-8") + body, hashlib.sha256)
+    return "sha256=" + mac.hexdigest()
+
+
+def _parse_timestamp(value: str) -> Optional[float]:
+    """Unix time of an RFC3339 EventSub timestamp (Twitch sends nanosecond precision)."""
+    match = re.match(r"(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.\d+)?Z?$", value or "")
+    if not match:
+        return None
+    return datetime.strptime(match.group(1), "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+
+
+class EventSubLogic:
+    """
+    Receives Twitch EventSub webhooks on the central web server and keeps the
+    subscriptions in line with what the Twitch cogs track.
+
+    Cogs declare the broadcaster IDs they care about with ``watch(owner, ids)``
+    and listen for ``on_twitch_stream_online(event, stream)`` and
+    ``on_twitch_stream_offline(event)``. While ``active`` is True they can drop
+    their polling to a slow reconciliation pass.
+    """
+
+    ROUTE = "/twitch/eventsub"
+    MESSAGE_MAX_AGE = 600        # Twitch: reject messages older than 10 minutes
+    SYNC_INTERVAL = 3600         # re-check subscriptions hourly even without changes
+    PRUNE_INTERVAL = 3600        # unwanted subscriptions are only deleted this long after startup / the last prune
+    FALLBACK_POLL_INTERVAL = 900 # suggested polling interval for cogs while EventSub is active
+
+    def __init__(self, cog):
+        self.cog = cog
+        self.bot = cog.bot
+        self.config = cog.config
+
+        self.config.register_global(
+            es_callback_url=None,   # Public https URL that reaches ROUTE on this web server
+            es_secret=None,         # HMAC secret shared with Twitch, generated on first use
+        )
+
+        self._seen: "OrderedDict[str, float]" = OrderedDict()  # message id -> received unix time
+        self._watchers: Dict[str, Set[str]] = {}                # owner -> broadcaster user ids
+        self._subscriptions: Dict[Tuple[str, str], str] = {}    # (type, broadcaster id) -> subscription id
+        self._secret: Optional[str] = None
+        self._sync_wanted = asyncio.Event()
+        self._sync_task = None
+        self._last_prune = time.monotonic()
+        self.active = False
+
+        self.metrics = {
+            "notifications": 0,
+            "duplicates": 0,
+            "rejected": 0,
+            "revocations": 0,
+            "syncs": 0,
+            "last_notification": None,  # unix time
+            "last_sync": None,          # unix time
+            "last_sync_error": None,
+        }
+
+    # --- LIFECYCLE ---
+
+    def register_routes(self, web_app):
+        web_app.router.add_post(self.ROUTE, self.handle_eventsub)
+        log.info("EventSub route registered")
+
+    def start_tasks(self):
+        if not self._sync_task or self._sync_task.done():
+            # Watchers report gradually after a restart; give them a full interval before pruning
+            self._last_prune = time.monotonic()
+            self._sync_task = self.bot.loop.create_task(self._sync_loop())
+
+    def stop_tasks(self):
+        if self._sync_task:
+            self._sync_task.cancel()
+
+    async def _sync_loop(self):
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._sync_wanted.wait(), timeout=self.SYNC_INTERVAL)
+                    # Let a burst of watch() calls from several cogs settle into one sync
+                    await asyncio.sleep(5)
+                except asyncio.TimeoutError:
+                    pass
+                self._sync_wanted.clear()
+                await self.sync_subscriptions(prune=self._prune_due())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics["last_sync_error"] = str(e)
+                log.exception(f"EventSub: Error syncing subscriptions: {e}")
+                await asyncio.sleep(60)
+
+    # --- SUBSCRIPTIONS ---
+
+    def watch(self, owner: str, broadcaster_ids):
+        """Declare the full set of broadcaster IDs ``owner`` wants events for."""
+        ids = {str(b) for b in broadcaster_ids if b}
+        if self._watchers.get(owner) != ids:
+            self._watchers[owner] = ids
+            self._sync_wanted.set()
+
+    def wanted(self) -> Set[Tuple[str, str]]:
+        ids = set().union(*self._watchers.values()) if self._watchers else set()
+        return {(sub_type, broadcaster_id) for broadcaster_id in ids for sub_type in SUBSCRIPTION_TYPES}
+
+    async def get_secret(self) -> str:
+        if self._secret is None:
+            self._secret = await self.config.es_secret()
+            if not self._secret:
+                self._secret = secrets.token_hex(32)
+                await self.config.es_secret.set(self._secret)
+        return self._secret
+
+    def _prune_due(self) -> bool:
+        return time.monotonic() - self._last_prune >= self.PRUNE_INTERVAL
+
+    async def sync_subscriptions(self, prune: bool = False) -> bool:
+        """
+        Create missing webhook subscriptions for our callback and delete broken ones. Returns success.
+
+        Subscriptions for broadcasters nobody currently wants are only deleted when ``prune``
+        is set. ``wanted()`` only covers the watchers that have reported so far, so pruning on
+        every sync would drop (and later re-verify) another cog's subscriptions after a restart.
+        """
+        callback = await self.config.es_callback_url()
+        helix = self.cog.helix
+        if not callback:
+            self.active = False
+            return False
+
+        existing: Dict[Tuple[str, str], str] = {}
+        stale = []
+        cursor = None
+        while True:
+            params = [("after", cursor)] if cursor else None
+            status, data = await helix.get("eventsub/subscriptions", params)
+            if status != 200 or data is None:
+                self.active = False
+                self.metrics["last_sync_error"] = f"list subscriptions returned {status}"
+                log.warning(f"EventSub: Could not list subscriptions ({status}).")
+                return False
+            for sub in data.get("data", []):
+                if sub.get("transport", {}).get("callback") != callback:
+                    continue
+                key = (sub["type"], str(sub.get("condition", {}).get("broadcaster_user_id")))
+                if sub["status"] in ("enabled", "webhook_callback_verification_pending") and key not in existing:
+                    existing[key] = sub["id"]
+                else:
+                    stale.append(sub["id"])  # failed, revoked or duplicate
+            cursor = data.get("pagination", {}).get("cursor")
+            if not cursor:
+                break
+
+        wanted = self.wanted()
+        for key in wanted - existing.keys():
+            sub_type, broadcaster_id = key
+            status, data = await helix.request("POST", "eventsub/subscriptions", json={
+                "type": sub_type,
+                "version": "1",
+                "condition": {"broadcaster_user_id": broadcaster_id},
+                "transport": {"method": "webhook", "callback": callback, "secret": await self.get_secret()},
+            })
+            if status == 202 and data and data.get("data"):
+                existing[key] = data["data"][0]["id"]
+            else:
+                log.warning(f"EventSub: Could not subscribe to {sub_type} for {broadcaster_id}: {status} {data}")
+
+        if prune:
+            for key in existing.keys() - wanted:
+                stale.append(existing.pop(key))
+            self._last_prune = time.monotonic()
+        for sub_id in stale:
+            await helix.request("DELETE", "eventsub/subscriptions", params={"id": sub_id})
+
+        self._subscriptions = existing
+        self.active = bool(wanted) and wanted <= existing.keys()
+        self.metrics["syncs"] += 1
+        self.metrics["last_sync"] = time.time()
+        self.metrics["last_sync_error"] = None
+        log.info(f"EventSub: {len(existing)}/{len(wanted)} subscriptions in place, removed {len(stale)}.")
+        return True
+
+    # --- WEBHOOK ---
+
+    def _is_duplicate(self, message_id: str) -> bool:
+        now = time.time()
+        while self._seen:
+            oldest_id, received = next(iter(self._seen.items()))
+            if now - received <= self.MESSAGE_MAX_AGE:
+                break
+            self._seen.pop(oldest_id)
+        if message_id in self._seen:
+            return True
+        self._seen[message_id] = now
+        return False
+
+    async def handle_eventsub(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        message_id = request.headers.get("Twitch-Eventsub-Message-Id")
+        timestamp = request.headers.get("Twitch-Eventsub-Message-Timestamp")
+        signature = request.headers.get("Twitch-Eventsub-Message-Signature")
+        message_type = request.headers.get("Twitch-Eventsub-Message-Type")
+        if not (message_id and timestamp and signature and message_type):
+            self.metrics["rejected"] += 1
+            return web.Response(status=400, text="Missing EventSub headers")
+
+        expected = compute_signature(await self.get_secret(), message_id, timestamp, body)
+        if not hmac.compare_digest(expected, signature):
+            self.metrics["rejected"] += 1
+            log.warning(f"EventSub: Rejected message {message_id} with a bad signature.")
+            return web.Response(status=403, text="Invalid signature")
+
+        sent_at = _parse_timestamp(timestamp)
+        if sent_at is None or abs(time.time() - sent_at) > self.MESSAGE_MAX_AGE:
+            self.metrics["rejected"] += 1
+            return web.Response(status=403, text="Stale message")
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return web.Response(status=400, text="Invalid JSON")
+        subscription = payload.get("subscription", {})
+
+        if message_type == "webhook_callback_verification":
+            log.info(f"EventSub: Verified {subscription.get('type')} subscription {subscription.get('id')}.")
+            return web.Response(text=payload.get("challenge", ""), content_type="text/plain")
+
+        # Twitch retries until it gets a 2xx, so a repeat is acknowledged but not acted on.
+        # Verification challenges are exempt: a resent one still needs the challenge back.
+        if message_type in ("notification", "revocation") and self._is_duplicate(message_id):
+            self.metrics["duplicates"] += 1
+            return web.Response(status=204)
+
+        if message_type == "revocation":
+            self.metrics["revocations"] += 1
+            key = (subscription.get("type"), str(subscription.get("condition", {}).get("broadcaster_user_id")))
+            self._subscriptions.pop(key, None)
+            self.active = False
+            self._sync_wanted.set()
+            log.warning(f"EventSub: Subscription {subscription.get('id')} revoked ({subscription.get('status')}).")
+            return web.Response(status=204)
+
+        if message_type == "notification":
+            self.metrics["notifications"] += 1
+            self.metrics["last_notification"] = time.time()
+            # Answer Twitch straight away; the announcement work happens in the background
+            self.bot.loop.create_task(self._dispatch(subscription.get("type"), payload.get("event", {})))
+            return web.Response(status=204)
+
+        return web.Response(status=204)
+
+    async def _dispatch(self, sub_type: str, event: dict):
+        login = event.get("broadcaster_user_login")
+        broadcaster_id = event.get("broadcaster_user_id")
+        if not login:
+            return
+        registry = self.cog.live_status
+
+        if sub_type == "stream.offline":
+            registry.update_from_twitch(login, None, twitch_user_id=broadcaster_id)
+            self.bot.dispatch("twitch_stream_offline", event)
+            return
+
+        if sub_type == "stream.online":
+            # The notification has no title or game; Helix can lag the event by a few seconds
+            stream = None
+            for delay in (0, 5, 15):
+                await asyncio.sleep(delay)
+                status, data = await self.cog.helix.get("streams", {"user_id": broadcaster_id})
+                if status == 200 and data and data.get("data"):
+                    stream = data["data"][0]
+                    break
+            if stream is not None:
+                registry.update_from_twitch(login, stream, twitch_user_id=broadcaster_id)
+            self.bot.dispatch("twitch_stream_online", event, stream)
+
+    # --- COMMANDS ---
+
+    async def set_callback_url(self, ctx: commands.Context, url: str = None):
+        if url and not url.startswith("https://"):
+            await ctx.send("❌ Twitch only delivers EventSub webhooks to https:// URLs on port 443.")
+            return
+        await self.config.es_callback_url.set(url)
+        self._sync_wanted.set()
+        if url:
+            await ctx.send(f"✅ EventSub callback set to `{url}`. It must reach `{self.ROUTE}` on this bot's web server.")
+        else:
+            self.active = False
+            await ctx.send("✅ EventSub callback cleared. The Twitch cogs will poll at their normal rate.")
+
+    async def force_sync(self, ctx: commands.Context):
+        async with ctx.typing():
+            ok = await self.sync_subscriptions(prune=self._prune_due())
+        if ok:
+            await ctx.send(f"✅ {len(self._subscriptions)} subscriptions in place for {len(self.wanted()) // len(SUBSCRIPTION_TYPES)} broadcasters.")
+        else:
+            await ctx.send(f"❌ Sync failed: {self.metrics['last_sync_error'] or 'no callback URL set'}")
+
+    async def show_status(self, ctx: commands.Context):
+        callback = await self.config.es_callback_url()
+        embed = discord.Embed(title="Twitch EventSub", color=discord.Color.green() if self.active else discord.Color.orange())
+        embed.add_field(name="Callback", value=f"`{callback}`" if callback else "Not set", inline=False)
+        embed.add_field(name="Active", value="Yes" if self.active else "No (cogs are polling)", inline=True)
+        embed.add_field(name="Subscriptions", value=f"{len(self._subscriptions)}/{len(self.wanted())}", inline=True)
+        embed.add_field(name="Watchers", value=", ".join(f"{o}: {len(ids)}" for o, ids in self._watchers.items()) or "None", inline=False)
+        last = self.metrics["last_notification"]
+        last_sync = self.metrics["last_sync"]
+        embed.add_field(
+            name="Messages",
+            value=(
+                f"Notifications: {self.metrics['notifications']}\n"
+                f"Duplicates: {self.metrics['duplicates']}\n"
+                f"Rejected: {self.metrics['rejected']}\n"
+                f"Revocations: {self.metrics['revocations']}\n"
+                f"Last: {f'<t:{int(last)}:R>' if last else 'Never'}"
+            ),
+            inline=True,
+        )
+        embed.add_field(
+            name="Sync",
+            value=(
+                f"Runs: {self.metrics['syncs']}\n"
+                f"Last: {f'<t:{int(last_sync)}:R>' if last_sync else 'Never'}\n"
+                f"Error: {self.metrics['last_sync_error'] or 'None'}"
+            ),
+            inline=True,
+        )
+        await ctx.send(embed=embed)
+
+    async def send_fake(self, ctx: commands.Context, sub_type: str, login: str):
+        """Sign and post a fake notification to our own web server, exercising the full receive path."""
+        from .eventsub_fake import send_fake_event
+
+        sub_type = {"online": "stream.online", "offline": "stream.offline"}.get(sub_type, sub_type)
+        if sub_type not in SUBSCRIPTION_TYPES:
+            await ctx.send("❌ Type must be one of: online, offline.")
+            return
+        status, data = await self.cog.helix.get("users", {"login": login})
+        user = (data or {}).get("data") or [{"id": "0", "login": login.lower(), "display_name": login}]
+        port = await self.config.webserver_port()
+        url = f"http://127.0.0.1:{port}{self.ROUTE}"
+        status = await send_fake_event(
+            url, await self.get_secret(), sub_type,
+            broadcaster_id=user[0]["id"], login=user[0]["login"], display_name=user[0].get("display_name"),
+            session=self.cog.session,
+        )
+        await ctx.send(f"Sent fake `{sub_type}` for `{user[0]['login']}` to `{url}`: HTTP {status}")
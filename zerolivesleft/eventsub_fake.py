@@ -0,0 +1,99 @@
+# zerolivesleft/eventsub_fake.py
+# Local fake EventSub sender for exercising the webhook receiver without Twitch
+#
+# Standalone (no Red imports), so it also works from a shell:
+#   python eventsub_fake.py --url http://127.0.0.1:8080/twitch/eventsub --secret <es_secret> online somestreamer
+# Inside the bot: [p]zll webserver eventsub fake online somestreamer (or [p]zll ws es fake ...)
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+import aiohttp
+
+
+def build_message(secret: str, message_type: str, sub_type: str, broadcaster_id: str, login: str,
+                  display_name: Optional[str] = None, message_id: Optional[str] = None,
+                  timestamp: Optional[str] = None) -> Tuple[dict, bytes]:
+    """Headers and body of a signed EventSub webhook message, shaped like Twitch's."""
+    message_id = message_id or str(uuid.uuid4())
+    timestamp = timestamp or datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f000Z")
+    subscription = {
+        "id": str(uuid.uuid4()),
+        "status": "webhook_callback_verification_pending" if message_type == "webhook_callback_verification" else "enabled",
+        "type": sub_type,
+        "version": "1",
+        "cost": 0,
+        "condition": {"broadcaster_user_id": broadcaster_id},
+        "transport": {"method": "webhook", "callback": "https://example.invalid/twitch/eventsub"},
+        "created_at": timestamp,
+    }
+    payload = {"subscription": subscription}
+    if message_type == "webhook_callback_verification":
+        payload["challenge"] = uuid.uuid4().hex
+    elif message_type == "notification":
+        event = {
+            "broadcaster_user_id": broadcaster_id,
+            "broadcaster_user_login": login.lower(),
+            "broadcaster_user_name": display_name or login,
+        }
+        if sub_type == "stream.online":
+            event.update(id=str(uuid.uuid4().int)[:11], type="live", started_at=timestamp)
+        payload["event"] = event
+
+    body = json.dumps(payload).encode("utf-8")
+    mac = hmac.new(secret.encode("utf-8"), message_id.encode("utf-8") + timestamp.encode("utf-8") + body, hashlib.sha256)
+    headers = {
+        "Content-Type": "application/json",
+        "Twitch-Eventsub-Message-Id": message_id,
+        "Twitch-Eventsub-Message-Retry": "0",
+        "Twitch-Eventsub-Message-Type": message_type,
+        "Twitch-Eventsub-Message-Signature": "sha256=" + mac.hexdigest(),
+        "Twitch-Eventsub-Message-Timestamp": timestamp,
+        "Twitch-Eventsub-Subscription-Type": sub_type,
+        "Twitch-Eventsub-Subscription-Version": "1",
+    }
+    return headers, body
+
+
+async def send_fake_event(url: str, secret: str, sub_type: str, broadcaster_id: str, login: str,
+                          display_name: Optional[str] = None, message_type: str = "notification",
+                          message_id: Optional[str] = None, session: Optional[aiohttp.ClientSession] = None) -> int:
+    """POST one fake message to ``url`` and return the HTTP status."""
+    headers, body = build_message(secret, message_type, sub_type, broadcaster_id, login, display_name, message_id)
+    own_session = session is None
+    session = session or aiohttp.ClientSession()
+    try:
+        async with session.post(url, data=body, headers=headers) as resp:
+            return resp.status
+    finally:
+        if own_session:
+            await session.close()
+
+
+async def _main(args):
+    sub_type = {"online": "stream.online", "offline": "stream.offline"}[args.event]
+    message_id = str(uuid.uuid4())
+    for _ in range(args.repeat):
+        # Repeats reuse the message id, as Twitch does on retries, so they should be deduplicated
+        status = await send_fake_event(args.url, args.secret, sub_type, args.broadcaster_id, args.login,
+                                       message_type=args.message_type, message_id=message_id)
+        print(f"{args.message_type} {sub_type} {args.login} -> HTTP {status}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a signed fake Twitch EventSub message.")
+    parser.add_argument("event", choices=["online", "offline"])
+    parser.add_argument("login")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/twitch/eventsub")
+    parser.add_argument("--secret", required=True, help="es_secret from the Zerolivesleft config")
+    parser.add_argument("--broadcaster-id", default="0")
+    parser.add_argument("--message-type", default="notification",
+                        choices=["notification", "webhook_callback_verification", "revocation"])
+    parser.add_argument("--repeat", type=int, default=1)
+    asyncio.run(_main(parser.parse_args()))
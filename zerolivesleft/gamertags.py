@@ -34,6 +34,34 @@ class GamertagsLogic:
         }
         self.config.register_user(**default_user)
 
+        # user_id -> gamertags, loaded once from config.all_users()
+        self._gamertag_cache: Optional[Dict[int, Dict[str, str]]] = None
+        self._cache_lock = asyncio.Lock()
+        self.cache_version = 0  # Bumped on every edit so dependent caches can tell they're stale
+
+    async def get_all_gamertags(self) -> Dict[int, Dict[str, str]]:
+        """Return every user's gamertags from the in-memory cache. Treat as read-only."""
+        if self._gamertag_cache is None:
+            async with self._cache_lock:
+                if self._gamertag_cache is None:
+                    all_users = await self.config.all_users()
+                    self._gamertag_cache = {
+                        user_id: data.get("gamertags") or {}
+                        for user_id, data in all_users.items()
+                        if data.get("gamertags")
+                    }
+                    log.info(f"Loaded gamertag cache for {len(self._gamertag_cache)} users.")
+        return self._gamertag_cache
+
+    def _update_cache(self, user_id: int, gamertags: Optional[Dict[str, str]]):
+        """Keep the cache in sync after an edit."""
+        if self._gamertag_cache is not None:
+            if gamertags:
+                self._gamertag_cache[user_id] = dict(gamertags)
+            else:
+                self._gamertag_cache.pop(user_id, None)
+        self.cache_version += 1
+
     async def find_user(self, ctx: commands.Context, user_input: str) -> Optional[Union[discord.User, discord.Member]]:
         """
         Enhanced user finding that handles various input formats:
@@ -245,6 +273,7 @@ class GamertagsLogic:
         # Save all gamertags to config
         if gamertags:
             await self.config.user(user).gamertags.set(gamertags)
+            self._update_cache(user.id, gamertags)
 
             # Send completion summary
             summary_embed = discord.Embed(
@@ -400,6 +429,7 @@ class GamertagsLogic:
             if str(reaction.emoji) == "✅":
                 # Clear gamertags
                 await self.config.user(user).gamertags.clear()
+                self._update_cache(user.id, None)
 
                 success_embed = discord.Embed(
                     title="🗑️ Gamertags Cleared",
@@ -0,0 +1,125 @@
+# zerolivesleft/guild_settings.py
+# Cached per-guild XP settings snapshot for the activity tracking hot paths
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from .rank_ladder import RankLadder
+
+log = logging.getLogger("red.Elkz.zerolivesleft.guild_settings")
+
+
+@dataclass(frozen=True)
+class XPSettings:
+    """Immutable snapshot of one guild's XP settings."""
+
+    voice_xp_rate: int
+    message_xp: int
+    reaction_xp: int
+    voice_join_xp: int
+    message_cooldown: int
+    base_role_ids: FrozenSet[int]
+    recruit_role_id: Optional[int]
+    member_role_id: Optional[int]
+    promotion_threshold_xp: int
+    promotion_channel_id: Optional[int]
+    military_ranks: Tuple[dict, ...]
+    prestige_enabled: bool
+    prestige_multiplier: float
+    api_url: Optional[str]
+    api_key: Optional[str]
+    promotion_update_url: Optional[str]
+    military_rank_update_url: Optional[str]
+    voice_exclude_afk: bool
+    voice_exclude_solo: bool
+    voice_excluded_channel_ids: FrozenSet[int]
+    loaded_at: float
+    _ladders: Dict[float, RankLadder] = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def from_config(cls, data: dict) -> "XPSettings":
+        return cls(
+            voice_xp_rate=data.get("at_voice_xp_rate", 1),
+            message_xp=data.get("at_message_xp", 3),
+            reaction_xp=data.get("at_reaction_xp", 1),
+            voice_join_xp=data.get("at_voice_join_xp", 5),
+            message_cooldown=data.get("at_message_cooldown", 60),
+            base_role_ids=frozenset(int(r) for r in data.get("at_base_role_ids") or []),
+            recruit_role_id=data.get("at_recruit_role_id"),
+            member_role_id=data.get("at_member_role_id"),
+            promotion_threshold_xp=data.get("at_promotion_threshold_xp", 0),
+            promotion_channel_id=data.get("at_promotion_channel_id"),
+            military_ranks=tuple(data.get("at_military_ranks") or []),
+            prestige_enabled=data.get("at_prestige_enabled", False),
+            prestige_multiplier=data.get("at_prestige_multiplier", 0.5),
+            api_url=data.get("at_api_url"),
+            api_key=data.get("at_api_key"),
+            promotion_update_url=data.get("at_promotion_update_url"),
+            military_rank_update_url=data.get("at_military_rank_update_url"),
+            voice_exclude_afk=data.get("at_voice_exclude_afk", True),
+            voice_exclude_solo=data.get("at_voice_exclude_solo", False),
+            voice_excluded_channel_ids=frozenset(int(c) for c in data.get("at_voice_excluded_channel_ids") or []),
+            loaded_at=time.monotonic(),
+        )
+
+    def rank_ladder(self, xp_multiplier: float = 1) -> RankLadder:
+        """Compiled rank ladder for a prestige multiplier, built on first use."""
+        ladder = self._ladders.get(xp_multiplier)
+        if ladder is None:
+            ladder = self._ladders[xp_multiplier] = RankLadder(self.military_ranks, xp_multiplier)
+        return ladder
+
+    def xp_multiplier(self, prestige_level: int) -> float:
+        """XP requirement multiplier for a prestige level."""
+        return 1 + (prestige_level * self.prestige_multiplier) if self.prestige_enabled else 1
+
+
+class GuildSettingsCache:
+    """
+    Keeps one XPSettings snapshot per guild in memory.
+
+    Setter commands call ``invalidate()`` after writing to Config. Snapshots
+    are also reloaded after ``ttl`` seconds so edits made outside the cog
+    are picked up eventually.
+    """
+
+    def __init__(self, config, ttl: int = 300):
+        self.config = config
+        self.ttl = ttl
+        self._cache: Dict[int, XPSettings] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self.hits = 0
+        self.loads = 0
+
+    async def get(self, guild) -> XPSettings:
+        return await self.get_by_id(guild.id)
+
+    async def get_by_id(self, guild_id: int) -> XPSettings:
+        settings = self._cache.get(guild_id)
+        if settings is not None and time.monotonic() - settings.loaded_at < self.ttl:
+            self.hits += 1
+            return settings
+
+        lock = self._locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            settings = self._cache.get(guild_id)
+            if settings is None or time.monotonic() - settings.loaded_at >= self.ttl:
+                data = await self.config.guild_from_id(guild_id).all()
+                old_settings, settings = settings, XPSettings.from_config(data)
+                if old_settings is not None and old_settings.military_ranks == settings.military_ranks:
+                    # Ranks did not change, keep the compiled ladders
+                    settings._ladders.update(old_settings._ladders)
+                self._cache[guild_id] = settings
+                self.loads += 1
+            return settings
+
+    def invalidate(self, guild_id: Optional[int] = None):
+        """Drop the cached snapshot for one guild, or for every guild."""
+        if guild_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(guild_id, None)
+        log.debug(f"GuildSettingsCache: Invalidated settings for {guild_id or 'all guilds'}.")
@@ -0,0 +1,118 @@
+# zerolivesleft/leaderboard_index.py
+# Incrementally maintained XP leaderboard ranking per guild
+
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+
+class _GuildBoard:
+    """Sorted ranking for one guild. Keys sort best-first: (-prestige, -xp, user_id)."""
+
+    __slots__ = ("keys", "by_user", "complete")
+
+    def __init__(self, complete: bool = True):
+        self.keys: List[Tuple[int, int, int]] = []
+        self.by_user: Dict[int, Tuple[int, int, int]] = {}
+        self.complete = complete  # False if built before the guild's member cache was filled
+
+    def discard(self, user_id: int):
+        key = self.by_user.pop(user_id, None)
+        if key is not None:
+            idx = bisect_left(self.keys, key)
+            if idx < len(self.keys) and self.keys[idx] == key:
+                del self.keys[idx]
+
+    def update(self, user_id: int, xp: int, prestige: int):
+        key = (-prestige, -xp, user_id)
+        if self.by_user.get(user_id) == key:
+            return
+        self.discard(user_id)
+        self.by_user[user_id] = key
+        insort(self.keys, key)
+
+
+class LeaderboardIndex:
+    """
+    Ranked (prestige, XP) index for each guild's leaderboard.
+
+    Each guild's board is built once from the activity ledger, then kept up
+    to date as XP and prestige change, so a page or a user's position is a
+    bisect plus a slice instead of a sort of the whole population.
+
+    Only current non-bot members are ranked. A board built before the guild
+    is chunked is rebuilt on first use afterwards, and members who rejoin are
+    put back by ``add_member``.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self._boards: Dict[int, _GuildBoard] = {}
+
+    async def _board(self, guild) -> _GuildBoard:
+        board = self._boards.get(guild.id)
+        if board is not None and (board.complete or not guild.chunked):
+            return board
+
+        user_xp = await self.ledger.get_all(guild, "at_user_xp")
+        user_prestige = await self.ledger.get_all(guild, "at_user_prestige")
+        board = _GuildBoard(complete=guild.chunked)
+        keys = []
+        for user_id_str, xp in user_xp.items():
+            member = guild.get_member(int(user_id_str))
+            if not member or member.bot:
+                continue
+            key = (-user_prestige.get(user_id_str, 0), -xp, member.id)
+            board.by_user[member.id] = key
+            keys.append(key)
+        keys.sort()
+        board.keys = keys
+        self._boards[guild.id] = board
+        return board
+
+    async def update(self, guild, user_id: int, xp: int, prestige: int):
+        """Record a user's new XP/prestige."""
+        board = await self._board(guild)
+        board.update(int(user_id), xp, prestige)
+
+    async def add_member(self, guild, member):
+        """Rank a member who (re)joined, if they have XP on record."""
+        if member.bot or guild.id not in self._boards:
+            return  # Boards not built yet will pick them up when they are
+        user_xp = await self.ledger.get_all(guild, "at_user_xp")
+        user_id_str = str(member.id)
+        if user_id_str in user_xp:
+            prestige = (await self.ledger.get_all(guild, "at_user_prestige")).get(user_id_str, 0)
+            self._boards[guild.id].update(member.id, user_xp[user_id_str], prestige)
+
+    def remove(self, guild_id: int, user_id: int):
+        """Drop a user (e.g. when they leave the guild)."""
+        board = self._boards.get(guild_id)
+        if board is not None:
+            board.discard(int(user_id))
+
+    def invalidate(self, guild_id: Optional[int] = None):
+        """Forget a guild's board (or all boards) so it is rebuilt on next use."""
+        if guild_id is None:
+            self._boards.clear()
+        else:
+            self._boards.pop(guild_id, None)
+
+    async def total(self, guild) -> int:
+        return len((await self._board(guild)).keys)
+
+    async def page(self, guild, page: int, per_page: int = 10) -> List[Tuple[int, int, int, int]]:
+        """Return ``(position, user_id, xp, prestige)`` rows for a 1-based page."""
+        board = await self._board(guild)
+        start = (page - 1) * per_page
+        return [
+            (start + i + 1, user_id, -neg_xp, -neg_prestige)
+            for i, (neg_prestige, neg_xp, user_id) in enumerate(board.keys[start:start + per_page])
+        ]
+
+    async def position(self, guild, user_id: int) -> Optional[int]:
+        """1-based leaderboard position of a user, or None if not ranked."""
+        board = await self._board(guild)
+        key = board.by_user.get(int(user_id))
+        if key is None:
+            return None
+        return bisect_left(board.keys, key) + 1
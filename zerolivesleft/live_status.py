@@ -0,0 +1,169 @@
+# zerolivesleft/live_status.py
+# Shared in-process registry of who is live on Twitch, fed by presences and Helix polling
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import discord
+
+log = logging.getLogger("red.Elkz.zerolivesleft.live_status")
+
+
+@dataclass
+class LiveStatus:
+    """Last known live state for one streamer."""
+
+    is_live: bool
+    source: str                      # "presence" or "twitch"
+    updated_at: float                # unix time of the last report
+    changed_at: float                # unix time is_live last flipped (0 if first seen offline)
+    discord_id: Optional[int] = None
+    twitch_login: Optional[str] = None
+    url: Optional[str] = None
+    title: Optional[str] = None
+    game: Optional[str] = None
+    started_at: Optional[str] = None
+    stream: Optional[dict] = None    # raw /helix/streams entry when polled live
+
+    def age(self) -> float:
+        return time.time() - self.updated_at
+
+
+class LiveStatusRegistry:
+    """
+    One place to ask "is this person live?".
+
+    Discord presence updates report by member, Twitch polling reports by
+    login. Each is kept in its own dict, and a member is linked to a login
+    whenever either side tells us both (a Streaming activity's
+    ``twitch_name`` or a streamer configured with a Discord member). Lookups
+    are dict reads; of two linked records, the one that changed most
+    recently wins.
+
+    Other cogs reach this through ``bot.get_cog("Zerolivesleft").live_status``.
+    """
+
+    def __init__(self):
+        self._by_discord: Dict[int, LiveStatus] = {}
+        self._by_login: Dict[str, LiveStatus] = {}
+        self._login_for_discord: Dict[int, str] = {}
+        self._login_for_twitch_id: Dict[str, str] = {}
+        self.version = 0  # bumped whenever anyone goes live or offline
+        self.presence_updates = 0
+        self.twitch_updates = 0
+
+    # --- FEEDS ---
+
+    def update_from_member(self, member) -> LiveStatus:
+        """Record a member's current presence (call from on_presence_update)."""
+        streaming = next((a for a in member.activities if isinstance(a, discord.Streaming)), None)
+        login = getattr(streaming, "twitch_name", None) if streaming else None
+        if login:
+            self.link(member.id, login)
+
+        self.presence_updates += 1
+        return self._store(
+            self._by_discord, member.id, streaming is not None, "presence",
+            discord_id=member.id,
+            twitch_login=login.lower() if login else self._login_for_discord.get(member.id),
+            url=streaming.url if streaming else None,
+            title=streaming.name if streaming else None,
+            game=getattr(streaming, "game", None) if streaming else None,
+        )
+
+    def update_from_twitch(self, login: str, stream: Optional[dict], discord_id: Optional[int] = None,
+                           twitch_user_id: Optional[str] = None) -> LiveStatus:
+        """Record a Helix poll result. ``stream`` is the entry from /helix/streams, or None if offline."""
+        login = login.lower()
+        if discord_id:
+            self.link(int(discord_id), login)
+        twitch_user_id = twitch_user_id or (stream or {}).get("user_id")
+        if twitch_user_id:
+            self._login_for_twitch_id[str(twitch_user_id)] = login
+
+        self.twitch_updates += 1
+        return self._store(
+            self._by_login, login, stream is not None, "twitch",
+            discord_id=int(discord_id) if discord_id else None,
+            twitch_login=login,
+            url=f"https://www.twitch.tv/{login}",
+            title=stream.get("title") if stream else None,
+            game=stream.get("game_name") if stream else None,
+            started_at=stream.get("started_at") if stream else None,
+            stream=stream,
+        )
+
+    def link(self, discord_id: int, login: str):
+        """Remember which Twitch login belongs to a Discord member."""
+        self._login_for_discord[discord_id] = login.lower()
+
+    def forget_member(self, discord_id: int):
+        self._by_discord.pop(discord_id, None)
+        self._login_for_discord.pop(discord_id, None)
+
+    def _store(self, table: dict, key, is_live: bool, source: str, **fields) -> LiveStatus:
+        now = time.time()
+        previous = table.get(key)
+        if previous is None:
+            changed_at = now if is_live else 0
+        elif previous.is_live == is_live:
+            changed_at = previous.changed_at
+        else:
+            changed_at = now
+        status = table[key] = LiveStatus(is_live=is_live, source=source, updated_at=now, changed_at=changed_at, **fields)
+        if previous is None or previous.is_live != is_live:
+            self.version += 1
+            log.debug(f"LiveStatus: {source} reports {key} is now {'live' if is_live else 'offline'}.")
+        return status
+
+    # --- LOOKUPS ---
+
+    def for_member(self, member) -> Optional[LiveStatus]:
+        """Freshest known status for a member, seeding from their presence on first sight."""
+        presence = self._by_discord.get(member.id)
+        if presence is None:
+            presence = self.update_from_member(member)
+        login = self._login_for_discord.get(member.id)
+        polled = self._by_login.get(login) if login else None
+        if polled is None or presence.changed_at >= polled.changed_at:
+            return presence
+        return polled
+
+    def for_login(self, login: str, max_age: Optional[float] = None) -> Optional[LiveStatus]:
+        """Last Twitch-polled status for a login, or None if unknown or older than ``max_age`` seconds."""
+        status = self._by_login.get(login.lower())
+        if status is None or (max_age is not None and status.age() > max_age):
+            return None
+        return status
+
+    def for_twitch_id(self, twitch_user_id: str, max_age: Optional[float] = None) -> Optional[LiveStatus]:
+        login = self._login_for_twitch_id.get(str(twitch_user_id))
+        return self.for_login(login, max_age) if login else None
+
+    def is_member_live(self, member) -> bool:
+        status = self.for_member(member)
+        return bool(status and status.is_live)
+
+    def live_members(self) -> Dict[int, LiveStatus]:
+        """Every Discord member currently known to be live."""
+        live = {uid: s for uid, s in self._by_discord.items() if s.is_live}
+        for uid, login in self._login_for_discord.items():
+            polled = self._by_login.get(login)
+            current = self._by_discord.get(uid)
+            if polled and (current is None or polled.changed_at > current.changed_at):
+                if polled.is_live:
+                    live[uid] = polled
+                else:
+                    live.pop(uid, None)
+        return live
+
+    def stats(self) -> dict:
+        return {
+            "members": len(self._by_discord),
+            "logins": len(self._by_login),
+            "live": len(self.live_members()),
+            "presence_updates": self.presence_updates,
+            "twitch_updates": self.twitch_updates,
+        }
@@ -0,0 +1,56 @@
+# zerolivesleft/rank_ladder.py
+# Precompiled military rank ladder for promotion and status lookups
+
+from bisect import bisect_left, bisect_right
+from typing import Dict, FrozenSet, List, Optional
+
+
+class RankLadder:
+    """
+    Military ranks compiled for one prestige multiplier.
+
+    Ranks are sorted once by required XP so the highest eligible rank is a
+    bisect over the adjusted thresholds, and rank role IDs are held as a set
+    of ints so checking a member's roles needs no string conversion.
+    """
+
+    def __init__(self, military_ranks, xp_multiplier: float = 1):
+        ranks = [r for r in military_ranks if r.get("discord_role_id") and isinstance(r.get("required_xp", 0), (int, float))]
+        ranks.sort(key=lambda r: r.get("required_xp", 0))
+
+        self.xp_multiplier = xp_multiplier
+        self.ranks: List[dict] = ranks
+        self.base_thresholds: List[int] = [r.get("required_xp", 0) for r in ranks]
+        self.thresholds: List[int] = [int(xp * xp_multiplier) for xp in self.base_thresholds]
+        self.rank_by_role_id: Dict[int, dict] = {int(r["discord_role_id"]): r for r in ranks}
+        self.role_ids: FrozenSet[int] = frozenset(self.rank_by_role_id)
+        self.max_required_xp: int = self.thresholds[-1] if self.thresholds else 0
+
+    def __bool__(self):
+        return bool(self.ranks)
+
+    def highest_eligible(self, total_xp: int) -> Optional[dict]:
+        """Return the highest rank the XP total qualifies for, or None."""
+        idx = bisect_right(self.thresholds, total_xp)
+        return self.ranks[idx - 1] if idx else None
+
+    def next_rank(self, current_rank: Optional[dict]) -> Optional[dict]:
+        """Return the first rank above ``current_rank`` (or the lowest rank if None)."""
+        if current_rank is None:
+            return self.ranks[0] if self.ranks else None
+        idx = bisect_right(self.base_thresholds, current_rank.get("required_xp", 0))
+        return self.ranks[idx] if idx < len(self.ranks) else None
+
+    def adjusted_xp(self, rank: dict) -> int:
+        """Required XP for a rank after the prestige multiplier."""
+        idx = bisect_left(self.base_thresholds, rank.get("required_xp", 0))
+        return self.thresholds[idx] if idx < len(self.thresholds) else int(rank.get("required_xp", 0) * self.xp_multiplier)
+
+    def held_roles(self, member) -> list:
+        """Member roles that are military rank roles."""
+        return [role for role in member.roles if role.id in self.role_ids]
+
+    def current_rank(self, member) -> Optional[dict]:
+        """Highest rank the member currently holds a role for."""
+        held = [self.rank_by_role_id[role.id] for role in member.roles if role.id in self.role_ids]
+        return max(held, key=lambda r: r.get("required_xp", 0)) if held else None
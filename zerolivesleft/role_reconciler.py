@@ -0,0 +1,133 @@
+# zerolivesleft/role_reconciler.py
+# Delta-based reconciliation of XP promotion roles against the gateway member cache
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+log = logging.getLogger("red.Elkz.zerolivesleft.role_reconciler")
+
+
+class RoleReconciler:
+    """
+    Periodically makes members' rank roles match their XP.
+
+    Most passes are deltas: only members marked dirty (their XP or roles
+    changed outside the normal promotion path) are checked, read from the
+    gateway member cache. A full pass over every cached member runs on the
+    first pass, every ``full_interval`` seconds, and whenever the guild's
+    promotion settings fingerprint changes. Paging members over REST with
+    ``fetch_members`` is only used when the guild is not chunked.
+    """
+
+    def __init__(
+        self,
+        check_member: Callable[..., Awaitable[None]],
+        fingerprint: Optional[Callable[..., Awaitable[object]]] = None,
+        full_interval: int = 7 * 86400,
+        yield_every: int = 50,
+    ):
+        self.check_member = check_member    # async (guild, member) -> None
+        self.fingerprint = fingerprint      # async (guild) -> hashable snapshot of promotion settings
+        self.full_interval = full_interval
+        self.yield_every = yield_every
+
+        self._dirty: Dict[int, Set[int]] = {}
+        self._last_full: Dict[int, float] = {}
+        self._fingerprints: Dict[int, object] = {}
+        self._full_requested: Set[int] = set()
+        self._lock = asyncio.Lock()
+
+        self.metrics = {
+            "passes": 0,
+            "full_passes": 0,
+            "rest_passes": 0,
+            "total_changes": 0,
+            "last_mode": None,
+            "last_checked": 0,
+            "last_changes": 0,
+            "last_duration": 0.0,
+            "last_finished": None,   # unix time
+            "progress": None,        # {"mode", "checked", "total"} while a pass runs
+        }
+
+    def mark_dirty(self, guild_id: int, member_id: int):
+        """Queue a member for the next delta pass."""
+        self._dirty.setdefault(guild_id, set()).add(member_id)
+
+    def request_full(self, guild_id: int):
+        """Make the next pass for this guild a full one."""
+        self._full_requested.add(guild_id)
+
+    def dirty_count(self, guild_id: int) -> int:
+        return len(self._dirty.get(guild_id, ()))
+
+    async def _needs_full(self, guild) -> bool:
+        if guild.id in self._full_requested or guild.id not in self._last_full:
+            return True
+        if time.time() - self._last_full[guild.id] >= self.full_interval:
+            return True
+        if self.fingerprint is not None:
+            return await self.fingerprint(guild) != self._fingerprints.get(guild.id)
+        return False
+
+    async def run(self, guild) -> dict:
+        """Run one reconciliation pass for a guild and return its metrics."""
+        async with self._lock:
+            full = await self._needs_full(guild)
+            dirty = self._dirty.pop(guild.id, set())
+            started = time.monotonic()
+            mode = "full" if full else "delta"
+
+            if full:
+                self._full_requested.discard(guild.id)
+                if self.fingerprint is not None:
+                    self._fingerprints[guild.id] = await self.fingerprint(guild)
+                if guild.chunked:
+                    members = [m for m in guild.members if not m.bot]
+                else:
+                    mode = "rest"
+                    log.warning(f"RoleReconciler: Guild {guild.id} is not chunked, falling back to fetch_members.")
+                    members = [m async for m in guild.fetch_members(limit=None) if not m.bot]
+            else:
+                members = [m for m in map(guild.get_member, dirty) if m is not None and not m.bot]
+
+            progress = self.metrics["progress"] = {"mode": mode, "checked": 0, "total": len(members)}
+            changes = 0
+            for i, member in enumerate(members, 1):
+                initial_roles = {r.id for r in member.roles}
+                try:
+                    await self.check_member(guild, member)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log.exception(f"RoleReconciler: Error checking {member.id} in guild {guild.id}: {e}")
+                    self.mark_dirty(guild.id, member.id)
+                if initial_roles != {r.id for r in member.roles}:
+                    changes += 1
+                progress["checked"] = i
+                if i % self.yield_every == 0:
+                    await asyncio.sleep(0)
+
+            duration = time.monotonic() - started
+            if full:
+                self._last_full[guild.id] = time.time()
+                self.metrics["full_passes"] += 1
+                if mode == "rest":
+                    self.metrics["rest_passes"] += 1
+            self.metrics.update(
+                passes=self.metrics["passes"] + 1,
+                total_changes=self.metrics["total_changes"] + changes,
+                last_mode=mode,
+                last_checked=len(members),
+                last_changes=changes,
+                last_duration=duration,
+                last_finished=time.time(),
+                progress=None,
+            )
+            log.info(
+                f"RoleReconciler: {mode} pass for guild {guild.id} checked {len(members)} members, "
+                f"made {changes} role changes in {duration:.1f}s."
+            )
+            return dict(self.metrics)
@@ -0,0 +1,237 @@
+# zerolivesleft/twitch_helix.py
+# Shared, pooled Twitch Helix client used by all the Twitch cogs
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+
+import aiohttp
+
+log = logging.getLogger("red.Elkz.zerolivesleft.twitch_helix")
+
+HELIX_BASE = "https://api.twitch.tv/helix/"
+TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+
+Params = Union[Dict[str, Any], Iterable[Tuple[str, Any]], None]
+
+
+class HelixClient:
+    """
+    One Helix client for the whole bot.
+
+    - A single aiohttp session with a pooled keep-alive connector.
+    - One app access token (from ``[p]set api twitch``), refreshed once for
+      every caller and renewed on a 401.
+    - A token bucket seeded from Twitch's ``Ratelimit-Remaining`` and
+      ``Ratelimit-Reset`` headers: when the bucket is empty, callers wait
+      for the reset instead of collecting 429s.
+    - Identical GETs that are already in flight are coalesced, so two cogs
+      asking for the same user at once share one request.
+
+    ``get()`` and ``request()`` return ``(status, json)``. ``status`` is None
+    when the request could not be made at all (no credentials, network error).
+
+    Other cogs reach this through ``bot.get_cog("Zerolivesleft").helix``.
+    """
+
+    def __init__(self, bot, max_connections: int = 20, max_retries: int = 3):
+        self.bot = bot
+        self.max_retries = max_retries
+        self._connector_limit = max_connections
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        self.client_id: Optional[str] = None
+        self._client_secret: Optional[str] = None
+        self._token: Optional[str] = None
+        self._token_expires = 0.0
+        self._token_lock = asyncio.Lock()
+
+        # Token bucket state from the last response's Ratelimit-* headers
+        self._bucket_limit = 800
+        self._bucket_remaining = 800
+        self._bucket_reset = 0.0
+
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+        self.metrics = {
+            "requests": 0,
+            "coalesced": 0,
+            "retries": 0,
+            "throttled": 0,
+            "token_refreshes": 0,
+            "errors": 0,
+        }
+
+    # --- LIFECYCLE ---
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._connector_limit, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    # --- AUTH ---
+
+    async def _load_credentials(self) -> bool:
+        tokens = await self.bot.get_shared_api_tokens("twitch")
+        client_id, client_secret = tokens.get("client_id"), tokens.get("client_secret")
+        if (client_id, client_secret) != (self.client_id, self._client_secret):
+            # Credentials changed, the old token belongs to another app
+            self.client_id, self._client_secret = client_id, client_secret
+            self._token = None
+        return bool(client_id and client_secret)
+
+    async def get_token(self, force_refresh: bool = False) -> Optional[str]:
+        """The shared app access token, refreshed if missing or about to expire."""
+        if not force_refresh and self._token and time.time() < self._token_expires:
+            return self._token
+        async with self._token_lock:
+            if not force_refresh and self._token and time.time() < self._token_expires:
+                return self._token
+            if not await self._load_credentials():
+                log.warning("HelixClient: Twitch client_id/client_secret not set (use [p]set api twitch).")
+                return None
+            try:
+                async with self.session.post(TOKEN_URL, params={
+                    "client_id": self.client_id,
+                    "client_secret": self._client_secret,
+                    "grant_type": "client_credentials",
+                }) as resp:
+                    if resp.status != 200:
+                        log.error(f"HelixClient: Token request failed: {resp.status} - {await resp.text()}")
+                        return None
+                    data = await resp.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                log.error(f"HelixClient: Token request error: {e}")
+                return None
+            self._token = data["access_token"]
+            # Renew a minute early so in-flight requests don't race the expiry
+            self._token_expires = time.time() + data.get("expires_in", 3600) - 60
+            self.metrics["token_refreshes"] += 1
+            log.info("HelixClient: Refreshed Twitch app access token.")
+            return self._token
+
+    async def headers(self) -> Optional[Dict[str, str]]:
+        token = await self.get_token()
+        if not token:
+            return None
+        return {"Client-ID": self.client_id, "Authorization": f"Bearer {token}"}
+
+    # --- RATE LIMITING ---
+
+    async def _acquire(self):
+        """Take one request from the bucket, waiting for the reset if it is empty."""
+        while True:
+            now = time.time()
+            if now >= self._bucket_reset:
+                self._bucket_remaining = max(self._bucket_remaining, 1)
+            if self._bucket_remaining > 0:
+                self._bucket_remaining -= 1
+                return
+            self.metrics["throttled"] += 1
+            await asyncio.sleep(max(self._bucket_reset - now, 0.05))
+
+    def _update_bucket(self, resp_headers):
+        try:
+            self._bucket_limit = int(resp_headers.get("Ratelimit-Limit", self._bucket_limit))
+            self._bucket_remaining = int(resp_headers["Ratelimit-Remaining"])
+            self._bucket_reset = float(resp_headers["Ratelimit-Reset"])
+        except (KeyError, ValueError):
+            pass
+
+    # --- REQUESTS ---
+
+    @staticmethod
+    def _normalise(endpoint: str, params: Params) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+        """Split a path or full URL plus params into (url, sorted params) for sending and coalescing."""
+        if not endpoint.startswith("http"):
+            endpoint = HELIX_BASE + endpoint.lstrip("/")
+        parts = urlsplit(endpoint)
+        pairs = parse_qsl(parts.query, keep_blank_values=True)
+        if isinstance(params, dict):
+            params = params.items()
+        pairs.extend((str(k), str(v)) for k, v in (params or ()))
+        url = f"{parts.scheme}://{parts.netloc}{parts.path}"
+        return url, tuple(sorted(pairs))
+
+    async def get(self, endpoint: str, params: Params = None) -> Tuple[Optional[int], Optional[Any]]:
+        """GET a Helix endpoint (path like ``"streams"`` or a full URL). Returns ``(status, json)``."""
+        key = self._normalise(endpoint, params)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.metrics["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._request("GET", *key)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def request(self, method: str, endpoint: str, params: Params = None,
+                      json: Any = None) -> Tuple[Optional[int], Optional[Any]]:
+        """Send a non-GET request (e.g. EventSub subscription management). Not coalesced."""
+        url, pairs = self._normalise(endpoint, params)
+        return await self._request(method, url, pairs, json)
+
+    async def _request(self, method: str, url: str, params: Tuple[Tuple[str, str], ...],
+                       json: Any = None) -> Tuple[Optional[int], Optional[Any]]:
+        refreshed = False
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.metrics["retries"] += 1
+            headers = await self.headers()
+            if not headers:
+                return None, None
+
+            await self._acquire()
+            self.metrics["requests"] += 1
+            try:
+                async with self.session.request(method, url, params=list(params), json=json, headers=headers) as resp:
+                    self._update_bucket(resp.headers)
+                    if resp.status == 401 and not refreshed:
+                        refreshed = True
+                        await self.get_token(force_refresh=True)
+                        continue
+                    if resp.status == 429:
+                        await asyncio.sleep(max(self._bucket_reset - time.time(), 1))
+                        continue
+                    if resp.status >= 500 and attempt < self.max_retries and method == "GET":
+                        await asyncio.sleep(2 ** attempt + random.uniform(0, 0.5))
+                        continue
+                    try:
+                        data = await resp.json()
+                    except (aiohttp.ContentTypeError, ValueError):
+                        data = None
+                    if resp.status >= 400:
+                        self.metrics["errors"] += 1
+                        log.debug(f"HelixClient: {url} returned {resp.status}: {data}")
+                    return resp.status, data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                log.warning(f"HelixClient: Error requesting {method} {url} (attempt {attempt + 1}): {e}")
+                if method != "GET":
+                    # The request may have reached Twitch; resending a POST/DELETE isn't safe
+                    break
+                if attempt < self.max_retries:
+                    await asyncio.sleep(2 ** attempt + random.uniform(0, 0.5))
+        self.metrics["errors"] += 1
+        return None, None
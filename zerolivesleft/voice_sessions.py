@@ -0,0 +1,161 @@
+# zerolivesleft/voice_sessions.py
+# Voice session engine: open sessions, batch crediting per tick, persistence across restarts
+
+import logging
+import time
+from typing import Dict, Optional
+
+log = logging.getLogger("red.Elkz.zerolivesleft.voice_sessions")
+
+
+class VoiceSessionEngine:
+    """
+    Tracks who is in voice and how much of their time has been credited.
+
+    Each open session is a single float per member: the unix time up to
+    which the member has been credited. A tick turns whole elapsed minutes
+    into credits for every member at once and moves the marker forward,
+    keeping the sub-minute remainder. Time spent in an excluded channel
+    (the AFK channel, an explicitly excluded channel, or a channel with no
+    other humans when solo exclusion is on) is skipped, not credited.
+
+    Open sessions are written to Config each tick and on unload, and a
+    member's entry is dropped as soon as they leave voice. On start
+    a member still in voice resumes from their stored marker if it is
+    recent, so a restart neither drops nor double counts their time.
+    """
+
+    def __init__(self, config, resume_window: int = 900):
+        self.config = config
+        self.resume_window = resume_window
+        self.sessions: Dict[int, Dict[int, float]] = {}  # guild_id -> user_id -> credited-until unix time
+
+        # Stats for the debug command
+        self.ticks = 0
+        self.last_tick_credited = 0
+        self.last_tick_seconds = 0.0
+
+    # --- EXCLUSION RULES ---
+
+    @staticmethod
+    def is_excluded(channel, settings, leaving: bool = False) -> bool:
+        """Whether time spent in ``channel`` should not be credited."""
+        if channel is None:
+            return True
+        if channel.id in settings.voice_excluded_channel_ids:
+            return True
+        if settings.voice_exclude_afk and channel.guild.afk_channel and channel.id == channel.guild.afk_channel.id:
+            return True
+        if settings.voice_exclude_solo:
+            # A member who just left is no longer in channel.members
+            humans = sum(1 for m in channel.members if not m.bot) + (1 if leaving else 0)
+            if humans < 2:
+                return True
+        return False
+
+    # --- SESSIONS ---
+
+    def start(self, guild_id: int, user_id: int, at: Optional[float] = None):
+        self.sessions.setdefault(guild_id, {})[user_id] = at if at is not None else time.time()
+
+    def is_tracking(self, guild_id: int, user_id: int) -> bool:
+        return user_id in self.sessions.get(guild_id, {})
+
+    def settle(self, guild_id: int, user_id: int, eligible: bool, end: bool = False) -> int:
+        """
+        Close out the time since the last credit and return whole minutes to credit.
+        Ineligible time is dropped. With ``end`` the session is closed.
+        """
+        guild_sessions = self.sessions.get(guild_id, {})
+        credited_until = guild_sessions.get(user_id)
+        if credited_until is None:
+            return 0
+
+        now = time.time()
+        minutes = int((now - credited_until) // 60) if eligible else 0
+        if end:
+            del guild_sessions[user_id]
+        elif eligible:
+            guild_sessions[user_id] = credited_until + minutes * 60
+        else:
+            guild_sessions[user_id] = now
+        return minutes
+
+    def pending_minutes(self, guild_id: int, user_id: int) -> int:
+        """Uncredited whole minutes in a member's open session."""
+        credited_until = self.sessions.get(guild_id, {}).get(user_id)
+        if credited_until is None:
+            return 0
+        return int((time.time() - credited_until) // 60)
+
+    def pending(self, guild_id: int) -> Dict[int, int]:
+        """Uncredited whole minutes for every open session in a guild (only non-zero entries)."""
+        now = time.time()
+        pending = {}
+        for user_id, credited_until in self.sessions.get(guild_id, {}).items():
+            minutes = int((now - credited_until) // 60)
+            if minutes >= 1:
+                pending[user_id] = minutes
+        return pending
+
+    @property
+    def tracked_count(self) -> int:
+        return sum(len(users) for users in self.sessions.values())
+
+    def collect(self, guild, settings) -> dict:
+        """
+        One tick for a guild: settle every open session and return ``{member: minutes}``
+        for members who earned at least one minute.
+        """
+        started = time.monotonic()
+        credits = {}
+        guild_sessions = self.sessions.get(guild.id, {})
+        for user_id in list(guild_sessions):
+            member = guild.get_member(user_id)
+            if member is None or member.voice is None or member.voice.channel is None:
+                # Missed the leave event; credited time stands, the rest can't be verified
+                guild_sessions.pop(user_id, None)
+                continue
+            minutes = self.settle(guild.id, user_id, not self.is_excluded(member.voice.channel, settings))
+            if minutes >= 1:
+                credits[member] = minutes
+
+        self.ticks += 1
+        self.last_tick_credited = len(credits)
+        self.last_tick_seconds = time.monotonic() - started
+        return credits
+
+    # --- PERSISTENCE ---
+
+    async def persist(self, guild_id: int):
+        """Store a guild's open sessions (one Config write)."""
+        sessions = {str(uid): ts for uid, ts in self.sessions.get(guild_id, {}).items()}
+        await self.config.guild_from_id(guild_id).at_voice_sessions.set(sessions)
+
+    async def forget(self, guild_id: int, user_id: int):
+        """
+        Drop a member's stored marker once their session has ended, so a restart
+        before the next tick can't resume time they already left with.
+        """
+        async with self.config.guild_from_id(guild_id).at_voice_sessions() as stored:
+            stored.pop(str(user_id), None)
+
+    async def restore(self, guild):
+        """Open sessions for members already in voice, resuming stored markers where recent."""
+        stored = await self.config.guild(guild).at_voice_sessions()
+        now = time.time()
+        resumed = started = 0
+        guild_sessions = self.sessions.setdefault(guild.id, {})
+        for channel in guild.voice_channels:
+            for member in channel.members:
+                if member.bot or member.id in guild_sessions:
+                    continue
+                marker = stored.get(str(member.id))
+                if marker is not None and 0 <= now - marker <= self.resume_window:
+                    guild_sessions[member.id] = marker
+                    resumed += 1
+                else:
+                    guild_sessions[member.id] = now
+                    started += 1
+        await self.persist(guild.id)
+        log.info(f"VoiceSessions: Guild {guild.id}: resumed {resumed} sessions, started {started} for members already in voice.")
@@ -1,22 +1,33 @@
 # zerolivesleft/webapi.py
 # Complete, updated file
+import asyncio
 import logging
 import os
 import json
+import bisect
 import hmac
 import hashlib
+import time
 from aiohttp import web
 import discord
-from datetime import datetime
 
 log = logging.getLogger("red.Elkz.zerolivesleft.webapi")
 
 class WebApiManager:
     """Manages the aiohttp web server and API endpoints for the Zerolivesleft cog."""
 
+    ACTIVITY_PAGE_MAX = 1000
+    ACTIVITY_STREAM_CHUNK = 500
+    ROLE_MEMBERS_CACHE_SECONDS = 30
+    CHUNK_WAIT_SECONDS = 10
+    ROLE_MEMBERS_MAX_ROLES = 25
+
     def __init__(self, cog_instance):
         self.cog = cog_instance
         self.web_app = cog_instance.web_app
+        self._activity_id_cache = {}  # guild_id -> (user count, sorted user IDs)
+        self._role_members_cache = {}  # (guild_id, role_id) -> (monotonic time, (gamertag version, live version), members data)
+        self._chunk_tasks = {}  # guild_id -> background guild.chunk() task
 
     def register_all_routes(self):
         """Register all web API routes from various functionalities."""
@@ -25,6 +36,7 @@ class WebApiManager:
             # --- General Routes ---
             self.web_app.router.add_get("/health", self.health_check_handler)
             self.web_app.router.add_get("/guilds/{guild_id}/roles/{role_id}/members", self.get_role_members_handler)
+            self.web_app.router.add_get("/guilds/{guild_id}/roles/members", self.get_multi_role_members_handler)
 
             # --- Application Routes (from application_roles.py) ---
             self.web_app.router.add_post("/api/applications/update-status", self.cog.application_roles_logic.handle_application_update)
@@ -34,6 +46,7 @@ class WebApiManager:
             self.web_app.router.add_post("/api/assign-initial-role", self.assign_initial_role_handler)
             self.web_app.router.add_get("/api/get-military-ranks", self.get_military_ranks_handler)
             self.web_app.router.add_get("/api/get-all-activity", self.get_all_activity_handler)
+            self.web_app.router.add_get("/api/leaderboard", self.get_leaderboard_handler)
 
             # --- User Profile Routes (from user_profile.py) ---
             self.web_app.router.add_get("/api/user/{user_id}/details", self.get_user_details_handler)
@@ -101,38 +114,119 @@ class WebApiManager:
             log.warning(f"BadRequest: Invalid guild_id ({guild_id_str}) or role_id ({role_id_str}) format.")
             raise web.HTTPBadRequest(reason="Invalid guild_id or role_id format.")
 
-        guild = self.cog.bot.get_guild(guild_id)
-        if not guild:
-            log.warning(f"NotFound: Guild with ID {guild_id} not found for role members request.")
-            raise web.HTTPNotFound(reason=f"Guild with ID {guild_id} not found.")
-
-        if not guild.chunked:
-            await guild.chunk()
+        guild = await self._get_member_guild(guild_id)
 
         role = guild.get_role(role_id)
         if not role:
             log.warning(f"NotFound: Role with ID {role_id} not found in guild {guild.id} for role members request.")
             raise web.HTTPNotFound(reason=f"Role with ID {role_id} not found in guild {guild.id}.")
 
+        members_data = await self._get_role_members_data(guild, role)
+        log.info(f"Successfully returned {len(members_data)} members for role {role_id} in guild {guild_id}.")
+        return web.json_response(members_data)
+
+    async def get_multi_role_members_handler(self, request: web.Request):
+        """Web API handler to return members of several roles in one call: ?role_ids=1,2,3"""
+        try:
+            await self._authenticate_request_webserver_key(request)
+        except (web.HTTPUnauthorized, web.HTTPForbidden) as e:
+            return e
+
+        guild_id_str = request.match_info.get("guild_id")
+        role_ids_str = request.query.get("role_ids", "")
+        try:
+            guild_id = int(guild_id_str)
+            role_ids = [int(r) for r in role_ids_str.split(",") if r.strip()]
+        except (ValueError, TypeError):
+            log.warning(f"BadRequest: Invalid guild_id ({guild_id_str}) or role_ids ({role_ids_str}) format.")
+            raise web.HTTPBadRequest(reason="Invalid guild_id or role_ids format.")
+        if not role_ids:
+            raise web.HTTPBadRequest(reason="role_ids is required.")
+        if len(role_ids) > self.ROLE_MEMBERS_MAX_ROLES:
+            raise web.HTTPBadRequest(reason=f"At most {self.ROLE_MEMBERS_MAX_ROLES} role_ids per request.")
+
+        guild = await self._get_member_guild(guild_id)
+
+        result = {}
+        for role_id in role_ids:
+            role = guild.get_role(role_id)
+            result[str(role_id)] = await self._get_role_members_data(guild, role) if role else None
+
+        log.info(f"Successfully returned members for {len(role_ids)} roles in guild {guild_id}.")
+        return web.json_response(result)
+
+    async def _get_member_guild(self, guild_id: int):
+        """Look up a guild for member listings, waiting (up to CHUNK_WAIT_SECONDS) for its member cache to fill."""
+        guild = self.cog.bot.get_guild(guild_id)
+        if not guild:
+            log.warning(f"NotFound: Guild with ID {guild_id} not found for role members request.")
+            raise web.HTTPNotFound(reason=f"Guild with ID {guild_id} not found.")
+
+        if not guild.chunked:
+            task = self._chunk_tasks.get(guild.id)
+            if task is None or task.done():
+                log.info(f"Guild {guild.id} not chunked, chunking in the background.")
+                self._chunk_tasks[guild.id] = task = asyncio.create_task(guild.chunk())
+            try:
+                # Shielded so a slow request doesn't cancel the chunk other requests are waiting on
+                await asyncio.wait_for(asyncio.shield(task), timeout=self.CHUNK_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                log.warning(f"Guild {guild.id} still chunking after {self.CHUNK_WAIT_SECONDS}s, member lists may be partial.")
+            except Exception as e:
+                log.error(f"Error chunking guild {guild.id}: {e}")
+        return guild
+
+    async def _get_role_members_data(self, guild, role) -> list:
+        """Serialized role members, cached briefly and dropped when the role's membership changes."""
+        gamertags_logic = self.cog.gamertags_logic
+        key = (guild.id, role.id)
+        cached = self._role_members_cache.get(key)
+        if (
+            cached
+            and time.monotonic() - cached[0] < self.ROLE_MEMBERS_CACHE_SECONDS
+            and cached[1] == (gamertags_logic.cache_version, self.cog.live_status.version)
+        ):
+            return cached[2]
+
+        all_gamertags = await gamertags_logic.get_all_gamertags()
+        live_status = self.cog.live_status
         members_data = []
         for member in role.members:
-            streaming_activity = next((a for a in member.activities if isinstance(a, discord.Streaming)), None)
             # Retrieve the Twitch username from the gamertags
-            gamertags = await self.cog.config.user(member).gamertags()
-            twitch_username = gamertags.get('twitch', '')
+            twitch_username = all_gamertags.get(member.id, {}).get('twitch', '')
+            if twitch_username:
+                live_status.link(member.id, twitch_username)
+            status = live_status.for_member(member)
+            is_live = bool(status and status.is_live)
 
             members_data.append({
                 "id": str(member.id),
                 "name": member.name,
                 "display_name": member.display_name,
                 "avatar_url": str(member.display_avatar.url) if member.display_avatar else None,
-                "is_live": streaming_activity is not None,
-                "twitch_url": streaming_activity.url if streaming_activity else f"https://www.twitch.tv/{twitch_username}",
+                "is_live": is_live,
+                "twitch_url": status.url if is_live and status.url else f"https://www.twitch.tv/{twitch_username}",
                 "twitch_username": twitch_username
             })
 
-        log.info(f"Successfully returned {len(members_data)} members for role {role_id} in guild {guild_id}.")
-        return web.json_response(members_data)
+        if guild.chunked:
+            # A partial list from a half-chunked guild isn't worth serving again
+            self._role_members_cache[key] = (time.monotonic(), (gamertags_logic.cache_version, live_status.version), members_data)
+        return members_data
+
+    def invalidate_role_members(self, guild_id: int, role_ids):
+        """Drop cached member listings for roles whose membership changed."""
+        for role_id in role_ids:
+            self._role_members_cache.pop((guild_id, role_id), None)
+
+    def handle_member_update(self, before, after):
+        """Invalidate role member caches when a member gains or loses roles."""
+        if before.roles != after.roles:
+            changed = {r.id for r in before.roles} ^ {r.id for r in after.roles}
+            self.invalidate_role_members(after.guild.id, changed)
+
+    def handle_member_remove(self, member):
+        self.invalidate_role_members(member.guild.id, [r.id for r in member.roles])
 
     async def assign_initial_role_handler(self, request: web.Request):
         """Assigns an initial role to a new member based on website request (from ActivityTracker)."""
@@ -209,7 +303,15 @@ class WebApiManager:
         return web.json_response(sorted_ranks)
 
     async def get_all_activity_handler(self, request: web.Request):
-        """API endpoint to get all user activity data (from ActivityTracker)."""
+        """
+        API endpoint to get all user activity data (from ActivityTracker).
+
+        Without query parameters the full list is streamed (gzip'd if accepted).
+        ``limit``/``cursor`` page through users ordered by Discord ID, and
+        ``updated_since`` (unix time) limits results to users whose minutes
+        changed since then. Responses carry an ETag; a matching
+        If-None-Match returns 304.
+        """
         guild_id_str = os.environ.get("DISCORD_GUILD_ID")
         if not guild_id_str:
             log.critical("DISCORD_GUILD_ID not set in environment for get_all_activity_handler.")
@@ -224,30 +326,129 @@ class WebApiManager:
         except (web.HTTPUnauthorized, web.HTTPForbidden) as e:
             return e
 
-        user_activity_config = await self.cog.config.guild(main_guild).at_user_activity()
+        try:
+            limit = int(request.query["limit"]) if request.query.get("limit") else None
+            cursor = int(request.query["cursor"]) if request.query.get("cursor") else None
+            updated_since = float(request.query["updated_since"]) if request.query.get("updated_since") else None
+        except ValueError:
+            raise web.HTTPBadRequest(reason="limit, cursor and updated_since must be numeric.")
+
+        ledger = self.cog.activity_tracking_logic.ledger
+        user_activity_config = await ledger.get_all(main_guild, "at_user_activity")
+        live_minutes = self._live_session_minutes(main_guild.id)
+
+        # ETag covers stored minutes, in-progress voice sessions and the query itself
+        etag_source = f"{ledger.version(main_guild.id, 'at_user_activity')}:{sorted(live_minutes.items())}:{request.query_string}"
+        etag = '"' + hashlib.sha1(etag_source.encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        user_ids = self._sorted_activity_ids(main_guild.id, user_activity_config)
+        if updated_since is not None:
+            changed = await ledger.modified_since(main_guild, "at_user_activity", updated_since)
+            if changed is not None:
+                changed.update(str(uid) for uid in live_minutes)
+                user_ids = [uid for uid in user_ids if str(uid) in changed]
+
+        def record(user_id):
+            user_id_str = str(user_id)
+            return {
+                "discord_id": user_id_str,
+                "minutes": user_activity_config.get(user_id_str, 0) + live_minutes.get(user_id, 0)
+            }
 
-        activity_data = []
-        if self.cog.activity_tracking_logic and hasattr(self.cog.activity_tracking_logic, 'voice_tracking'):
-            voice_tracking_data = self.cog.activity_tracking_logic.voice_tracking
-        else:
-            voice_tracking_data = {}
-        for user_id_str, minutes in user_activity_config.items():
-            user_id = int(user_id_str)
-            total_minutes = minutes
+        if limit is None and cursor is None and updated_since is None:
+            # Full dump: stream the legacy list shape, gzip'd when the client accepts it
+            response = web.StreamResponse(headers={"Content-Type": "application/json", "ETag": etag})
+            response.enable_compression()
+            await response.prepare(request)
+            await response.write(b"[")
+            for i in range(0, len(user_ids), self.ACTIVITY_STREAM_CHUNK):
+                chunk = ",".join(json.dumps(record(uid)) for uid in user_ids[i:i + self.ACTIVITY_STREAM_CHUNK])
+                await response.write(((b"," if i else b"") + chunk.encode()))
+            await response.write(b"]")
+            await response.write_eof()
+            log.info(f"Successfully streamed {len(user_ids)} activity records for guild {main_guild.id}.")
+            return response
+
+        limit = min(max(1, limit or self.ACTIVITY_PAGE_MAX), self.ACTIVITY_PAGE_MAX)
+        start = bisect.bisect_right(user_ids, cursor) if cursor is not None else 0
+        page_ids = user_ids[start:start + limit]
+        next_cursor = str(page_ids[-1]) if start + limit < len(user_ids) else None
+
+        response = web.json_response({
+            "results": [record(uid) for uid in page_ids],
+            "next_cursor": next_cursor,
+            "server_time": time.time()
+        }, headers={"ETag": etag})
+        response.enable_compression()
+        log.info(f"Successfully returned {len(page_ids)} activity records for guild {main_guild.id}.")
+        return response
+
+    def _live_session_minutes(self, guild_id: int) -> dict:
+        """Minutes accrued by in-progress voice sessions, keyed by user ID."""
+        return self.cog.activity_tracking_logic.voice_sessions.pending(guild_id)
+
+    def _sorted_activity_ids(self, guild_id: int, user_activity: dict) -> list:
+        """Sorted int user IDs for cursor paging. Users are never removed, so the count detects changes."""
+        cached = self._activity_id_cache.get(guild_id)
+        if cached is None or cached[0] != len(user_activity):
+            cached = (len(user_activity), sorted(int(uid) for uid in user_activity))
+            self._activity_id_cache[guild_id] = cached
+        return cached[1]
+
+    async def get_leaderboard_handler(self, request: web.Request):
+        """Returns one page of the XP leaderboard, plus an optional user's position (from ActivityTracker)."""
+        guild_id_str = os.environ.get("DISCORD_GUILD_ID")
+        if not guild_id_str:
+            log.critical("DISCORD_GUILD_ID not set in environment for get_leaderboard_handler.")
+            raise web.HTTPInternalServerError(reason="DISCORD_GUILD_ID not set")
+        main_guild = self.cog.bot.get_guild(int(guild_id_str))
+        if not main_guild:
+            log.critical(f"Main guild with ID {guild_id_str} not found for get_leaderboard_handler.")
+            raise web.HTTPInternalServerError(reason="Main Discord guild not found")
 
-            if main_guild.id in voice_tracking_data and user_id in voice_tracking_data[main_guild.id]:
-                join_time = voice_tracking_data[main_guild.id][user_id]
-                current_session_minutes = int((datetime.utcnow() - join_time).total_seconds() / 60)
-                if current_session_minutes >= 1:
-                    total_minutes += current_session_minutes
+        try:
+            await self._authenticate_request_guild_key(request, main_guild.id)
+        except (web.HTTPUnauthorized, web.HTTPForbidden) as e:
+            return e
 
-            activity_data.append({
-                "discord_id": user_id_str,
-                "minutes": total_minutes
+        try:
+            page = max(1, int(request.query.get("page", 1)))
+            per_page = min(100, max(1, int(request.query.get("per_page", 25))))
+            user_id = int(request.query["user_id"]) if request.query.get("user_id") else None
+        except ValueError:
+            raise web.HTTPBadRequest(reason="page, per_page and user_id must be integers.")
+
+        logic = self.cog.activity_tracking_logic
+        index = logic.leaderboard_index
+        entries = []
+        for position, member_id, xp, prestige in await index.page(main_guild, page, per_page):
+            member = main_guild.get_member(member_id)
+            entries.append({
+                "rank": position,
+                "discord_id": str(member_id),
+                "display_name": member.display_name if member else None,
+                "xp": xp,
+                "prestige_level": prestige
             })
 
-        log.info(f"Successfully returned {len(activity_data)} activity records for guild {main_guild.id}.")
-        return web.json_response(activity_data)
+        response = {
+            "page": page,
+            "per_page": per_page,
+            "total": await index.total(main_guild),
+            "entries": entries
+        }
+        if user_id is not None:
+            position = await index.position(main_guild, user_id)
+            response["user"] = {
+                "discord_id": str(user_id),
+                "rank": position,
+                "xp": await logic._get_user_xp(main_guild, user_id),
+                "prestige_level": await logic._get_user_prestige(main_guild, user_id)
+            } if position else None
+
+        return web.json_response(response)
 
     async def get_user_details_handler(self, request: web.Request):
         """Get user details handler."""
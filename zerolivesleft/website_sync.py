@@ -0,0 +1,249 @@
+# zerolivesleft/website_sync.py
+# Batched, coalesced outbound sync of XP/prestige/activity to the Django website
+
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, List, Optional
+
+log = logging.getLogger("red.Elkz.zerolivesleft.website_sync")
+
+
+class WebsiteSyncQueue:
+    """
+    Per-guild outbound queue for website updates.
+
+    Updates are keyed by (kind, discord_id), so a user who earns XP ten times
+    between flushes only sends their latest total once. The queue is flushed
+    every ``flush_interval`` seconds, or straight away once ``batch_size``
+    updates are pending. Batches go to the website's bulk endpoint; if the
+    website does not have one, the queue falls back to the per-user
+    endpoints with bounded concurrency.
+    """
+
+    # kind -> per-user endpoint, relative to the guild's at_api_url
+    ENDPOINTS = {
+        "xp": "update-xp/",
+        "prestige": "update-prestige/",
+        "activity": "update-activity/",
+    }
+    BULK_ENDPOINT = "bulk-update/"
+    BULK_RECHECK_SECONDS = 3600
+
+    def __init__(
+        self,
+        cog_instance,
+        settings,
+        flush_interval: int = 10,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+    ):
+        self.cog = cog_instance
+        self.settings = settings
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+
+        self._queues: Dict[int, Dict[str, Dict[str, dict]]] = {}  # guild_id -> kind -> discord_id -> payload
+        self._bulk_unsupported: Dict[int, float] = {}              # guild_id -> monotonic time bulk was rejected
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self.flush_task = None
+
+        self.metrics = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "sent": 0,
+            "failed": 0,
+            "retries": 0,
+            "batches": 0,
+            "peak_depth": 0,
+            "last_flush_seconds": 0.0,
+        }
+
+    # --- LIFECYCLE ---
+
+    def start(self, loop):
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = loop.create_task(self._flush_loop())
+
+    def stop(self):
+        if self.flush_task and not self.flush_task.done():
+            self.flush_task.cancel()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                await self.flush()
+            except asyncio.CancelledError:
+                log.info("WebsiteSync: Flush loop cancelled.")
+                break
+            except Exception as e:
+                log.exception(f"WebsiteSync: Error during flush: {e}")
+
+    # --- QUEUEING ---
+
+    def enqueue(self, guild_id: int, kind: str, payload: dict):
+        """Queue an update, replacing any pending update of the same kind for the same user."""
+        queue = self._queues.setdefault(guild_id, {}).setdefault(kind, {})
+        discord_id = payload["discord_id"]
+        if discord_id in queue:
+            self.metrics["coalesced"] += 1
+        queue[discord_id] = payload
+        self.metrics["enqueued"] += 1
+
+        depth = self.depth
+        if depth > self.metrics["peak_depth"]:
+            self.metrics["peak_depth"] = depth
+        if depth >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def depth(self) -> int:
+        """Number of distinct updates waiting to be sent."""
+        return sum(len(users) for kinds in self._queues.values() for users in kinds.values())
+
+    def _requeue(self, guild_id: int, kind: str, payloads: List[dict]):
+        """Put failed updates back unless a newer value was queued meanwhile."""
+        queue = self._queues.setdefault(guild_id, {}).setdefault(kind, {})
+        for payload in payloads:
+            queue.setdefault(payload["discord_id"], payload)
+
+    # --- SENDING ---
+
+    async def flush(self):
+        """Send everything currently queued."""
+        async with self._flush_lock:
+            if not self._queues:
+                return
+            started = time.monotonic()
+            queues, self._queues = self._queues, {}
+
+            jobs = []
+            for guild_id, kinds in queues.items():
+                guild_settings = await self.settings.get_by_id(guild_id)
+                api_url = guild_settings.api_url
+                api_key = guild_settings.api_key
+                if not api_url or not api_key:
+                    continue
+                headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
+                jobs.append(self._flush_guild(guild_id, kinds, api_url, headers))
+
+            if jobs:
+                await asyncio.gather(*jobs, return_exceptions=True)
+            self.metrics["last_flush_seconds"] = time.monotonic() - started
+
+    async def _flush_guild(self, guild_id: int, kinds: Dict[str, Dict[str, dict]], api_url: str, headers: dict):
+        updates = [
+            dict(payload, type=kind)
+            for kind, users in kinds.items()
+            for payload in users.values()
+        ]
+        if not self._bulk_available(guild_id):
+            fallback = updates
+        else:
+            batches = [updates[i:i + self.batch_size] for i in range(0, len(updates), self.batch_size)]
+            results = await asyncio.gather(
+                *(self._send_bulk(guild_id, api_url, headers, batch) for batch in batches),
+                return_exceptions=True
+            )
+            fallback = []
+            for batch, status in zip(batches, results):
+                if isinstance(status, BaseException):
+                    status = None
+                if status is not None and status < 400:
+                    continue
+                if status in (404, 405):
+                    # Bulk endpoint is missing; resend just this batch per user
+                    fallback.extend(batch)
+                elif self._is_transient(status):
+                    self._requeue_updates(guild_id, batch)
+                # Other 4xx rejections are dropped, as in _send_single
+
+        jobs = []
+        for update in fallback:
+            payload = dict(update)
+            kind = payload.pop("type")
+            jobs.append(self._send_single(guild_id, api_url + self.ENDPOINTS[kind], headers, kind, payload))
+        if jobs:
+            await asyncio.gather(*jobs, return_exceptions=True)
+
+    @staticmethod
+    def _is_transient(status: Optional[int]) -> bool:
+        """Whether a failed send is worth retrying on a later flush."""
+        return status is None or status == 429 or status >= 500
+
+    def _bulk_available(self, guild_id: int) -> bool:
+        rejected_at = self._bulk_unsupported.get(guild_id)
+        if rejected_at is None:
+            return True
+        if time.monotonic() - rejected_at > self.BULK_RECHECK_SECONDS:
+            del self._bulk_unsupported[guild_id]
+            return True
+        return False
+
+    def _requeue_updates(self, guild_id: int, updates: List[dict]):
+        for update in updates:
+            payload = dict(update)
+            kind = payload.pop("type")
+            self._requeue(guild_id, kind, [payload])
+
+    async def _post(self, endpoint: str, headers: dict, payload: dict) -> Optional[int]:
+        """POST with retries and exponential backoff. Returns the final HTTP status, or None on error."""
+        status = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.metrics["retries"] += 1
+                await asyncio.sleep((2 ** (attempt - 1)) + random.uniform(0, 0.5))
+            try:
+                async with self._semaphore:
+                    async with self.cog.session.post(endpoint, headers=headers, json=payload, timeout=10) as resp:
+                        status = resp.status
+                        if status < 400 or status in (404, 405):
+                            return status
+                        if 400 <= status < 500 and status != 429:
+                            # Client errors won't get better by retrying
+                            error_text = await resp.text()
+                            log.error(f"WebsiteSync: {endpoint} rejected update: {status} - {error_text}")
+                            return status
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"WebsiteSync: Error posting to {endpoint} (attempt {attempt + 1}): {e}")
+                status = None
+        return status
+
+    async def _send_bulk(self, guild_id: int, api_url: str, headers: dict, batch: List[dict]) -> Optional[int]:
+        """Send one batch to the bulk endpoint and return the final HTTP status (None on error)."""
+        self.metrics["batches"] += 1
+        status = await self._post(api_url + self.BULK_ENDPOINT, headers, {"updates": batch})
+        if status in (404, 405):
+            if guild_id not in self._bulk_unsupported:
+                log.info(f"WebsiteSync: Website for guild {guild_id} has no bulk endpoint, using per-user endpoints.")
+            self._bulk_unsupported[guild_id] = time.monotonic()
+            return status
+        if status is not None and status < 400:
+            self.metrics["sent"] += len(batch)
+            log.debug(f"WebsiteSync: Sent batch of {len(batch)} updates for guild {guild_id}.")
+            return status
+        self.metrics["failed"] += len(batch)
+        log.error(f"WebsiteSync: Bulk update for guild {guild_id} failed (status {status}).")
+        return status
+
+    async def _send_single(self, guild_id: int, endpoint: str, headers: dict, kind: str, payload: dict):
+        status = await self._post(endpoint, headers, payload)
+        if status is not None and status < 400:
+            self.metrics["sent"] += 1
+            return
+        self.metrics["failed"] += 1
+        if self._is_transient(status):
+            self._requeue(guild_id, kind, [payload])
+        log.error(f"WebsiteSync: Failed to sync {kind} for user {payload['discord_id']} (status {status}).")